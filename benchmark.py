@@ -0,0 +1,244 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from sensor_simulator import LoadGenerator, LoadProfile
+
+# Workload clock: history is stored before START, measured messages after it
+START = datetime(2024, 1, 1)
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+    values = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def _messages(sensors, count, start, seed):
+    """``count`` seeded messages, every sensor reporting once a second."""
+    profile = LoadProfile(
+        sensors=sensors, rate=1.0, tick=1.0, seed=seed, start_time=start
+    )
+    generator = LoadGenerator(profile)
+    messages = []
+    while len(messages) < count:
+        messages.extend(generator.next_tick())
+    return messages[:count]
+
+
+def _prefill(storage, sensors, history, seed):
+    """Store ``history`` readings per sensor ending at START, untimed."""
+    if not history:
+        return
+    start = START - timedelta(seconds=history)
+    messages = _messages(sensors, sensors * history, start, seed + 1)
+    chunk = 100_000
+    for i in range(0, len(messages), chunk):
+        batch = []
+        for _, payload in messages[i : i + chunk]:
+            data = json.loads(payload)
+            data["sensor_type"] = data.pop("type")
+            batch.append((data["sensor_id"], data))
+        storage.store_readings(batch)
+        storage.update_stats_many(batch)
+        storage.update_rollups(batch)
+
+
+def run_config(config):
+    """Run one benchmark configuration; meant for a fresh process."""
+    # Per-message INFO logging would dominate the timings
+    os.environ["LOG_LEVEL"] = config["log_level"]
+
+    from src.dashboard import create_app, tasks
+    from src.dashboard.file_storage import FileStorage
+
+    data_dir = tempfile.mkdtemp(prefix="iot-bench-")
+    tasks.file_storage = FileStorage(data_dir)
+    app = create_app()
+    client = app.test_client()
+
+    sensors, history = config["sensors"], config["history"]
+    _prefill(tasks.file_storage, sensors, history, config["seed"])
+    messages = _messages(sensors, config["messages"], START, config["seed"])
+
+    latencies = []
+    started = time.perf_counter()
+    if config["mode"] == "batch":
+        size = config["batch_size"]
+        for i in range(0, len(messages), size):
+            chunk = messages[i : i + size]
+            t0 = time.perf_counter()
+            tasks.process_sensor_batch([json.loads(p) for _, p in chunk])
+            latencies.extend([time.perf_counter() - t0] * len(chunk))
+    else:
+        for topic, payload in messages:
+            t0 = time.perf_counter()
+            tasks.process_sensor_data(topic, payload)
+            latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    sensor_ids = [json.loads(p)["sensor_id"] for _, p in messages[:sensors]]
+    queries = {"sensors": [], "readings": []}
+    since = (START - timedelta(seconds=history)).isoformat()
+    for i in range(config["queries"]):
+        t0 = time.perf_counter()
+        response = client.get("/api/sensors")
+        queries["sensors"].append(time.perf_counter() - t0)
+        assert response.status_code == 200, response.status_code
+
+        sensor_id = sensor_ids[i % len(sensor_ids)]
+        t0 = time.perf_counter()
+        response = client.get(
+            f"/api/sensors/{sensor_id}/readings?start={since}&limit=100"
+        )
+        queries["readings"].append(time.perf_counter() - t0)
+        assert response.status_code == 200, response.status_code
+
+    return {
+        **config,
+        "messages_per_second": round(len(messages) / elapsed, 1),
+        "ingest": _percentiles(latencies),
+        "query_sensors": _percentiles(queries["sensors"]),
+        "query_readings": _percentiles(queries["readings"]),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def run_metadata(args):
+    """The label, commit and machine a set of results was produced with."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "label": args.label,
+        "commit": commit,
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_suite(args):
+    configs = [
+        {
+            "storage": "file",
+            "mode": mode,
+            "batch_size": args.batch_size if mode == "batch" else 1,
+            "sensors": sensors,
+            "history": history,
+            "messages": args.messages,
+            "queries": args.queries,
+            "seed": args.seed,
+            "log_level": args.log_level,
+        }
+        for mode in args.modes
+        for sensors in args.sensors
+        for history in args.history
+    ]
+    results = []
+    # Every configuration gets its own process so peak RSS is its own
+    context = multiprocessing.get_context("spawn")
+    for config in configs:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_config, config).result()
+        results.append(result)
+        print(
+            f"{result['mode']:>6} sensors={result['sensors']:<6} "
+            f"history={result['history']:<6} "
+            f"{result['messages_per_second']:>9.1f} msg/s  "
+            f"ingest p50={result['ingest']['p50_ms']}ms "
+            f"p99={result['ingest']['p99_ms']}ms  "
+            f"/api/sensors p99={result['query_sensors']['p99_ms']}ms  "
+            f"readings p99={result['query_readings']['p99_ms']}ms  "
+            f"rss={result['peak_rss_mb']}MB",
+            flush=True,
+        )
+    return {"meta": run_metadata(args), "results": results}
+
+
+def _key(result):
+    return (result["mode"], result["sensors"], result["history"])
+
+
+def compare(paths):
+    """Print the headline metrics of several result files side by side."""
+    runs = []
+    for path in paths:
+        with open(path) as f:
+            runs.append({_key(r): r for r in json.load(f)["results"]})
+    metrics = [
+        ("msg/s", lambda r: r["messages_per_second"]),
+        ("ingest p99 ms", lambda r: r["ingest"]["p99_ms"]),
+        ("sensors p99 ms", lambda r: r["query_sensors"]["p99_ms"]),
+        ("readings p99 ms", lambda r: r["query_readings"]["p99_ms"]),
+        ("peak RSS MB", lambda r: r["peak_rss_mb"]),
+    ]
+    for key in sorted(set().union(*runs)):
+        print(f"{key[0]} sensors={key[1]} history={key[2]}")
+        for name, metric in metrics:
+            values = [metric(run[key]) if key in run else None for run in runs]
+            cells = "".join(f"{'-' if v is None else v:>14}" for v in values)
+            print(f"  {name:<16}{cells}")
+
+
+def _ints(value):
+    return [int(item) for item in value.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest and query benchmarks")
+    parser.add_argument("--sensors", type=_ints, default=[10, 100])
+    parser.add_argument("--history", type=_ints, default=[0, 100])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument(
+        "--modes", type=lambda v: v.split(","), default=["single", "batch"]
+    )
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output", "-o", default="benchmark-results.json")
+    parser.add_argument(
+        "--compare", nargs="+", metavar="RESULTS", help="Compare result files"
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(args.compare)
+        return 0
+    report = run_suite(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
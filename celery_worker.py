@@ -1,11 +1,9 @@
-import logging
 import os
 
+from src.dashboard.logs import configure_logging
 from src.dashboard.tasks import celery_app
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+configure_logging()
 
 if __name__ == "__main__":
     celery_app.start()
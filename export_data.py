@@ -0,0 +1,36 @@
+import argparse
+import sys
+
+from src.dashboard.export import available_formats, export_readings
+from src.dashboard.file_storage import FileStorage, parse_timestamp
+
+
+def main(argv=None):
+    """Export sensor history from storage to a file or stdout."""
+    parser = argparse.ArgumentParser(description="Export sensor history")
+    parser.add_argument("--format", default="csv", choices=available_formats())
+    parser.add_argument("--sensor", action="append", dest="sensor_ids")
+    parser.add_argument("--start", type=parse_timestamp)
+    parser.add_argument("--end", type=parse_timestamp)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--output", "-o", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    storage = FileStorage(args.data_dir)
+    chunks = export_readings(
+        storage, args.format, args.sensor_ids, args.start, args.end, args.chunk_size
+    )
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
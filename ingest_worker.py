@@ -0,0 +1,34 @@
+import logging
+import sys
+
+from src.dashboard import init_emitter
+from src.dashboard.logs import configure_logging
+from src.dashboard.mqtt_client import MQTTClient
+from src.dashboard.tasks import start_recovery
+
+configure_logging()
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Run MQTT ingest in its own process, publishing through the message queue."""
+    try:
+        init_emitter()
+    except ValueError as e:
+        logger.error(f"Cannot start ingest worker: {e}")
+        return 1
+
+    start_recovery()
+    mqtt_client = MQTTClient()
+    if not mqtt_client.connect():
+        logger.error("Failed to start MQTT client")
+        return 1
+
+    logger.info("Starting MQTT ingest loop")
+    mqtt_client.start_loop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
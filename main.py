@@ -1,14 +1,14 @@
 import logging
 import os
-import subprocess
 import threading
 
 from src.dashboard import create_app, socketio
+from src.dashboard.broker import ensure_broker, wait_for_broker
+from src.dashboard.logs import configure_logging
 from src.dashboard.mqtt_client import MQTTClient
+from src.dashboard.tasks import start_recovery
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -27,22 +27,17 @@ def main():
     """Main application entry point."""
     # Start MQTT broker
     logger.info("Starting MQTT broker...")
+    broker_port = int(os.getenv("MQTT_BROKER_PORT", 1883))
     try:
-        result = subprocess.run(["pgrep", "mosquitto"], capture_output=True)
-        if result.returncode != 0:
-            subprocess.Popen(["mosquitto", "-d", "-p", "1883"])
-            import time
-
-            time.sleep(2)
-            logger.info("MQTT broker started")
+        ensure_broker(broker_port, embedded=os.getenv("MQTT_EMBEDDED_BROKER") == "true")
     except Exception as e:
         logger.warning(f"Could not start MQTT broker: {e}")
 
     # Start sensor simulator
     def start_simulator():
-        import time
-
-        time.sleep(3)  # Give MQTT broker time to start
+        if not wait_for_broker("127.0.0.1", broker_port):
+            logger.error("MQTT broker is not reachable, sensor simulator not started")
+            return
         try:
             from sensor_simulator import SensorSimulator
 
@@ -56,6 +51,7 @@ def main():
     logger.info("Sensor simulator started")
 
     app = create_app()
+    start_recovery()
 
     mqtt_thread = threading.Thread(target=start_mqtt_client, daemon=True)
     mqtt_thread.start()
@@ -1,16 +1,24 @@
+import argparse
 import json
+import math
+import multiprocessing
 import os
 import random
-import threading
+import sys
 import time
-from datetime import datetime
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 
+import numpy as np
 import paho.mqtt.client as mqtt
 
 
 class SensorSimulator:
-    def __init__(self):
+    def __init__(self, verbose: bool = False):
         self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.verbose = verbose
+        self.published = 0
         self.sensors = [
             {
                 "id": "temp_living_room",
@@ -106,9 +114,11 @@ class SensorSimulator:
                 try:
                     result = self.client.publish(topic, payload)
                     if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                        print(
-                            f"✓ Published: {topic} -> {data['value']} {data['unit']} ({data['location']})"
-                        )
+                        self.published += 1
+                        if self.verbose:
+                            print(
+                                f"✓ Published: {topic} -> {data['value']} {data['unit']} ({data['location']})"
+                            )
                     else:
                         print(f"✗ Failed to publish to {topic}")
                 except Exception as e:
@@ -121,10 +131,322 @@ class SensorSimulator:
         self.client.disconnect()
 
 
-if __name__ == "__main__":
-    simulator = SensorSimulator()
+# Load generation: (type, unit, base value, daily swing, noise)
+SENSOR_KINDS = [
+    ("temperature", "°C", 22.0, 3.0, 0.2),
+    ("humidity", "%", 50.0, 10.0, 1.0),
+    ("pressure", "hPa", 1013.0, 4.0, 0.3),
+    ("co2", "ppm", 600.0, 150.0, 10.0),
+]
+VALUE_MODELS = ("sine", "walk", "noise")
+
+
+@dataclass
+class LoadProfile:
+    """What a load run sends.
+
+    Each sensor publishes ``rate`` messages per second, varied per sensor by
+    up to ``rate_spread`` (a fraction). Every ``burst_every`` seconds, rates
+    are multiplied by ``burst_factor`` for ``burst_length`` seconds. A
+    fraction ``out_of_order`` of messages carry a timestamp up to
+    ``max_delay`` seconds old, and a fraction ``duplicates`` is sent twice.
+    Timestamps run from ``start_time`` on a simulated clock, so a given
+    profile and ``seed`` always produce the same messages.
+    """
+
+    sensors: int = 1000
+    rate: float = 1.0
+    rate_spread: float = 0.0
+    model: str = "sine"
+    seed: int = 0
+    duration: float | None = None
+    burst_every: float = 0.0
+    burst_length: float = 0.0
+    burst_factor: float = 1.0
+    out_of_order: float = 0.0
+    max_delay: float = 30.0
+    duplicates: float = 0.0
+    processes: int = 1
+    tick: float = 0.05
+    prefill: float = 2.0
+    start_time: datetime = field(default_factory=datetime.now)
+    topic_prefix: str = "sensors"
+
+    def __post_init__(self):
+        if self.model not in VALUE_MODELS:
+            raise ValueError(f"Unknown value model: {self.model}")
+        if self.sensors < 1 or self.rate <= 0 or self.tick <= 0:
+            raise ValueError("sensors, rate and tick must be positive")
+
+
+class LoadGenerator:
+    """Generates the messages of one worker's share of a load profile.
+
+    Worker ``worker`` of ``workers`` owns every ``workers``-th sensor. Each
+    sensor's JSON payload is rendered once as a template, and a tick's
+    messages are produced with vectorized NumPy steps, so only the value and
+    timestamp are formatted per message.
+    """
+
+    def __init__(self, profile: LoadProfile, worker: int = 0, workers: int = 1):
+        self.profile = profile
+        self.rng = np.random.default_rng([profile.seed, worker])
+        self.indices = np.arange(worker, profile.sensors, workers)
+        n = len(self.indices)
+
+        kinds = [SENSOR_KINDS[i % len(SENSOR_KINDS)] for i in self.indices]
+        self.base = np.array([kind[2] for kind in kinds])
+        self.swing = np.array([kind[3] for kind in kinds])
+        self.noise = np.array([kind[4] for kind in kinds])
+        self.phase = self.rng.uniform(0, 2 * math.pi, n)
+        self.level = self.base.copy()
+
+        self.topics = []
+        self.heads = []
+        for i, (sensor_type, unit, *_) in zip(self.indices, kinds):
+            sensor_id = f"sim_{i:06d}"
+            self.topics.append(f"{profile.topic_prefix}/{sensor_id}/{sensor_type}")
+            head = json.dumps(
+                {
+                    "sensor_id": sensor_id,
+                    "type": sensor_type,
+                    "unit": unit,
+                    "location": f"Zone {i % 100:02d}",
+                    "metadata": {"simulated": True},
+                }
+            )
+            self.heads.append(head[:-1] + ', "value": ')
+
+        spread = profile.rate_spread
+        rates = profile.rate * (1 + self.rng.uniform(-spread, spread, n))
+        self.period = 1.0 / rates
+        self.next_due = self.rng.uniform(0, self.period)
+        self.ticks = 0
+
+    def _values(self, due: np.ndarray, t: float) -> np.ndarray:
+        noise = self.rng.normal(0, 1, len(due)) * self.noise[due]
+        if self.profile.model == "noise":
+            return self.base[due] + noise
+        if self.profile.model == "walk":
+            np.add.at(self.level, due, noise)
+            return self.level[due].copy()
+        day = 2 * math.pi * t / 86400
+        return self.base[due] + self.swing[due] * np.sin(day + self.phase[due]) + noise
+
+    def _in_burst(self, t: float) -> bool:
+        p = self.profile
+        return p.burst_every > 0 and t % p.burst_every < p.burst_length
+
+    def next_tick(self) -> list[tuple[str, str]]:
+        """``(topic, payload)`` messages due in the next tick of the clock."""
+        p = self.profile
+        t = self.ticks * p.tick
+        end = t + p.tick
+        self.ticks += 1
+
+        period = self.period / p.burst_factor if self._in_burst(t) else self.period
+        due = np.flatnonzero(self.next_due < end)
+        if not len(due):
+            return []
+        counts = np.floor((end - self.next_due[due]) / period[due]).astype(int) + 1
+        self.next_due[due] += counts * period[due]
+        due = np.repeat(due, counts)
+
+        values = self._values(due, t)
+        m = len(due)
+        offsets = np.full(m, t)
+        late = self.rng.random(m) < p.out_of_order
+        offsets[late] -= self.rng.uniform(0, p.max_delay, int(late.sum()))
+        repeat = np.where(self.rng.random(m) < p.duplicates, 2, 1)
+
+        now = p.start_time + timedelta(seconds=t)
+        stamp = f', "timestamp": "{now.isoformat()}"}}'
+        messages = []
+        for i, value, offset, is_late, times in zip(
+            due.tolist(), values.tolist(), offsets.tolist(), late, repeat
+        ):
+            if is_late:
+                when = p.start_time + timedelta(seconds=offset)
+                tail = f', "timestamp": "{when.isoformat()}"}}'
+            else:
+                tail = stamp
+            message = (self.topics[i], f"{self.heads[i]}{value:.2f}{tail}")
+            messages.append(message)
+            if times == 2:
+                messages.append(message)
+        return messages
+
+
+class NullSink:
+    """Discards messages; measures the generator on its own."""
+
+    def publish(self, topic: str, payload: str):
+        pass
+
+    def close(self):
+        pass
+
+
+class MQTTSink:
+    def __init__(self, host: str, port: int):
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.client.connect(host, port, 60)
+        self.client.loop_start()
+
+    def publish(self, topic: str, payload: str):
+        self.client.publish(topic, payload)
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+def make_sink(target: str):
+    if target == "null":
+        return NullSink()
+    host, _, port = target.partition(":")
+    return MQTTSink(host, int(port or 1883))
+
+
+def run_worker(profile: LoadProfile, worker: int, target: str, sent, stop):
+    """Publish one worker's share of the load on the profile's schedule.
+
+    ``prefill`` seconds of messages are generated before the clock starts,
+    and more are generated only while the worker is ahead of schedule, so
+    publishing never waits on generation.
+    """
+    generator = LoadGenerator(profile, worker, profile.processes)
+    sink = make_sink(target)
+    capacity = max(1, int(profile.prefill / profile.tick))
+    ready = deque(generator.next_tick() for _ in range(capacity))
+    total_ticks = (
+        None if profile.duration is None else int(profile.duration / profile.tick)
+    )
+
+    started = time.perf_counter()
+    tick = 0
     try:
-        simulator.start_simulation()
+        while not stop.is_set() and (total_ticks is None or tick < total_ticks):
+            if not ready:
+                ready.append(generator.next_tick())
+            messages = ready.popleft()
+            for topic, payload in messages:
+                sink.publish(topic, payload)
+            sent[worker] += len(messages)
+            tick += 1
+
+            deadline = started + tick * profile.tick
+            while len(ready) < capacity and time.perf_counter() < deadline:
+                ready.append(generator.next_tick())
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    finally:
+        sink.close()
+
+
+def run_load(profile: LoadProfile, target: str = "null", report=print) -> int:
+    """Run a load profile over ``profile.processes`` processes.
+
+    ``target`` is ``host[:port]`` of an MQTT broker, or ``null`` to discard
+    messages. Throughput is reported once a second. Returns the number of
+    messages sent.
+    """
+    sent = multiprocessing.Array("q", profile.processes)
+    stop = multiprocessing.Event()
+    workers = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(profile, worker, target, sent, stop),
+            daemon=True,
+        )
+        for worker in range(profile.processes)
+    ]
+    for process in workers:
+        process.start()
+
+    last, last_time = 0, time.perf_counter()
+    try:
+        while any(process.is_alive() for process in workers):
+            time.sleep(1.0)
+            total, now = sum(sent), time.perf_counter()
+            report(f"{total} sent, {(total - last) / (now - last_time):.0f} msg/s")
+            last, last_time = total, now
     except KeyboardInterrupt:
-        print("\nStopping sensor simulation...")
-        simulator.stop()
+        stop.set()
+    for process in workers:
+        process.join()
+    return sum(sent)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate IoT sensors over MQTT")
+    parser.add_argument(
+        "--load", action="store_true", help="Generate load instead of the demo sensors"
+    )
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=1.0, help="Messages/s per sensor")
+    parser.add_argument("--rate-spread", type=float, default=0.0)
+    parser.add_argument("--model", choices=VALUE_MODELS, default="sine")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duration", type=float, help="Seconds (default: forever)")
+    parser.add_argument("--burst-every", type=float, default=0.0)
+    parser.add_argument("--burst-length", type=float, default=0.0)
+    parser.add_argument("--burst-factor", type=float, default=1.0)
+    parser.add_argument("--out-of-order", type=float, default=0.0)
+    parser.add_argument("--max-delay", type=float, default=30.0)
+    parser.add_argument("--duplicates", type=float, default=0.0)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tick", type=float, default=0.05)
+    parser.add_argument("--start-time", type=datetime.fromisoformat)
+    parser.add_argument(
+        "--target",
+        default=(
+            f"{os.getenv('MQTT_BROKER_HOST', '0.0.0.0')}:"
+            f"{os.getenv('MQTT_BROKER_PORT', 1883)}"
+        ),
+        help="MQTT broker host:port, or 'null' to discard messages",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.load:
+        simulator = SensorSimulator(verbose=args.verbose)
+        try:
+            simulator.start_simulation()
+        except KeyboardInterrupt:
+            print("\nStopping sensor simulation...")
+            simulator.stop()
+        return 0
+
+    profile = LoadProfile(
+        sensors=args.sensors,
+        rate=args.rate,
+        rate_spread=args.rate_spread,
+        model=args.model,
+        seed=args.seed,
+        duration=args.duration,
+        burst_every=args.burst_every,
+        burst_length=args.burst_length,
+        burst_factor=args.burst_factor,
+        out_of_order=args.out_of_order,
+        max_delay=args.max_delay,
+        duplicates=args.duplicates,
+        processes=args.processes,
+        tick=args.tick,
+        start_time=args.start_time or datetime.now(),
+    )
+    print(
+        f"Generating load: {profile.sensors} sensors at {profile.rate} msg/s each "
+        f"over {profile.processes} processes -> {args.target}"
+    )
+    total = run_load(profile, args.target)
+    print(f"Sent {total} messages")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
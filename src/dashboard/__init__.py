@@ -5,7 +5,7 @@ from flask import Flask
 from flask_socketio import SocketIO
 
 # Initialize SocketIO
-socketio = SocketIO(cors_allowed_origins="*", logger=True, engineio_logger=True)
+socketio = SocketIO(cors_allowed_origins="*")
 
 
 def create_app(config_name=None):
@@ -27,7 +27,11 @@ def create_app(config_name=None):
             "CELERY_BROKER_URL": os.getenv(
                 "CELERY_BROKER_URL", "redis://localhost:6379/0"
             ),
+            "SOCKETIO_MESSAGE_QUEUE": os.getenv("SOCKETIO_MESSAGE_QUEUE"),
+            "SOCKETIO_CHANNEL": os.getenv("SOCKETIO_CHANNEL", "iot-dashboard"),
+            "SOCKETIO_ASYNC_MODE": os.getenv("SOCKETIO_ASYNC_MODE", "threading"),
             "LOG_LEVEL": os.getenv("LOG_LEVEL", "INFO"),
+            "SOCKETIO_LOGGER": os.getenv("SOCKETIO_LOGGER", "false").lower() == "true",
             "ENVIRONMENT": os.getenv("FLASK_ENV", "development"),
         }
     )
@@ -39,9 +43,12 @@ def create_app(config_name=None):
     socketio.init_app(
         app,
         cors_allowed_origins="*",
-        async_mode="threading",
-        logger=app.config["ENVIRONMENT"] == "development",
-        engineio_logger=app.config["ENVIRONMENT"] == "development",
+        async_mode=app.config["SOCKETIO_ASYNC_MODE"],
+        logger=app.config["SOCKETIO_LOGGER"],
+        engineio_logger=app.config["SOCKETIO_LOGGER"],
+        **message_queue_options(
+            app.config["SOCKETIO_MESSAGE_QUEUE"], app.config["SOCKETIO_CHANNEL"]
+        ),
     )
 
     # Register blueprints
@@ -55,11 +62,6 @@ def create_app(config_name=None):
     # Register SocketIO handlers
     from . import realtime
 
-    # Health check endpoint
-    @app.route("/health")
-    def health_check():
-        return {"status": "healthy", "version": "1.0.0"}, 200
-
     app.logger.info(
         f"Flask application created successfully (Environment: {app.config['ENVIRONMENT']})"
     )
@@ -67,34 +69,59 @@ def create_app(config_name=None):
     return app
 
 
-def setup_logging(app):
-    """Configure enhanced logging."""
-    log_level = getattr(logging, app.config["LOG_LEVEL"].upper(), logging.INFO)
+def message_queue_options(url=None, channel="iot-dashboard", write_only=False):
+    """Build the SocketIO keyword arguments for an optional message queue.
 
-    # Remove default handlers
-    for handler in app.logger.handlers[:]:
-        app.logger.removeHandler(handler)
+    ``redis://`` URLs share broadcasts between web workers in production;
+    any other URL goes through Kombu, so ``memory://`` works as an
+    in-process stand-in for tests. Without a URL the default in-process
+    client manager is restored, even if a previous ``init_app`` call
+    configured a queue on the shared ``socketio`` instance.
+    """
+    if not url:
+        return {"message_queue": None, "client_manager": None}
+
+    from .realtime import queue_manager
+
+    return {
+        "message_queue": url,
+        "client_manager": queue_manager(url, channel, write_only=write_only),
+    }
+
+
+def init_emitter(message_queue=None, channel=None):
+    """Configure ``socketio`` as a write-only emitter for ingest processes.
 
-    # Create formatter
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    Ingest processes (the MQTT client, Celery workers) publish each update
+    once to the message queue and every web worker attached to the same
+    queue delivers it to its own clients.
+    """
+    message_queue = message_queue or os.getenv("SOCKETIO_MESSAGE_QUEUE")
+    if not message_queue:
+        raise ValueError("A Socket.IO message queue URL is required for emitters")
+    channel = channel or os.getenv("SOCKETIO_CHANNEL", "iot-dashboard")
+    socketio.init_app(
+        None, **message_queue_options(message_queue, channel, write_only=True)
     )
+    return socketio
+
 
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(log_level)
+def setup_logging(app):
+    """Configure enhanced logging.
 
-    # Configure app logger
-    app.logger.addHandler(console_handler)
+    Records go through the root logger's handler, which by default queues
+    them for a background thread to write (see ``logs.configure_logging``).
+    """
+    from .logs import configure_logging
+
+    log_level = getattr(logging, app.config["LOG_LEVEL"].upper(), logging.INFO)
+
+    # Remove default handlers; the app logger propagates to the root handler
+    for handler in app.logger.handlers[:]:
+        app.logger.removeHandler(handler)
     app.logger.setLevel(log_level)
 
-    # Configure root logger
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[console_handler],
-    )
+    configure_logging(app.config["LOG_LEVEL"])
 
 
 def register_error_handlers(app):
@@ -0,0 +1,133 @@
+import re
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+ROLLUP_SECONDS = 60
+ROLLUP_FUNCTIONS = {"avg", "min", "max", "count", "sum"}
+BASIC_FUNCTIONS = {
+    "avg": "mean",
+    "min": "min",
+    "max": "max",
+    "count": "count",
+    "sum": "sum",
+}
+PERCENTILE = re.compile(r"^p(\d{1,2}(\.\d+)?|100)$")
+
+
+def parse_bucket(bucket: str) -> int:
+    """Parse a bucket width such as ``30s``, ``5m``, ``1h`` or ``1d`` into seconds."""
+    match = re.fullmatch(r"(\d+)([smhd])", bucket or "")
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid bucket: {bucket}")
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2)]
+
+
+def parse_functions(functions: str) -> List[str]:
+    """Parse a comma-separated list of aggregate functions (``avg,max,p95``)."""
+    parsed = [f.strip() for f in (functions or "").split(",") if f.strip()]
+    if not parsed:
+        raise ValueError("At least one aggregate function is required")
+    for function in parsed:
+        if function not in BASIC_FUNCTIONS and not PERCENTILE.match(function):
+            raise ValueError(f"Unsupported aggregate function: {function}")
+    return parsed
+
+
+def can_use_rollups(bucket_seconds: int, functions: Sequence[str]) -> bool:
+    """Rollups answer whole-minute buckets for functions that merge exactly."""
+    return bucket_seconds % ROLLUP_SECONDS == 0 and set(functions) <= ROLLUP_FUNCTIONS
+
+
+def _bucket_keys(times: np.ndarray, bucket_seconds: int) -> np.ndarray:
+    seconds = times.astype("datetime64[s]").astype(np.int64)
+    return seconds // bucket_seconds * bucket_seconds
+
+
+def _empty(functions) -> Dict[str, List[float]]:
+    return {function: [] for function in functions}
+
+
+def _result(keys: np.ndarray, columns: Dict[str, Any], functions) -> Dict[str, Any]:
+    buckets = pd.to_datetime(keys, unit="s")
+    result: Dict[str, Any] = {
+        "buckets": [b.isoformat() for b in buckets],
+    }
+    for function in functions:
+        values = np.asarray(columns[function], dtype=float)
+        if function == "count":
+            result[function] = values.astype(np.int64).tolist()
+        else:
+            result[function] = [None if np.isnan(v) else float(v) for v in values]
+    return result
+
+
+def aggregate_raw(
+    times: np.ndarray, values: np.ndarray, bucket_seconds: int, functions
+) -> Dict[str, Any]:
+    """Aggregate raw readings into fixed-width time buckets.
+
+    ``times`` is a ``datetime64`` array and ``values`` a float array of the
+    same length. Buckets are aligned to the Unix epoch and only non-empty
+    buckets are returned.
+    """
+    if len(values) == 0:
+        return _result(np.array([], dtype=np.int64), _empty(functions), functions)
+
+    grouped = pd.Series(values).groupby(_bucket_keys(times, bucket_seconds))
+    columns = {}
+    for function in functions:
+        if function in BASIC_FUNCTIONS:
+            columns[function] = grouped.agg(BASIC_FUNCTIONS[function]).to_numpy()
+        else:
+            columns[function] = grouped.quantile(float(function[1:]) / 100).to_numpy()
+    keys = np.asarray(grouped.size().index, dtype=np.int64)
+    return _result(keys, columns, functions)
+
+
+def rollup_raw(times: np.ndarray, values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Roll raw readings up into one-minute ``count``/``sum``/``min``/``max``.
+
+    Returns ``minutes`` alongside, in the shape ``aggregate_rollups`` takes.
+    """
+    grouped = pd.Series(values, dtype=float).groupby(
+        times.astype("datetime64[m]").astype("datetime64[s]")
+    )
+    merged = grouped.agg(["count", "sum", "min", "max"])
+    return {
+        "minutes": merged.index.to_numpy().astype("datetime64[s]"),
+        "counts": merged["count"].to_numpy(dtype=np.int64),
+        "sums": merged["sum"].to_numpy(),
+        "mins": merged["min"].to_numpy(),
+        "maxs": merged["max"].to_numpy(),
+    }
+
+
+def aggregate_rollups(
+    minutes: np.ndarray,
+    counts: np.ndarray,
+    sums: np.ndarray,
+    mins: np.ndarray,
+    maxs: np.ndarray,
+    bucket_seconds: int,
+    functions,
+) -> Dict[str, Any]:
+    """Merge one-minute rollups into coarser buckets."""
+    if len(counts) == 0:
+        return _result(np.array([], dtype=np.int64), _empty(functions), functions)
+
+    frame = pd.DataFrame({"count": counts, "sum": sums, "min": mins, "max": maxs})
+    merged = frame.groupby(_bucket_keys(minutes, bucket_seconds)).agg(
+        {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+    )
+    columns = {
+        "count": merged["count"].to_numpy(),
+        "sum": merged["sum"].to_numpy(),
+        "min": merged["min"].to_numpy(),
+        "max": merged["max"].to_numpy(),
+    }
+    columns["avg"] = columns["sum"] / columns["count"]
+    keys = np.asarray(merged.index, dtype=np.int64)
+    return _result(keys, columns, functions)
@@ -0,0 +1,391 @@
+import heapq
+import json
+import logging
+import operator
+import queue
+import threading
+import time
+import urllib.request
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RULE_KINDS = ("threshold", "rate", "absence")
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+DIRECTIONS = ("any", "up", "down")
+
+
+@dataclass
+class AlertRule:
+    """A user-defined alert rule.
+
+    ``threshold`` fires when ``value op threshold`` has held for ``duration``
+    seconds, ``rate`` when the change per ``per`` seconds (in percent of the
+    previous value if ``percent``) satisfies ``op``, and ``absence`` when a
+    sensor has sent nothing for ``duration`` seconds. Rules apply to the
+    sensors matching every given selector, or to all sensors.
+    """
+
+    id: str
+    kind: str
+    name: str = ""
+    sensor_ids: list[str] | None = None
+    sensor_type: str | None = None
+    location: str | None = None
+    tag: str | None = None
+    op: str = ">"
+    threshold: float = 0.0
+    duration: float = 0.0
+    per: float = 60.0
+    percent: bool = False
+    direction: str = "any"
+
+    def matches(
+        self,
+        sensor_id: str,
+        sensor_type: str | None,
+        location: str | None,
+        tags: Iterable[str],
+    ) -> bool:
+        if self.sensor_ids is not None and sensor_id not in self.sensor_ids:
+            return False
+        if self.sensor_type is not None and sensor_type != self.sensor_type:
+            return False
+        if self.location is not None and location != self.location:
+            return False
+        if self.tag is not None and self.tag not in tags:
+            return False
+        return True
+
+    def describe(self) -> str:
+        if self.kind == "absence":
+            return f"no data for {self.duration:g}s"
+        if self.kind == "rate":
+            unit = "%" if self.percent else ""
+            return f"change {self.op} {self.threshold:g}{unit}/{self.per:g}s"
+        condition = f"value {self.op} {self.threshold:g}"
+        return f"{condition} for {self.duration:g}s" if self.duration else condition
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AlertRule":
+        """Validate a rule definition; raises ValueError if it is invalid."""
+        try:
+            kind = data["kind"]
+            if kind not in RULE_KINDS:
+                raise ValueError(f"'kind' must be one of {', '.join(RULE_KINDS)}")
+            sensor_ids = data.get("sensor_ids")
+            if isinstance(sensor_ids, str):
+                sensor_ids = [sensor_ids]
+            rule = cls(
+                id=str(data.get("id") or uuid.uuid4().hex[:12]),
+                kind=kind,
+                name=str(data.get("name", "")),
+                sensor_ids=list(sensor_ids) if sensor_ids is not None else None,
+                sensor_type=data.get("type", data.get("sensor_type")),
+                location=data.get("location"),
+                tag=data.get("tag"),
+                op=data.get("op", ">"),
+                threshold=float(data.get("threshold", 0.0)),
+                duration=float(data.get("duration", 0.0)),
+                per=float(data.get("per", 60.0)),
+                percent=bool(data.get("percent", False)),
+                direction=data.get("direction", "any"),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid alert rule: {e}")
+
+        if rule.op not in OPERATORS:
+            raise ValueError(f"Invalid alert rule: unsupported op {rule.op!r}")
+        if rule.direction not in DIRECTIONS:
+            raise ValueError(
+                f"Invalid alert rule: unsupported direction {rule.direction!r}"
+            )
+        if rule.duration < 0 or rule.per <= 0:
+            raise ValueError("Invalid alert rule: durations must be positive")
+        if rule.kind == "absence" and not rule.duration:
+            raise ValueError("Invalid alert rule: absence rules need a duration")
+        return rule
+
+
+@dataclass
+class RuleState:
+    """Incremental state of one rule for one sensor."""
+
+    firing: bool = False
+    since: datetime | None = None
+    last_time: datetime | None = None
+    last_value: float | None = None
+    deadline: float | None = None
+    # Deadline of this state's entry in the absence heap, if it has one
+    queued: float | None = None
+    alert: dict[str, Any] | None = field(default=None, repr=False)
+
+
+class AlertEngine:
+    """Evaluate alert rules incrementally as readings arrive.
+
+    Each sensor's matching rules are resolved once and kept in a
+    sensor-to-rules index, so a reading costs one step of each matching
+    rule's state machine. Absence rules keep a deadline per sensor in a
+    heap; ``check_absence`` only looks at deadlines that have passed. Each
+    sensor has at most one heap entry per rule: a reading only moves the
+    deadline in its state, and an entry popped before that deadline is
+    pushed back with it. ``watch`` starts deadlines for sensors that have
+    not reported since the rules were set, so a sensor already quiet still
+    fires.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rules: Dict[str, AlertRule] = {}
+        self.rules_version: Any = None
+        self.rules_checked = 0.0
+        self.running = False
+        self._index: Dict[str, Tuple[Tuple, List[AlertRule]]] = {}
+        self._states: Dict[Tuple[str, str], RuleState] = {}
+        self._deadlines: List[Tuple[float, str, str]] = []
+
+    def set_rules(self, rules: Iterable[AlertRule], version: Any = None):
+        """Replace the rule set, keeping the state of unchanged rules."""
+        with self.lock:
+            previous = self.rules
+            self.rules = {rule.id: rule for rule in rules}
+            self.rules_version = version
+            self._index.clear()
+            self._states = {
+                key: state
+                for key, state in self._states.items()
+                if previous.get(key[0]) == self.rules.get(key[0])
+            }
+
+    def rules_for(
+        self,
+        sensor_id: str,
+        sensor_type: str | None = None,
+        location: str | None = None,
+        tags: Iterable[str] = (),
+    ) -> List[AlertRule]:
+        """Rules matching a sensor, through the sensor-to-rules index."""
+        signature = (sensor_type, location, tuple(tags or ()))
+        cached = self._index.get(sensor_id)
+        if cached is None or cached[0] != signature:
+            matching = [
+                rule
+                for rule in self.rules.values()
+                if rule.matches(sensor_id, sensor_type, location, signature[2])
+            ]
+            cached = self._index[sensor_id] = (signature, matching)
+        return cached[1]
+
+    def evaluate(
+        self,
+        sensor_id: str,
+        timestamp: datetime,
+        value: float,
+        sensor_type: str | None = None,
+        location: str | None = None,
+        tags: Iterable[str] = (),
+        now: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Advance the rules matching a sensor and return any alert changes."""
+        now = time.monotonic() if now is None else now
+        alerts = []
+        with self.lock:
+            for rule in self.rules_for(sensor_id, sensor_type, location, tags):
+                key = (rule.id, sensor_id)
+                state = self._states.get(key)
+                if state is None:
+                    state = self._states[key] = RuleState()
+                if rule.kind == "absence":
+                    firing = False
+                    state.deadline = now + rule.duration
+                    if state.queued is None:
+                        state.queued = state.deadline
+                        heapq.heappush(
+                            self._deadlines, (state.deadline, rule.id, sensor_id)
+                        )
+                else:
+                    firing = self._step(rule, state, sensor_id, timestamp, value)
+
+                if firing != state.firing:
+                    state.firing = firing
+                    alerts.append(self._transition(rule, state, sensor_id, value))
+                state.last_time = timestamp
+                state.last_value = value
+        return alerts
+
+    def watch(
+        self,
+        sensor_id: str,
+        sensor_type: str | None = None,
+        location: str | None = None,
+        tags: Iterable[str] = (),
+        silent_for: float = 0.0,
+        now: Optional[float] = None,
+    ):
+        """Start the absence deadlines of a sensor that has not reported yet.
+
+        ``silent_for`` is how long ago its last reading was; rules that
+        already track the sensor are left alone.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for rule in self.rules_for(sensor_id, sensor_type, location, tags):
+                key = (rule.id, sensor_id)
+                if rule.kind != "absence" or key in self._states:
+                    continue
+                state = self._states[key] = RuleState()
+                state.deadline = state.queued = now - silent_for + rule.duration
+                heapq.heappush(self._deadlines, (state.deadline, rule.id, sensor_id))
+
+    def _step(self, rule, state, sensor_id, timestamp, value) -> bool:
+        step = self._step_rate if rule.kind == "rate" else self._step_threshold
+        try:
+            return step(rule, state, timestamp, value)
+        except (TypeError, ValueError, ZeroDivisionError) as e:
+            # Start the rule over from this reading rather than leave its
+            # state stuck on one it cannot be compared with
+            logger.warning(
+                f"Restarting alert rule {rule.id} for sensor {sensor_id}: {e}"
+            )
+            state.since = state.last_time = None
+            return step(rule, state, timestamp, value)
+
+    def _step_threshold(self, rule, state, timestamp, value) -> bool:
+        if not OPERATORS[rule.op](value, rule.threshold):
+            state.since = None
+            return False
+        if state.since is None:
+            state.since = timestamp
+        return (timestamp - state.since).total_seconds() >= rule.duration
+
+    def _step_rate(self, rule, state, timestamp, value) -> bool:
+        if state.last_time is None:
+            return state.firing
+        elapsed = (timestamp - state.last_time).total_seconds()
+        if elapsed <= 0:
+            return state.firing
+        change = (value - state.last_value) / elapsed * rule.per
+        if rule.percent:
+            if not state.last_value:
+                return state.firing
+            change = change / abs(state.last_value) * 100
+        if rule.direction == "any":
+            change = abs(change)
+        elif rule.direction == "down":
+            change = -change
+        return OPERATORS[rule.op](change, rule.threshold)
+
+    def _transition(self, rule, state, sensor_id, value) -> Dict[str, Any]:
+        alert = {
+            "rule_id": rule.id,
+            "rule_name": rule.name or rule.id,
+            "kind": rule.kind,
+            "sensor_id": sensor_id,
+            "state": "firing" if state.firing else "resolved",
+            "condition": rule.describe(),
+            "value": value,
+            "timestamp": datetime.now().isoformat(),
+        }
+        state.alert = alert if state.firing else None
+        return alert
+
+    def check_absence(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Fire absence rules whose sensors have gone quiet."""
+        now = time.monotonic() if now is None else now
+        alerts = []
+        with self.lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                deadline, rule_id, sensor_id = heapq.heappop(self._deadlines)
+                state = self._states.get((rule_id, sensor_id))
+                rule = self.rules.get(rule_id)
+                if rule is None or state is None or state.queued != deadline:
+                    continue
+                if state.deadline > deadline:
+                    # Readings arrived since; wait for the latest deadline
+                    state.queued = state.deadline
+                    heapq.heappush(
+                        self._deadlines, (state.deadline, rule_id, sensor_id)
+                    )
+                    continue
+                state.queued = None
+                if not state.firing:
+                    state.firing = True
+                    alerts.append(
+                        self._transition(rule, state, sensor_id, state.last_value)
+                    )
+        return alerts
+
+    def active(self) -> List[Dict[str, Any]]:
+        """Alerts that are currently firing."""
+        with self.lock:
+            return [s.alert for s in self._states.values() if s.firing and s.alert]
+
+    def run(self, notify: Callable[[Dict[str, Any]], None], interval: float = 1.0):
+        """Absence check loop; run it as a background thread."""
+        self.running = True
+        while self.running:
+            for alert in self.check_absence():
+                notify(alert)
+            time.sleep(interval)
+
+    def stop(self):
+        self.running = False
+
+
+class WebhookNotifier:
+    """Deliver alerts to a webhook without blocking ingest.
+
+    Every alert is kept in a bounded history. With a ``url`` configured it
+    is also POSTed as JSON from a background thread; without one this is a
+    stand-in that only records, like the Redis client stand-in in tasks.
+    """
+
+    def __init__(self, url: Optional[str] = None, history: int = 100, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+        self.history: deque = deque(maxlen=history)
+        self._queue: queue.Queue = queue.Queue(maxsize=1000)
+        self._worker: Optional[threading.Thread] = None
+
+    def send(self, alert: Dict[str, Any]):
+        self.history.append(alert)
+        if not self.url:
+            return
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._deliver, daemon=True)
+            self._worker.start()
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            logger.warning(f"Webhook queue full, dropped alert {alert['rule_id']}")
+
+    def _deliver(self):
+        while True:
+            alert = self._queue.get()
+            request = urllib.request.Request(
+                self.url,
+                data=json.dumps(alert).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    pass
+            except Exception as e:
+                logger.error(f"Error delivering alert to webhook: {e}")
+
+    def recent(self) -> List[Dict[str, Any]]:
+        return list(self.history)
@@ -0,0 +1,207 @@
+import math
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .file_storage import parse_timestamp
+
+SEASONS = 24
+
+
+def _step(alpha: float, n: int) -> float:
+    """Update weight for the ``n``-th sample of a bias-corrected EWMA.
+
+    Early samples are averaged almost uniformly rather than letting the
+    first one dominate, which matches pandas' ``ewm(adjust=True)``.
+    """
+    return alpha / (1.0 - (1.0 - alpha) ** n)
+
+
+class SensorModel:
+    """Incremental baseline for one sensor in constant memory.
+
+    Tracks an exponentially weighted mean of the values, an exponentially
+    weighted mean square of the residuals, and an hour-of-day baseline of 24
+    weighted means so daily cycles are not mistaken for anomalies. Sample
+    counts double as the bias-correction state of each average. ``last`` is
+    the newest reading time seen, so a restored model knows where to resume.
+    """
+
+    __slots__ = ("count", "mean", "msr", "season_mean", "season_count", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.msr: Optional[float] = None
+        self.season_mean = [0.0] * SEASONS
+        self.season_count = [0] * SEASONS
+        self.last: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "msr": self.msr,
+            "season_mean": self.season_mean,
+            "season_count": self.season_count,
+            "last": self.last.isoformat() if self.last is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SensorModel":
+        """Rebuild a model saved by ``to_dict``; raises ValueError if malformed."""
+        model = cls()
+        try:
+            model.count = int(data["count"])
+            model.mean = float(data["mean"])
+            model.msr = float(data["msr"]) if data["msr"] is not None else None
+            model.season_mean = [float(v) for v in data["season_mean"]]
+            model.season_count = [int(v) for v in data["season_count"]]
+            last = data.get("last")
+            model.last = parse_timestamp(last) if last else None
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Malformed sensor model: {e}") from e
+        if len(model.season_mean) != SEASONS or len(model.season_count) != SEASONS:
+            raise ValueError("Malformed sensor model: wrong number of seasons")
+        return model
+
+
+class AnomalyDetector:
+    """Score readings against per-sensor incremental models.
+
+    A reading's expected value is its hour-of-day baseline once that hour
+    has ``seasonal_min`` samples, and the overall weighted mean before that.
+    Its score is the residual divided by the typical residual size, and
+    readings scoring ``threshold`` or more are flagged once the sensor has
+    seen ``warmup`` readings. Every reading updates the model afterwards,
+    so a sensor that settles at a new level stops being flagged.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.05,
+        seasonal_alpha: float = 0.1,
+        threshold: float = 4.0,
+        warmup: int = 30,
+        seasonal_min: int = 7,
+        min_std: float = 1e-6,
+    ):
+        self.alpha = alpha
+        self.seasonal_alpha = seasonal_alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.seasonal_min = seasonal_min
+        self.min_std = min_std
+        self.lock = threading.Lock()
+        self.models: Dict[str, SensorModel] = {}
+
+    def score(
+        self, sensor_id: str, timestamp: datetime, value: float
+    ) -> Optional[Dict[str, Any]]:
+        """Update a sensor's model; return ``{score, expected}`` if anomalous."""
+        hour = timestamp.hour
+        with self.lock:
+            model = self.models.get(sensor_id)
+            if model is None:
+                model = self.models[sensor_id] = SensorModel()
+
+            flag = None
+            if model.count:
+                if model.season_count[hour] >= self.seasonal_min:
+                    expected = model.season_mean[hour]
+                else:
+                    expected = model.mean
+                residual = value - expected
+                if model.count >= self.warmup and model.msr is not None:
+                    z = residual / max(math.sqrt(model.msr), self.min_std)
+                    if abs(z) >= self.threshold:
+                        flag = {"score": round(z, 2), "expected": round(expected, 4)}
+                if model.msr is None:
+                    model.msr = residual * residual
+                else:
+                    model.msr += _step(self.alpha, model.count) * (
+                        residual * residual - model.msr
+                    )
+                model.mean += _step(self.alpha, model.count + 1) * (value - model.mean)
+            else:
+                model.mean = value
+
+            seen = model.season_count[hour] + 1
+            model.season_mean[hour] += _step(self.seasonal_alpha, seen) * (
+                value - model.season_mean[hour]
+            )
+            model.season_count[hour] = seen
+            model.count += 1
+            if model.last is None or timestamp > model.last:
+                model.last = timestamp
+            return flag
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """All sensor models by sensor id."""
+        with self.lock:
+            return {
+                sensor_id: model.to_dict() for sensor_id, model in self.models.items()
+            }
+
+    def load(self, data: Dict[str, Dict[str, Any]]):
+        """Replace the models with ones saved by ``to_dict``.
+
+        Raises ValueError, leaving the current models, if any is malformed.
+        """
+        models = {
+            sensor_id: SensorModel.from_dict(model) for sensor_id, model in data.items()
+        }
+        with self.lock:
+            self.models = models
+
+    def last_seen(self) -> Dict[str, datetime]:
+        """The newest reading time each model has seen."""
+        with self.lock:
+            return {
+                sensor_id: model.last
+                for sensor_id, model in self.models.items()
+                if model.last is not None
+            }
+
+    def reset(self, sensor_id: Optional[str] = None):
+        """Forget one sensor's model, or all of them."""
+        with self.lock:
+            if sensor_id is None:
+                self.models.clear()
+            else:
+                self.models.pop(sensor_id, None)
+
+    def score_history(
+        self, times: np.ndarray, values: np.ndarray, threshold: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Re-score a time-ordered history in one vectorized pass.
+
+        Returns the expected values, the scores and a boolean anomaly mask.
+        Replaying the same readings through ``score`` from a fresh model
+        flags the same points.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        if len(values) == 0:
+            empty = np.array([], dtype=float)
+            return empty, empty, np.array([], dtype=bool)
+
+        series = pd.Series(np.asarray(values, dtype=float))
+        hours = pd.DatetimeIndex(times).hour
+
+        overall = series.ewm(alpha=self.alpha).mean().shift(1)
+        by_hour = series.groupby(hours)
+        seasonal = by_hour.transform(
+            lambda s: s.ewm(alpha=self.seasonal_alpha).mean().shift(1)
+        )
+        expected = seasonal.where(by_hour.cumcount() >= self.seasonal_min, overall)
+
+        residual = series - expected
+        msr = (residual**2).ewm(alpha=self.alpha).mean().shift(1)
+        scores = residual / np.sqrt(msr).clip(lower=self.min_std)
+
+        eligible = (np.arange(len(series)) >= self.warmup) & msr.notna().to_numpy()
+        anomalies = eligible & (scores.abs() >= threshold).to_numpy()
+        return expected.to_numpy(), scores.to_numpy(), anomalies
@@ -0,0 +1,101 @@
+import json
+import struct
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+BINARY_CONTENT_TYPE = "application/x-sensor-batch"
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
+
+# Compact binary batch: a header of magic, version and record count, then
+# per record a length-prefixed UTF-8 sensor id, a Unix timestamp and a value.
+BINARY_MAGIC = b"IOTB"
+BINARY_VERSION = 1
+_HEADER = struct.Struct("<4sBI")
+_ID_LENGTH = struct.Struct("<B")
+_POINT = struct.Struct("<dd")
+
+
+def encode_binary_batch(readings: Iterable[Dict[str, Any]]) -> bytes:
+    """Encode ``{"sensor_id", "timestamp", "value"}`` dicts as a binary batch.
+
+    ``timestamp`` may be a datetime, an ISO string or Unix seconds.
+    """
+    records = []
+    for reading in readings:
+        sensor_id = reading["sensor_id"].encode("utf-8")
+        if len(sensor_id) > 255:
+            raise ValueError(f"Sensor id too long: {reading['sensor_id']}")
+        timestamp = reading["timestamp"]
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        records.append(
+            _ID_LENGTH.pack(len(sensor_id))
+            + sensor_id
+            + _POINT.pack(float(timestamp), float(reading["value"]))
+        )
+    return _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(records)) + b"".join(records)
+
+
+def decode_binary_batch(body: bytes) -> List[Dict[str, Any]]:
+    """Decode a binary batch; raises ValueError if the body is malformed."""
+    try:
+        magic, version, count = _HEADER.unpack_from(body, 0)
+    except struct.error:
+        raise ValueError("Truncated binary batch header")
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Unsupported binary batch format")
+
+    items = []
+    offset = _HEADER.size
+    try:
+        for _ in range(count):
+            (length,) = _ID_LENGTH.unpack_from(body, offset)
+            offset += _ID_LENGTH.size
+            sensor_id = body[offset : offset + length].decode("utf-8")
+            offset += length
+            timestamp, value = _POINT.unpack_from(body, offset)
+            offset += _POINT.size
+            items.append(
+                {
+                    "sensor_id": sensor_id,
+                    "value": value,
+                    "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+                }
+            )
+    except (struct.error, UnicodeDecodeError):
+        raise ValueError(f"Truncated binary batch after {len(items)} records")
+    return items
+
+
+def decode_batch(body: bytes, content_type: str) -> List[Any]:
+    """Decode a request body into a list of readings.
+
+    JSON bodies must be an array. In NDJSON bodies each line is decoded on
+    its own, and a line that is not valid JSON is returned as a ValueError
+    in its place so it can be reported without rejecting the batch.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type == BINARY_CONTENT_TYPE:
+        return decode_binary_batch(body)
+
+    text = body.decode("utf-8")
+    if content_type in NDJSON_CONTENT_TYPES:
+        items = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                items.append(ValueError(f"Invalid sensor data format: {e}"))
+        return items
+
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON body: {e}")
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of readings")
+    return items
@@ -0,0 +1,317 @@
+import argparse
+import logging
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# MQTT 3.1.1 control packet types
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """Whether ``topic`` matches a filter with ``+`` and ``#`` wildcards."""
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    if topic.startswith("$") and filter_levels[0] in ("+", "#"):
+        return False
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[i]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+def _encode_length(length: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def _packet(header: int, body: bytes) -> bytes:
+    return bytes([header]) + _encode_length(len(body)) + body
+
+
+def _string(data: bytes, offset: int) -> Tuple[str, int]:
+    (length,) = struct.unpack_from("!H", data, offset)
+    start = offset + 2
+    return data[start : start + length].decode("utf-8"), start + length
+
+
+class Session:
+    """One connected client: its socket, subscriptions and packet ids."""
+
+    def __init__(self, broker: "MQTTBroker", conn: socket.socket):
+        self.broker = broker
+        self.conn = conn
+        self.reader = conn.makefile("rb")
+        self.client_id = ""
+        self.subscriptions: Dict[str, int] = {}
+        self.send_lock = threading.Lock()
+        self._next_id = 0
+
+    def send(self, data: bytes):
+        with self.send_lock:
+            self.conn.sendall(data)
+
+    def packet_id(self) -> int:
+        self._next_id = self._next_id % 65535 + 1
+        return self._next_id
+
+    def _read_exact(self, size: int) -> bytes:
+        data = self.reader.read(size)
+        if len(data) < size:
+            raise ConnectionError("Client closed the connection")
+        return data
+
+    def read_packet(self) -> Tuple[int, int, bytes]:
+        header = self._read_exact(1)[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = self._read_exact(1)[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        return header >> 4, header & 0x0F, self._read_exact(length)
+
+    def run(self):
+        try:
+            while True:
+                kind, flags, body = self.read_packet()
+                if kind == DISCONNECT:
+                    break
+                self.handle(kind, flags, body)
+        except (ConnectionError, OSError):
+            pass
+        except Exception as e:
+            logger.error(f"Error in MQTT session {self.client_id}: {e}")
+        finally:
+            self.broker.remove(self)
+            self.reader.close()
+            self.conn.close()
+
+    def handle(self, kind: int, flags: int, body: bytes):
+        if kind == CONNECT:
+            # Protocol name, level, connect flags and keep-alive precede the id
+            _, offset = _string(body, 0)
+            self.client_id, _ = _string(body, offset + 4)
+            self.send(_packet(CONNACK << 4, b"\x00\x00"))
+        elif kind == PUBLISH:
+            qos = (flags >> 1) & 0x03
+            topic, offset = _string(body, 0)
+            if qos:
+                (packet_id,) = struct.unpack_from("!H", body, offset)
+                offset += 2
+                self.send(_packet(PUBACK << 4, struct.pack("!H", packet_id)))
+            self.broker.route(topic, body[offset:], qos)
+        elif kind == SUBSCRIBE:
+            (packet_id,) = struct.unpack_from("!H", body, 0)
+            offset, granted = 2, bytearray()
+            while offset < len(body):
+                topic_filter, offset = _string(body, offset)
+                qos = min(body[offset], 1)
+                offset += 1
+                self.subscriptions[topic_filter] = qos
+                granted.append(qos)
+            self.send(
+                _packet(SUBACK << 4, struct.pack("!H", packet_id) + bytes(granted))
+            )
+        elif kind == UNSUBSCRIBE:
+            (packet_id,) = struct.unpack_from("!H", body, 0)
+            offset = 2
+            while offset < len(body):
+                topic_filter, offset = _string(body, offset)
+                self.subscriptions.pop(topic_filter, None)
+            self.send(_packet(UNSUBACK << 4, struct.pack("!H", packet_id)))
+        elif kind == PINGREQ:
+            self.send(_packet(PINGRESP << 4, b""))
+        # PUBACKs from subscribers need no action: QoS 1 is not redelivered
+
+    def deliver(self, topic: bytes, payload: bytes, qos: int):
+        if qos:
+            header = PUBLISH << 4 | 0x02
+            body = topic + struct.pack("!H", self.packet_id()) + payload
+        else:
+            header = PUBLISH << 4
+            body = topic + payload
+        self.send(_packet(header, body))
+
+
+class MQTTBroker:
+    """A minimal in-process MQTT 3.1.1 broker for tests and benchmarks.
+
+    It supports CONNECT, SUBSCRIBE and UNSUBSCRIBE with ``+``/``#``
+    wildcards, PUBLISH at QoS 0 and 1, and PINGREQ, enough for paho clients
+    such as ``MQTTClient`` and the sensor simulator. QoS 1 messages are
+    acknowledged and delivered at most at the subscription's QoS, but not
+    stored or redelivered, and there are no retained messages, wills or
+    persistent sessions. Each client gets a thread; use mosquitto in
+    production.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.sessions: List[Session] = []
+        self.lock = threading.Lock()
+        self.received = 0
+        self.delivered = 0
+        self._server: Optional[socket.socket] = None
+
+    def start(self) -> int:
+        """Listen and accept clients in a background thread; returns the port."""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, self.port))
+        server.listen(128)
+        self._server = server
+        self.port = server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+        logger.info(f"Embedded MQTT broker listening on {self.host}:{self.port}")
+        return self.port
+
+    def _accept(self):
+        while self._server is not None:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = Session(self, conn)
+            with self.lock:
+                self.sessions.append(session)
+            threading.Thread(target=session.run, daemon=True).start()
+
+    def route(self, topic: str, payload: bytes, qos: int):
+        """Deliver a published message to every matching subscription."""
+        encoded = topic.encode("utf-8")
+        encoded = struct.pack("!H", len(encoded)) + encoded
+        with self.lock:
+            self.received += 1
+            sessions = list(self.sessions)
+        delivered = 0
+        for session in sessions:
+            granted = [
+                sub_qos
+                for topic_filter, sub_qos in list(session.subscriptions.items())
+                if topic_matches(topic_filter, topic)
+            ]
+            if not granted:
+                continue
+            try:
+                session.deliver(encoded, payload, min(qos, max(granted)))
+                delivered += 1
+            except OSError:
+                pass
+        with self.lock:
+            self.delivered += delivered
+
+    def remove(self, session: Session):
+        with self.lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+
+    def stop(self):
+        server, self._server = self._server, None
+        if server is not None:
+            # Shutting down wakes the thread blocked in accept()
+            try:
+                server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            server.close()
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            try:
+                session.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self) -> "MQTTBroker":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def wait_for_broker(host: str, port: int, timeout: float = 10.0) -> bool:
+    """Wait until something accepts connections on ``host:port``."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+
+
+def ensure_broker(port: int = 1883, embedded: bool = False) -> Optional[MQTTBroker]:
+    """Make sure an MQTT broker is listening on ``localhost:port``.
+
+    A broker that is already running is used as is. Otherwise mosquitto is
+    started if it is installed and ``embedded`` is false, and the embedded
+    broker if not; returns the embedded broker when one was started.
+    """
+    if wait_for_broker("127.0.0.1", port, timeout=0):
+        logger.info(f"MQTT broker already running on port {port}")
+        return None
+    if not embedded and shutil.which("mosquitto"):
+        subprocess.Popen(["mosquitto", "-d", "-p", str(port)])
+        if wait_for_broker("127.0.0.1", port):
+            logger.info("Mosquitto MQTT broker started")
+            return None
+        logger.warning("Mosquitto did not start, using the embedded broker")
+    broker = MQTTBroker(port=port)
+    broker.start()
+    return broker
+
+
+def main(argv=None):
+    """Run the embedded broker on its own, e.g. for benchmarks across processes."""
+    parser = argparse.ArgumentParser(description="Embedded MQTT broker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("MQTT_BROKER_PORT", 1883))
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    broker = MQTTBroker(args.host, args.port)
+    broker.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        broker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import struct
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+# Gorilla-style block: delta-of-delta timestamps and XOR-compressed values
+# (Pelkonen et al., "Gorilla: A Fast, Scalable, In-Memory Time Series
+# Database"). Timestamps are microseconds, so the delta-of-delta buckets are
+# wider than the paper's second-resolution ones.
+_DOD_BUCKETS = ((0b10, 2, 14), (0b110, 3, 24), (0b1110, 4, 32))
+_DOD_ESCAPE = (0b1111, 4, 64)
+
+# Archive frame: point count, first and last time, payload length
+_FRAME = struct.Struct("<Iqqi")
+
+
+class BitWriter:
+    def __init__(self):
+        self.buffer = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value: int, bits: int):
+        self._acc = (self._acc << bits) | (value & ((1 << bits) - 1))
+        self._bits += bits
+        while self._bits >= 8:
+            self._bits -= 8
+            self.buffer.append((self._acc >> self._bits) & 0xFF)
+        self._acc &= (1 << self._bits) - 1
+
+    def getvalue(self) -> bytes:
+        if self._bits:
+            return bytes(self.buffer) + bytes([(self._acc << (8 - self._bits)) & 0xFF])
+        return bytes(self.buffer)
+
+
+class BitReader:
+    def __init__(self, data: bytes):
+        # Padding lets every read take a fixed nine-byte window
+        self._data = bytes(data) + bytes(9)
+        self._size = len(data) * 8
+        self._position = 0
+
+    def read(self, bits: int) -> int:
+        position = self._position
+        self._position = position + bits
+        if self._position > self._size:
+            raise ValueError("Truncated compressed block")
+        index = position >> 3
+        window = int.from_bytes(self._data[index : index + 9], "big")
+        return (window >> (72 - (position & 7) - bits)) & ((1 << bits) - 1)
+
+    def read_bit(self) -> int:
+        position = self._position
+        self._position = position + 1
+        if self._position > self._size:
+            raise ValueError("Truncated compressed block")
+        return (self._data[position >> 3] >> (7 - (position & 7))) & 1
+
+
+def _signed(value: int, bits: int) -> int:
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def encode_block(times: np.ndarray, values: np.ndarray) -> bytes:
+    """Compress a time-ordered series into a Gorilla block.
+
+    ``times`` are ``datetime64`` values (kept to the microsecond) and
+    ``values`` floats. Regular intervals cost one bit per timestamp and an
+    unchanged value one bit; slowly changing values a few bits more.
+    """
+    micros = np.asarray(times, dtype="datetime64[us]").astype(np.int64).tolist()
+    bits = np.asarray(values, dtype=np.float64).view(np.uint64).tolist()
+    writer = BitWriter()
+    writer.write(len(micros), 32)
+    if not micros:
+        return writer.getvalue()
+
+    writer.write(micros[0], 64)
+    writer.write(bits[0], 64)
+    previous_time, previous_delta = micros[0], 0
+    previous_bits, leading, trailing = bits[0], 65, 0
+    for time, value in zip(micros[1:], bits[1:]):
+        delta = time - previous_time
+        dod = delta - previous_delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for prefix, prefix_bits, width in _DOD_BUCKETS:
+                if -(1 << (width - 1)) <= dod < (1 << (width - 1)):
+                    break
+            else:
+                prefix, prefix_bits, width = _DOD_ESCAPE
+            writer.write(prefix, prefix_bits)
+            writer.write(dod, width)
+        previous_time, previous_delta = time, delta
+
+        xor = value ^ previous_bits
+        previous_bits = value
+        if xor == 0:
+            writer.write(0, 1)
+            continue
+        new_leading = min(64 - xor.bit_length(), 31)
+        new_trailing = (xor & -xor).bit_length() - 1
+        if new_leading >= leading and new_trailing >= trailing:
+            # Fits in the previous meaningful-bit window
+            writer.write(0b10, 2)
+            writer.write(xor >> trailing, 64 - leading - trailing)
+        else:
+            leading, trailing = new_leading, new_trailing
+            length = 64 - leading - trailing
+            writer.write(0b11, 2)
+            writer.write(leading, 5)
+            writer.write(length & 0x3F, 6)
+            writer.write(xor >> trailing, length)
+    return writer.getvalue()
+
+
+def decode_block(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Decompress a block into ``datetime64[us]`` times and float64 values."""
+    reader = BitReader(data)
+    count = reader.read(32)
+    micros = np.empty(count, dtype=np.int64)
+    bits = np.empty(count, dtype=np.uint64)
+    if count:
+        time = _signed(reader.read(64), 64)
+        value = reader.read(64)
+        micros[0], bits[0] = time, value
+        delta, leading, trailing = 0, 0, 0
+        read, read_bit = reader.read, reader.read_bit
+        for i in range(1, count):
+            if read_bit():
+                width = 64
+                for _, _, bucket_width in _DOD_BUCKETS:
+                    if not read_bit():
+                        width = bucket_width
+                        break
+                delta += _signed(read(width), width)
+            time += delta
+            micros[i] = time
+
+            if read_bit():
+                if read_bit():
+                    leading = read(5)
+                    length = read(6) or 64
+                    trailing = 64 - leading - length
+                value ^= read(64 - leading - trailing) << trailing
+            bits[i] = value
+    return micros.astype("datetime64[us]"), bits.view(np.float64)
+
+
+def pack_frame(times: np.ndarray, values: np.ndarray) -> bytes:
+    """A block prefixed with its point count and time range, for archives."""
+    micros = np.asarray(times, dtype="datetime64[us]").astype(np.int64)
+    payload = encode_block(times, values)
+    return (
+        _FRAME.pack(len(micros), int(micros.min()), int(micros.max()), len(payload))
+        + payload
+    )
+
+
+def _micros(value: Optional[datetime]) -> Optional[int]:
+    if value is None:
+        return None
+    return int(np.datetime64(value, "us").astype(np.int64))
+
+
+def _frames(data: bytes) -> Iterator[Tuple[int, int, bytes]]:
+    """``(first, last, frame)`` for each complete frame of an archive."""
+    offset = 0
+    while offset + _FRAME.size <= len(data):
+        _, first, last, length = _FRAME.unpack_from(data, offset)
+        end = offset + _FRAME.size + length
+        if end > len(data):
+            break
+        yield first, last, data[offset:end]
+        offset = end
+
+
+def iter_frames(
+    data: bytes, start: Optional[datetime] = None, end: Optional[datetime] = None
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Decode the frames of an archive that overlap [start, end).
+
+    Frames entirely outside the range are skipped using their headers,
+    without being decompressed.
+    """
+    start_us, end_us = _micros(start), _micros(end)
+    for first, last, frame in _frames(data):
+        if start_us is not None and last < start_us:
+            continue
+        if end_us is not None and first >= end_us:
+            continue
+        yield decode_block(frame[_FRAME.size :])
+
+
+def iter_ordered_frames(
+    data: bytes, start: Optional[datetime] = None, end: Optional[datetime] = None
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """``iter_frames``, but in time order across frames.
+
+    Frames are taken by their first time; frames whose ranges overlap (a
+    late reading sealed after newer ones) are decoded together and sorted,
+    so only overlapping frames are ever held at once.
+    """
+    start_us, end_us = _micros(start), _micros(end)
+    frames = sorted(
+        (first, last, frame)
+        for first, last, frame in _frames(data)
+        if (start_us is None or last >= start_us) and (end_us is None or first < end_us)
+    )
+    index = 0
+    while index < len(frames):
+        _, last, frame = frames[index]
+        group = [decode_block(frame[_FRAME.size :])]
+        index += 1
+        while index < len(frames) and frames[index][0] <= last:
+            _, next_last, frame = frames[index]
+            group.append(decode_block(frame[_FRAME.size :]))
+            last = max(last, next_last)
+            index += 1
+        if len(group) == 1:
+            yield group[0]
+            continue
+        times = np.concatenate([times for times, _ in group])
+        values = np.concatenate([values for _, values in group])
+        order = np.argsort(times, kind="stable")
+        yield times[order], values[order]
+
+
+def drop_frames_before(data: bytes, cutoff: datetime) -> Tuple[bytes, int]:
+    """Remove frames whose points are all older than ``cutoff``.
+
+    Returns the remaining archive and the number of points removed.
+    """
+    cutoff_us = _micros(cutoff)
+    kept, dropped = [], 0
+    for _, last, frame in _frames(data):
+        if last < cutoff_us:
+            dropped += _FRAME.unpack_from(frame)[0]
+        else:
+            kept.append(frame)
+    return b"".join(kept), dropped
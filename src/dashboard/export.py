@@ -0,0 +1,179 @@
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = ["sensor_id", "timestamp", "value", "sensor_type", "unit", "location"]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def available_formats() -> List[str]:
+    """Export formats supported by the installed libraries."""
+    if pa is None:
+        return ["csv"]
+    return list(EXPORT_FORMATS)
+
+
+def iter_export_rows(
+    storage,
+    sensor_ids: Optional[Iterable[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_size: int = 10000,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield readings from storage as chunks of flat export rows.
+
+    Readings are pulled from storage as the chunks are consumed, one sensor
+    and archive block at a time, so only about a chunk is held in memory.
+    The storage lock is only taken to read files, never while the client
+    downloads.
+    """
+    chunk: List[Dict[str, Any]] = []
+    for sensor_id, rows in storage.iter_scan(sensor_ids, start, end):
+        for reading_time, reading in rows:
+            try:
+                value = float(reading["value"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            chunk.append(
+                {
+                    "sensor_id": sensor_id,
+                    "timestamp": reading_time,
+                    "value": value,
+                    "sensor_type": reading.get("sensor_type") or "",
+                    "unit": reading.get("unit") or "",
+                    "location": reading.get("location") or "",
+                }
+            )
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands back whatever was written so far."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def write_csv(chunks: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """Encode export chunks as CSV, one encoded block per chunk."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for chunk in chunks:
+        for row in chunk:
+            writer.writerow({**row, "timestamp": row["timestamp"].isoformat()})
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    remainder = buffer.getvalue()
+    if remainder:
+        yield remainder.encode("utf-8")
+
+
+def _arrow_schema():
+    return pa.schema(
+        [
+            ("sensor_id", pa.string()),
+            ("timestamp", pa.timestamp("us")),
+            ("value", pa.float64()),
+            ("sensor_type", pa.string()),
+            ("unit", pa.string()),
+            ("location", pa.string()),
+        ]
+    )
+
+
+def _to_batch(chunk: List[Dict[str, Any]], schema):
+    return pa.RecordBatch.from_pylist(chunk, schema=schema)
+
+
+def write_parquet(
+    chunks: Iterable[List[Dict[str, Any]]], compression: str = "zstd"
+) -> Iterator[bytes]:
+    """Encode export chunks as Parquet, one row group per chunk."""
+    if pq is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+    try:
+        for chunk in chunks:
+            writer.write_batch(_to_batch(chunk, schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def write_arrow(
+    chunks: Iterable[List[Dict[str, Any]]], compression: str = "zstd"
+) -> Iterator[bytes]:
+    """Encode export chunks as an Arrow IPC stream, one batch per chunk."""
+    if pa is None:
+        raise RuntimeError("Arrow export requires pyarrow")
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    writer = pa.ipc.new_stream(sink, schema, options=options)
+    try:
+        for chunk in chunks:
+            writer.write_batch(_to_batch(chunk, schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet, "arrow": write_arrow}
+
+
+def export_readings(
+    storage,
+    fmt: str,
+    sensor_ids: Optional[Iterable[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_size: int = 10000,
+) -> Iterator[bytes]:
+    """Stream sensor history from storage in the requested format."""
+    if fmt not in available_formats():
+        raise ValueError(f"Unsupported export format: {fmt}")
+    chunks = iter_export_rows(storage, sensor_ids, start, end, chunk_size)
+    return WRITERS[fmt](chunks)
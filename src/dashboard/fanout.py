@@ -0,0 +1,197 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ClientQueue:
+    """Bounded outbound queue for one connection, conflated by sensor.
+
+    Only the newest pending update per sensor is kept, so a client that
+    cannot keep up receives the latest value of each sensor rather than
+    every intermediate one. The queue is capped both by entry count and by
+    serialized size; when full, the oldest pending sensor is dropped.
+    """
+
+    def __init__(self, sid: str, max_pending: int, max_bytes: int, acks: bool = False):
+        self.sid = sid
+        self.acks = acks
+        self.unacked = 0
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.pending: "OrderedDict[str, tuple]" = OrderedDict()
+        self.queued_bytes = 0
+        self.level = 0
+        self.next_flush = 0.0
+        self.transport_backlog = 0
+        self.sent = 0
+        self.conflated = 0
+        self.dropped = 0
+
+    def offer(self, key: str, update: Dict[str, Any], size: int):
+        """Queue an update, replacing any pending update for the same sensor."""
+        previous = self.pending.pop(key, None)
+        if previous is not None:
+            self.queued_bytes -= previous[1]
+            self.conflated += 1
+        while self.pending and (
+            len(self.pending) >= self.max_pending
+            or self.queued_bytes + size > self.max_bytes
+        ):
+            _, (_, dropped_size) = self.pending.popitem(last=False)
+            self.queued_bytes -= dropped_size
+            self.dropped += 1
+        self.pending[key] = (update, size)
+        self.queued_bytes += size
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Remove and return all pending updates, oldest first."""
+        updates = [update for update, _ in self.pending.values()]
+        self.pending.clear()
+        self.queued_bytes = 0
+        return updates
+
+
+class Fanout:
+    """Deliver updates to every connection through per-client queues.
+
+    A background loop flushes each client's queue. Before sending, it checks
+    how many updates the client has not acknowledged yet (for clients that
+    acknowledge, see ``acked``) or else how many frames are still waiting in
+    its transport, as reported by ``backlog``; a client
+    whose backlog exceeds ``slow_backlog`` is demoted to a lower update rate
+    (its flush period doubles per level) and keeps accumulating conflated
+    updates instead of more buffered frames. Clients that drain their backlog
+    are promoted back one level at a time.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, Dict[str, Any]], None],
+        backlog: Callable[[str], int] = lambda sid: 0,
+        max_pending: int = 1000,
+        max_bytes: int = 256 * 1024,
+        flush_interval: float = 0.05,
+        slow_backlog: int = 64,
+        max_level: int = 5,
+    ):
+        self.send = send
+        self.backlog = backlog
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.slow_backlog = slow_backlog
+        self.max_level = max_level
+        self.lock = threading.Lock()
+        self.clients: Dict[str, ClientQueue] = {}
+        self.running = False
+        self._wakeup = threading.Event()
+
+    def register(self, sid: str, acks: bool = False) -> ClientQueue:
+        with self.lock:
+            queue = self.clients[sid] = ClientQueue(
+                sid, self.max_pending, self.max_bytes, acks
+            )
+            return queue
+
+    def acked(self, sid: str, count: int = 1):
+        """Record that a client acknowledged ``count`` updates."""
+        with self.lock:
+            queue = self.clients.get(sid)
+            if queue is not None:
+                queue.unacked = max(0, queue.unacked - count)
+
+    def unregister(self, sid: str):
+        with self.lock:
+            self.clients.pop(sid, None)
+
+    def publish(self, update: Dict[str, Any], size: Optional[int] = None):
+        """Queue an update for every registered client."""
+        if size is None:
+            size = len(json.dumps(update, default=str))
+        key = update.get("sensor_id")
+        with self.lock:
+            for queue in self.clients.values():
+                queue.offer(key, update, size)
+        self._wakeup.set()
+
+    def period(self, level: int) -> float:
+        """Minimum time between flushes for a client at ``level``."""
+        return self.flush_interval * (2**level) if level else 0.0
+
+    def flush(self, now: Optional[float] = None):
+        """Send pending updates to every client that is due and not backed up."""
+        now = time.monotonic() if now is None else now
+        batches = []
+        with self.lock:
+            for queue in self.clients.values():
+                if not queue.pending or now < queue.next_flush:
+                    continue
+                backlog = queue.transport_backlog = (
+                    queue.unacked if queue.acks else self.backlog(queue.sid)
+                )
+                if backlog > self.slow_backlog:
+                    if queue.level < self.max_level:
+                        queue.level += 1
+                        logger.debug(
+                            f"Demoted slow client {queue.sid} to level {queue.level}"
+                        )
+                    queue.next_flush = now + self.period(queue.level)
+                    continue
+                if backlog == 0 and queue.level:
+                    queue.level -= 1
+                updates = queue.drain()
+                queue.sent += len(updates)
+                if queue.acks:
+                    queue.unacked += len(updates)
+                queue.next_flush = now + self.period(queue.level)
+                batches.append((queue.sid, updates))
+
+        for sid, updates in batches:
+            for sent, update in enumerate(updates):
+                try:
+                    self.send(sid, update)
+                except Exception as e:
+                    logger.error(f"Error sending update to client {sid}: {e}")
+                    self.acked(sid, len(updates) - sent)
+                    break
+
+    def run(self):
+        """Flush loop; run it as a background task."""
+        self.running = True
+        while self.running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-client queue statistics and totals."""
+        with self.lock:
+            clients = [
+                {
+                    "sid": queue.sid,
+                    "pending": len(queue.pending),
+                    "queued_bytes": queue.queued_bytes,
+                    "level": queue.level,
+                    "transport_backlog": queue.transport_backlog,
+                    "acks": queue.acks,
+                    "sent": queue.sent,
+                    "conflated": queue.conflated,
+                    "dropped": queue.dropped,
+                }
+                for queue in self.clients.values()
+            ]
+        return {
+            "connected_clients": len(clients),
+            "queued_bytes": sum(c["queued_bytes"] for c in clients),
+            "slow_clients": sum(1 for c in clients if c["level"]),
+            "clients": clients,
+        }
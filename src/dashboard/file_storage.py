@@ -1,127 +1,839 @@
+import bisect
+import heapq
 import json
 import logging
 import os
-import threading
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .compression import (
+    drop_frames_before,
+    iter_frames,
+    iter_ordered_frames,
+    pack_frame,
+)
+from .metrics import LOCK_WAIT_SECONDS, STORAGE_BYTES, STORAGE_SECONDS, TimedLock
+from .registry import SENSOR_FIELDS, SensorRegistry
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
+READ_SECONDS = STORAGE_SECONDS.labels("read")
+WRITE_SECONDS = STORAGE_SECONDS.labels("write")
+READ_BYTES = STORAGE_BYTES.labels("read")
+WRITE_BYTES = STORAGE_BYTES.labels("write")
+
+# Raw readings kept per sensor in readings.json; older ones are archived
+RAW_READINGS = 1000
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO timestamp into a naive local datetime.
+
+    Timestamps with an offset (including a ``Z`` suffix) are converted to
+    local time so they compare correctly with naive ones.
+    """
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def reading_time(reading: Dict[str, Any]) -> datetime:
+    """Sort key of a stored reading; unparseable timestamps sort first."""
+    try:
+        return parse_timestamp(reading["timestamp"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return datetime.min
+
 
 class FileStorage:
-    def __init__(self, data_dir: str = "data"):
+    def __init__(
+        self,
+        data_dir: str = "data",
+        rollup_retention: int = 7 * 24 * 60,
+        lateness: float = 300.0,
+        block_size: int = 500,
+        index: Optional[Dict[str, Any]] = None,
+    ):
         self.data_dir = data_dir
         self.sensors_file = os.path.join(data_dir, "sensors.json")
         self.readings_file = os.path.join(data_dir, "readings.json")
         self.stats_file = os.path.join(data_dir, "stats.json")
-        self.lock = threading.Lock()
+        self.rollups_file = os.path.join(data_dir, "rollups.json")
+        self.rollups_dir = os.path.join(data_dir, "rollups")
+        self.alert_rules_file = os.path.join(data_dir, "alert_rules.json")
+        self.archive_dir = os.path.join(data_dir, "archive")
+        self.rollup_retention = rollup_retention
+        self._rollup_lines: Dict[str, int] = {}
+        self.block_size = min(block_size, RAW_READINGS)
+        self.lock = TimedLock(LOCK_WAIT_SECONDS.labels())
+
+        # Readings more than ``lateness`` older than their sensor's newest
+        # stored reading are late and take the correction path
+        self.lateness = timedelta(seconds=lateness)
+        self.newest: Dict[str, datetime] = {}
+
+        # Change counters for conditional requests
+        self.version = 0
+        self.sensor_versions: Dict[str, int] = {}
+        self.last_modified = datetime.now(timezone.utc)
+        self._stats_mtime: Optional[int] = None
+        self._stats_signatures: Dict[str, Tuple[Any, Any]] = {}
+
+        # Sensor metadata lives in the registry, not in every reading
+        self.registry = SensorRegistry()
+        self._sensors_mtime: Optional[int] = None
 
-        # Create data directory
-        os.makedirs(data_dir, exist_ok=True)
+        # Only reads here: every process builds a FileStorage, so anything
+        # that writes belongs in ``migrate``. Missing files read as empty and
+        # are created by their first write.
+        with self.lock:
+            self._sync_registry()
+            if not self._restore_index(index):
+                self._load_watermarks()
 
-        # Initialize files if they don't exist
-        self._init_files()
+    def migrate(self):
+        """Upgrade data written by older versions, in place.
 
-    def _init_files(self):
-        """Initialize storage files if they don't exist."""
-        for file_path in [self.sensors_file, self.readings_file, self.stats_file]:
-            if not os.path.exists(file_path):
-                with open(file_path, "w") as f:
-                    json.dump({}, f)
+        Sorts readings stored before they were kept in time order, seeds
+        an empty registry from the metadata older readings carry inline and
+        splits the single rollups file into per-sensor ones.
+        This rewrites shared files, so only the ingest process runs it, once
+        at startup (see ``tasks.start_recovery``).
+        """
+        with self.lock:
+            self._sync_registry()
+            if not self.registry.sensors:
+                self._seed_registry()
+            self._order_readings()
+            self._split_rollups()
 
     def _read_file(self, file_path: str) -> Dict[str, Any]:
         """Safely read JSON file."""
         try:
-            with open(file_path, "r") as f:
-                return json.load(f)
+            with span("storage.read", READ_SECONDS), open(file_path, "r") as f:
+                data = json.load(f)
+                READ_BYTES.inc(f.tell())
+                return data
         except (FileNotFoundError, json.JSONDecodeError):
             return {}
 
     def _write_file(self, file_path: str, data: Dict[str, Any]):
         """Safely write JSON file."""
-        with open(file_path, "w") as f:
+        os.makedirs(self.data_dir, exist_ok=True)
+        with span("storage.write", WRITE_SECONDS), open(file_path, "w") as f:
             json.dump(data, f, indent=2)
+            WRITE_BYTES.inc(f.tell())
+
+    def _mtime(self, file_path: str) -> Optional[int]:
+        try:
+            return os.stat(file_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _mark_changed(self, sensor_ids, stats: Optional[Dict[str, Any]] = None):
+        """Advance the storage-wide and per-sensor change counters."""
+        self.version += 1
+        for sensor_id in sensor_ids:
+            self.sensor_versions[sensor_id] = self.sensor_versions.get(sensor_id, 0) + 1
+            if stats is not None and sensor_id in stats:
+                entry = stats[sensor_id]
+                self._stats_signatures[sensor_id] = (
+                    entry.get("count"),
+                    entry.get("last_reading"),
+                )
+        self.last_modified = datetime.now(timezone.utc)
+        self._stats_mtime = self._mtime(self.stats_file)
+
+    def _sync_registry(self):
+        """Reload the registry if another process changed ``sensors.json``."""
+        mtime = self._mtime(self.sensors_file)
+        if mtime != self._sensors_mtime:
+            self.registry.load(self._read_file(self.sensors_file))
+            self._sensors_mtime = mtime
+
+    def _save_registry(self):
+        self._write_file(self.sensors_file, self.registry.to_dict())
+        self._sensors_mtime = self._mtime(self.sensors_file)
+
+    def _seed_registry(self):
+        """Build the registry from the newest reading of each sensor.
+
+        Readings stored before the registry existed carry their sensor's
+        metadata inline; this registers them once so selectors work.
+        """
+        readings = self._read_file(self.readings_file)
+        changed = False
+        for sensor_id, sensor_readings in readings.items():
+            if sensor_readings:
+                fields = _sensor_fields(sensor_readings[-1])
+                changed |= self.registry.register(sensor_id, fields)
+        if changed:
+            self._save_registry()
+
+    def _order_readings(self):
+        """Sort readings stored before they were kept in time order."""
+        readings = self._read_file(self.readings_file)
+        changed = False
+        for sensor_id, sensor_readings in readings.items():
+            times = [reading_time(reading) for reading in sensor_readings]
+            if any(later < earlier for earlier, later in zip(times, times[1:])):
+                sensor_readings.sort(key=reading_time)
+                changed = True
+        if changed:
+            self._write_file(self.readings_file, readings)
+
+    def _load_watermarks(self):
+        """Record each sensor's newest stored reading for the lateness watermark."""
+        readings = self._read_file(self.readings_file)
+        self.newest = {
+            sensor_id: max(reading_time(reading) for reading in sensor_readings)
+            for sensor_id, sensor_readings in readings.items()
+            if sensor_readings
+        }
+
+    def _readings_signature(self) -> Optional[List[int]]:
+        try:
+            stat = os.stat(self.readings_file)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def index(self) -> Dict[str, Any]:
+        """The lateness watermarks, with the readings file they were taken from.
+
+        Passed back as ``index`` when the file is unchanged, it spares a
+        restarted process the scan of every stored reading in
+        ``_load_watermarks``.
+        """
+        with self.lock:
+            return {
+                "readings": self._readings_signature(),
+                "newest": {
+                    sensor_id: at.isoformat() for sensor_id, at in self.newest.items()
+                },
+            }
+
+    def _restore_index(self, index: Optional[Dict[str, Any]]) -> bool:
+        """Take the watermarks from ``index`` if it matches the readings file."""
+        if not index or index.get("readings") is None:
+            return False
+        if index["readings"] != self._readings_signature():
+            return False
+        try:
+            newest = {
+                sensor_id: datetime.fromisoformat(at)
+                for sensor_id, at in index["newest"].items()
+            }
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return False
+        self.newest = newest
+        return True
+
+    def _insert(self, sensor_readings: List[Dict[str, Any]], reading):
+        """Insert a reading in time order, after any with the same time.
+
+        In-order readings are appended; a late one is placed by binary
+        search, which only parses the timestamps it compares.
+        """
+        at = reading_time(reading)
+        if not sensor_readings or reading_time(sensor_readings[-1]) <= at:
+            sensor_readings.append(reading)
+        else:
+            index = bisect.bisect_right(sensor_readings, at, key=reading_time)
+            sensor_readings.insert(index, reading)
+
+    def _archive_path(self, sensor_id: str) -> str:
+        return os.path.join(
+            self.archive_dir, urllib.parse.quote(sensor_id, safe="") + ".gorilla"
+        )
+
+    def _archive(self, sensor_id: str, sensor_readings: List[Dict[str, Any]]):
+        """Append readings to a sensor's archive as one compressed block.
+
+        Archived history keeps only each reading's timestamp and value.
+        """
+        times, values = [], []
+        for reading in sensor_readings:
+            at = reading_time(reading)
+            try:
+                value = float(reading["value"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if at != datetime.min:
+                times.append(at)
+                values.append(value)
+        if times:
+            frame = pack_frame(
+                np.array(times, dtype="datetime64[us]"),
+                np.array(values, dtype=float),
+            )
+            os.makedirs(self.archive_dir, exist_ok=True)
+            with (
+                span("storage.write", WRITE_SECONDS),
+                open(self._archive_path(sensor_id), "ab") as f,
+            ):
+                f.write(frame)
+            WRITE_BYTES.inc(len(frame))
+
+    def _read_archive(self, sensor_id: str) -> bytes:
+        try:
+            with (
+                span("storage.read", READ_SECONDS),
+                open(self._archive_path(sensor_id), "rb") as f,
+            ):
+                data = f.read()
+        except FileNotFoundError:
+            return b""
+        READ_BYTES.inc(len(data))
+        return data
+
+    def late_mask(self, items: Iterable[Tuple[str, str]]) -> List[bool]:
+        """Flag which ``(sensor_id, timestamp)`` pairs are behind the watermark.
+
+        A sensor's watermark trails its newest reading by ``lateness``;
+        earlier items of the same call count as readings already seen.
+        """
+        newest = {}
+        mask = []
+        for sensor_id, timestamp in items:
+            try:
+                at = parse_timestamp(timestamp)
+            except (ValueError, TypeError, AttributeError):
+                mask.append(False)
+                continue
+            current = newest.get(sensor_id, self.newest.get(sensor_id))
+            late = current is not None and at < current - self.lateness
+            mask.append(late)
+            if current is None or at > current:
+                newest[sensor_id] = at
+        return mask
+
+    def _hydrate(self, sensor_id: str, reading: Dict[str, Any]) -> Dict[str, Any]:
+        """Expand a stored reading with its sensor's registry metadata."""
+        entry = self.registry.get(sensor_id)
+        if entry is None:
+            return {"sensor_id": sensor_id, **reading}
+        hydrated = {
+            "sensor_id": sensor_id,
+            "sensor_type": entry["sensor_type"],
+            "unit": entry["unit"],
+            "location": entry["location"],
+            "metadata": entry["metadata"],
+        }
+        if entry["tags"]:
+            hydrated["tags"] = list(entry["tags"])
+        hydrated.update(reading)
+        return hydrated
+
+    def get_sensor(self, sensor_id: str) -> Optional[Dict[str, Any]]:
+        """Get one sensor's registry entry."""
+        with self.lock:
+            self._sync_registry()
+            if self.registry.get(sensor_id) is None:
+                return None
+            return self.registry.describe(sensor_id)
+
+    def select_sensors(
+        self,
+        sensor_ids: Optional[Iterable[str]] = None,
+        sensor_type: Optional[str] = None,
+        location: Optional[str] = None,
+        tag: Optional[str] = None,
+    ) -> Set[str]:
+        """Resolve selectors to sensor ids through the registry indexes."""
+        with self.lock:
+            self._sync_registry()
+            return self.registry.select(sensor_ids, sensor_type, location, tag)
+
+    def list_sensors(self, **selectors) -> List[Dict[str, Any]]:
+        """Get registry entries of the sensors matching ``select_sensors``."""
+        with self.lock:
+            self._sync_registry()
+            return [
+                self.registry.describe(sensor_id)
+                for sensor_id in sorted(self.registry.select(**selectors))
+            ]
+
+    def get_groups(self, by: str) -> Dict[Any, List[str]]:
+        """Sensor ids per distinct ``type``, ``location`` or ``tag``."""
+        with self.lock:
+            self._sync_registry()
+            return {
+                key: sorted(members)
+                for key, members in self.registry.groups(by).items()
+            }
+
+    def get_version(self) -> int:
+        """Return the storage-wide change counter for sensor statistics.
+
+        Writes made through this instance advance it directly. Writes made
+        by another process (e.g. a separate ingest worker) are picked up by
+        comparing the stats file's modification time, in which case only
+        the sensors whose statistics differ get their counters advanced.
+        """
+        with self.lock:
+            mtime = self._mtime(self.stats_file)
+            if mtime != self._stats_mtime:
+                stats = self._read_file(self.stats_file)
+                changed = [
+                    sensor_id
+                    for sensor_id, entry in stats.items()
+                    if self._stats_signatures.get(sensor_id)
+                    != (entry.get("count"), entry.get("last_reading"))
+                ]
+                self._mark_changed(changed, stats)
+            return self.version
+
+    def get_sensor_version(self, sensor_id: str) -> int:
+        """Return the change counter for one sensor's statistics."""
+        self.get_version()
+        with self.lock:
+            return self.sensor_versions.get(sensor_id, 0)
 
     def store_reading(self, sensor_id: str, reading_data: Dict[str, Any]):
         """Store a sensor reading."""
+        self.store_readings([(sensor_id, reading_data)])
+
+    def store_readings(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        """Store a batch of ``(sensor_id, reading_data)`` with a single write.
+
+        Sensor metadata is registered in ``sensors.json``; the readings file
+        keeps only the measurement (timestamp, value and any flags). Each
+        sensor's readings are kept in time order whatever order they arrive in.
+        """
         with self.lock:
             readings = self._read_file(self.readings_file)
+            self._sync_registry()
 
-            if sensor_id not in readings:
-                readings[sensor_id] = []
+            touched = set()
+            registered = False
+            for sensor_id, reading_data in batch:
+                if sensor_id not in readings:
+                    readings[sensor_id] = []
 
-            # Add timestamp if not present
-            if "timestamp" not in reading_data:
-                reading_data["timestamp"] = datetime.now().isoformat()
+                # Add timestamp if not present
+                if "timestamp" not in reading_data:
+                    reading_data["timestamp"] = datetime.now().isoformat()
+
+                registered |= self.registry.register(
+                    sensor_id, _sensor_fields(reading_data)
+                )
+                self._insert(readings[sensor_id], _measurement(reading_data))
+                touched.add(sensor_id)
 
-            readings[sensor_id].append(reading_data)
+            if registered:
+                self._save_registry()
 
-            # Keep only last 1000 readings per sensor
-            readings[sensor_id] = readings[sensor_id][-1000:]
+            # Keep the newest readings raw and compress older ones a block at a time
+            for sensor_id in touched:
+                sensor_readings = readings[sensor_id]
+                if len(sensor_readings) > RAW_READINGS:
+                    sealed = len(sensor_readings) - RAW_READINGS + self.block_size
+                    self._archive(sensor_id, sensor_readings[:sealed])
+                    readings[sensor_id] = sensor_readings = sensor_readings[sealed:]
+                newest = reading_time(sensor_readings[-1])
+                if newest != datetime.min:
+                    self.newest[sensor_id] = newest
 
             self._write_file(self.readings_file, readings)
 
     def get_readings(self, sensor_id: str, hours: int = 24) -> List[Dict[str, Any]]:
-        """Get readings for a sensor within the specified hours."""
+        """Get readings for a sensor within the specified hours, oldest first."""
+        cutoff_time = datetime.now() - timedelta(hours=hours)
+        return [
+            reading for _, reading in self.iter_readings(sensor_id, start=cutoff_time)
+        ]
+
+    def iter_readings(
+        self,
+        sensor_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Tuple[datetime, Dict[str, Any]]]:
+        """Yield ``(timestamp, reading)`` pairs in time order within [start, end).
+
+        Archived history comes first, then the raw readings. The lock is
+        only held while the files are loaded, so a slow consumer of the
+        iterator does not block ingest.
+        """
+        with self.lock:
+            readings = self._read_file(self.readings_file).get(sensor_id, [])
+            archive = self._read_archive(sensor_id)
+            self._sync_registry()
+
+        yield from self._merge(
+            sensor_id,
+            archive,
+            self._window(sensor_id, readings, start, end),
+            start,
+            end,
+        )
+
+    def get_series(
+        self,
+        sensor_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """A sensor's history in [start, end) as ``datetime64[us]`` and float arrays.
+
+        Archived blocks decode straight into arrays, so long histories are
+        not expanded into a dict per reading.
+        """
+        with self.lock:
+            readings = self._read_file(self.readings_file).get(sensor_id, [])
+            archive = self._read_archive(sensor_id)
+        return self._series(sensor_id, readings, archive, start, end)
+
+    def iter_series(
+        self, starts: Dict[str, Optional[datetime]]
+    ) -> Iterator[Tuple[str, np.ndarray, np.ndarray]]:
+        """``get_series`` of many sensors, each from its own start.
+
+        The readings file is read once for all of them.
+        """
         with self.lock:
             readings = self._read_file(self.readings_file)
+        for sensor_id, start in starts.items():
+            with self.lock:
+                archive = self._read_archive(sensor_id)
+            times, values = self._series(
+                sensor_id, readings.get(sensor_id, []), archive, start, None
+            )
+            yield sensor_id, times, values
 
-            if sensor_id not in readings:
-                return []
+    def _series(
+        self,
+        sensor_id: str,
+        readings: List[Dict[str, Any]],
+        archive: bytes,
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        times, values = [], []
+        for at, reading in self._window(sensor_id, readings, start, end):
+            try:
+                values.append(float(reading["value"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+            times.append(at)
+        blocks = list(_archived(archive, start, end))
+        blocks.append(
+            (np.array(times, dtype="datetime64[us]"), np.array(values, dtype=float))
+        )
+        return _concatenate(blocks)
 
-            # Filter by time
-            cutoff_time = datetime.now() - timedelta(hours=hours)
-            filtered_readings = []
+    def _merge(
+        self,
+        sensor_id: str,
+        archive: bytes,
+        rows: Iterator[Tuple[datetime, Dict[str, Any]]],
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> Iterator[Tuple[datetime, Dict[str, Any]]]:
+        """Archived points in [start, end) merged with ``rows``, in time order.
 
-            for reading in readings[sensor_id]:
-                try:
-                    reading_time = datetime.fromisoformat(
-                        reading["timestamp"].replace("Z", "+00:00")
-                    )
-                    if reading_time >= cutoff_time:
-                        filtered_readings.append(reading)
-                except (ValueError, KeyError):
-                    continue
+        Archive blocks are decoded one (group of overlapping blocks) at a
+        time as the merge reaches them. A late reading can reach the raw
+        tail before older ones are sealed, so the two are merged rather
+        than chained; archived points come first on equal times.
+        """
+        if not archive:
+            yield from rows
+            return
+        archived = (
+            (at, self._hydrate(sensor_id, {"timestamp": at.isoformat(), "value": v}))
+            for times, values in _archived(archive, start, end, ordered=True)
+            for at, v in zip(times.tolist(), values.tolist())
+        )
+        yield from heapq.merge(archived, rows, key=lambda row: row[0])
+
+    def _window(
+        self,
+        sensor_id: str,
+        sensor_readings: List[Dict[str, Any]],
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> Iterator[Tuple[datetime, Dict[str, Any]]]:
+        """Hydrated ``(timestamp, reading)`` pairs of a sorted list in [start, end)."""
+        index = 0
+        if start is not None:
+            index = bisect.bisect_left(sensor_readings, start, key=reading_time)
+        for reading in sensor_readings[index:]:
+            at = reading_time(reading)
+            if end is not None and at >= end:
+                break
+            if at != datetime.min:
+                yield at, self._hydrate(sensor_id, reading)
 
-            return filtered_readings
+    def scan_readings(
+        self,
+        sensor_ids: Optional[Iterable[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        sensor_type: Optional[str] = None,
+        location: Optional[str] = None,
+        tag: Optional[str] = None,
+        archived: bool = True,
+    ) -> Dict[str, List[Tuple[datetime, Dict[str, Any]]]]:
+        """Collect readings for many sensors in a single pass over storage.
+
+        Sensors are chosen by id and/or by type, location and tag through
+        the registry indexes. Returns ``{sensor_id: [(timestamp, reading)]}``
+        with each list in time order within [start, end). With ``archived``
+        false only the raw readings are read.
+        """
+        return {
+            sensor_id: list(rows)
+            for sensor_id, rows in self.iter_scan(
+                sensor_ids, start, end, sensor_type, location, tag, archived
+            )
+        }
+
+    def iter_scan(
+        self,
+        sensor_ids: Optional[Iterable[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        sensor_type: Optional[str] = None,
+        location: Optional[str] = None,
+        tag: Optional[str] = None,
+        archived: bool = True,
+    ) -> Iterator[Tuple[str, Iterator[Tuple[datetime, Dict[str, Any]]]]]:
+        """``scan_readings`` as ``(sensor_id, rows)`` pairs, produced lazily.
+
+        The raw readings are read up front; each sensor's archive is read
+        when its turn comes and decoded block by block as ``rows`` is
+        consumed, so a long history is never held in memory at once.
+        """
+        with self.lock:
+            readings = self._read_file(self.readings_file)
+            self._sync_registry()
+            if sensor_type is None and location is None and tag is None:
+                wanted = set(sensor_ids) if sensor_ids is not None else None
+            else:
+                wanted = self.registry.select(sensor_ids, sensor_type, location, tag)
+
+        for sensor_id, sensor_readings in readings.items():
+            if wanted is not None and sensor_id not in wanted:
+                continue
+            if not sensor_readings:
+                continue
+            rows = self._window(sensor_id, sensor_readings, start, end)
+            if archived:
+                with self.lock:
+                    archive = self._read_archive(sensor_id)
+                rows = self._merge(sensor_id, archive, rows, start, end)
+            yield sensor_id, rows
 
     def update_stats(self, sensor_id: str, reading_data: Dict[str, Any]):
         """Update sensor statistics."""
+        self.update_stats_many([(sensor_id, reading_data)])
+
+    def update_stats_many(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        """Update statistics for a batch of readings with a single write.
+
+        ``last_reading`` only moves forward, so late readings count towards
+        the figures without making the sensor look stale.
+        """
         with self.lock:
             stats = self._read_file(self.stats_file)
 
-            value = reading_data.get("value", 0)
+            for sensor_id, reading_data in batch:
+                value = reading_data.get("value", 0)
+
+                if sensor_id not in stats:
+                    stats[sensor_id] = {
+                        "sensor_id": sensor_id,
+                        "min_value": value,
+                        "max_value": value,
+                        "avg_value": value,
+                        "count": 1,
+                        "last_reading": reading_data.get(
+                            "timestamp", datetime.now().isoformat()
+                        ),
+                        "sensor_type": reading_data.get(
+                            "sensor_type", reading_data.get("type", "")
+                        ),
+                        "unit": reading_data.get("unit", ""),
+                        "location": reading_data.get("location", "Unknown"),
+                    }
+                else:
+                    current_stats = stats[sensor_id]
+                    count = current_stats["count"] + 1
 
-            if sensor_id not in stats:
-                stats[sensor_id] = {
-                    "sensor_id": sensor_id,
-                    "min_value": value,
-                    "max_value": value,
-                    "avg_value": value,
-                    "count": 1,
-                    "last_reading": reading_data.get(
+                    # Update stats
+                    current_stats["min_value"] = min(current_stats["min_value"], value)
+                    current_stats["max_value"] = max(current_stats["max_value"], value)
+                    current_stats["avg_value"] = (
+                        (current_stats["avg_value"] * (count - 1)) + value
+                    ) / count
+                    current_stats["count"] = count
+                    timestamp = reading_data.get(
                         "timestamp", datetime.now().isoformat()
-                    ),
-                    "sensor_type": reading_data.get("type", ""),
-                    "unit": reading_data.get("unit", ""),
-                    "location": reading_data.get("location", "Unknown"),
-                }
-            else:
-                current_stats = stats[sensor_id]
-                count = current_stats["count"] + 1
-
-                # Update stats
-                current_stats["min_value"] = min(current_stats["min_value"], value)
-                current_stats["max_value"] = max(current_stats["max_value"], value)
-                current_stats["avg_value"] = (
-                    (current_stats["avg_value"] * (count - 1)) + value
-                ) / count
-                current_stats["count"] = count
-                current_stats["last_reading"] = reading_data.get(
-                    "timestamp", datetime.now().isoformat()
-                )
+                    )
+                    if reading_time({"timestamp": timestamp}) >= reading_time(
+                        {"timestamp": current_stats["last_reading"]}
+                    ):
+                        current_stats["last_reading"] = timestamp
 
             self._write_file(self.stats_file, stats)
+            self._mark_changed({sensor_id for sensor_id, _ in batch}, stats)
+
+    def update_rollup(self, sensor_id: str, reading_data: Dict[str, Any]):
+        """Fold a reading into its one-minute rollup bucket."""
+        self.update_rollups([(sensor_id, reading_data)])
+
+    def update_rollups(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        """Fold a batch of readings into one-minute rollups.
+
+        Each sensor's rollups are an append-only file of
+        ``[minute, count, sum, min, max]`` lines; a batch appends one line
+        per bucket it touches and readers merge lines for the same minute.
+        """
+        buckets: Dict[str, Dict[str, List[float]]] = {}
+        for sensor_id, reading_data in batch:
+            try:
+                minute = parse_timestamp(reading_data["timestamp"]).replace(
+                    second=0, microsecond=0
+                )
+                value = float(reading_data["value"])
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+            _fold(buckets.setdefault(sensor_id, {}), minute.isoformat(), [1, value])
+        if not buckets:
+            return
+
+        with self.lock:
+            os.makedirs(self.rollups_dir, exist_ok=True)
+            for sensor_id, sensor_buckets in buckets.items():
+                lines = "".join(
+                    json.dumps([key, *bucket], separators=(",", ":")) + "\n"
+                    for key, bucket in sensor_buckets.items()
+                )
+                with (
+                    span("storage.write", WRITE_SECONDS),
+                    open(self._rollups_path(sensor_id), "a") as f,
+                ):
+                    f.write(lines)
+                WRITE_BYTES.inc(len(lines))
+                self._rollup_lines[sensor_id] = (
+                    self._count_rollup_lines(sensor_id)
+                    if sensor_id not in self._rollup_lines
+                    else self._rollup_lines[sensor_id] + len(sensor_buckets)
+                )
+                # Compacting once the file doubles keeps it amortised O(1) per line
+                if self._rollup_lines[sensor_id] >= 2 * self.rollup_retention:
+                    self._compact_rollups(sensor_id)
+
+    def _rollups_path(self, sensor_id: str) -> str:
+        return os.path.join(
+            self.rollups_dir, urllib.parse.quote(sensor_id, safe="") + ".jsonl"
+        )
+
+    def _read_rollups(self, sensor_id: str) -> Dict[str, List[float]]:
+        """A sensor's rollup buckets by minute, merged across its lines."""
+        buckets: Dict[str, List[float]] = {}
+        try:
+            with (
+                span("storage.read", READ_SECONDS),
+                open(self._rollups_path(sensor_id), "r") as f,
+            ):
+                for line in f:
+                    try:
+                        key, *bucket = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash mid-append
+                    _fold(buckets, key, bucket)
+                READ_BYTES.inc(f.tell())
+        except FileNotFoundError:
+            pass
+        return buckets
+
+    def _count_rollup_lines(self, sensor_id: str) -> int:
+        try:
+            with open(self._rollups_path(sensor_id), "rb") as f:
+                return sum(1 for _ in f)
+        except FileNotFoundError:
+            return 0
+
+    def _write_rollups(self, sensor_id: str, buckets: Dict[str, List[float]]):
+        """Replace a sensor's rollups with one line per bucket, oldest first.
+
+        Only the newest ``rollup_retention`` buckets are kept. The file is
+        swapped in whole so readers never see it half written.
+        """
+        keys = sorted(buckets)[-self.rollup_retention :]
+        lines = "".join(
+            json.dumps([key, *buckets[key]], separators=(",", ":")) + "\n"
+            for key in keys
+        )
+        os.makedirs(self.rollups_dir, exist_ok=True)
+        path = self._rollups_path(sensor_id)
+        with span("storage.write", WRITE_SECONDS), open(path + ".tmp", "w") as f:
+            f.write(lines)
+        os.replace(path + ".tmp", path)
+        WRITE_BYTES.inc(len(lines))
+        self._rollup_lines[sensor_id] = len(keys)
+
+    def _compact_rollups(self, sensor_id: str):
+        self._write_rollups(sensor_id, self._read_rollups(sensor_id))
+
+    def _split_rollups(self):
+        """Move rollups from the single ``rollups.json`` to per-sensor files."""
+        legacy = self._read_file(self.rollups_file)
+        for sensor_id, buckets in legacy.items():
+            merged = self._read_rollups(sensor_id)
+            for key, bucket in buckets.items():
+                _fold(merged, key, bucket)
+            self._write_rollups(sensor_id, merged)
+        if os.path.exists(self.rollups_file):
+            os.remove(self.rollups_file)
+
+    def get_rollups(
+        self,
+        sensor_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Tuple[datetime, int, float, float, float]]:
+        """Get one-minute rollups overlapping [start, end), oldest first.
+
+        A bucket is included when its minute overlaps the range, so callers
+        aggregating to coarser buckets should align ``start``/``end`` to
+        whole minutes.
+        """
+        return self.get_covered_rollups(sensor_id, start, end)[1]
+
+    def get_covered_rollups(
+        self,
+        sensor_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Tuple[Optional[datetime], List[Tuple[datetime, int, float, float, float]]]:
+        """``get_rollups``, with the oldest minute the sensor's rollups cover.
+
+        Readings before that minute, trimmed by ``rollup_retention`` or
+        stored before rollups were kept, are only in the raw history.
+        """
+        with self.lock:
+            buckets = self._read_rollups(sensor_id)
+        covered = datetime.fromisoformat(min(buckets)) if buckets else None
+
+        rows = []
+        for key, (count, total, low, high) in buckets.items():
+            minute = datetime.fromisoformat(key)
+            if start is not None and minute + timedelta(minutes=1) <= start:
+                continue
+            if end is not None and minute >= end:
+                continue
+            rows.append((minute, count, total, low, high))
+        rows.sort(key=lambda row: row[0])
+        return covered, rows
 
     def get_all_stats(self) -> List[Dict[str, Any]]:
         """Get statistics for all sensors."""
@@ -129,8 +841,33 @@ class FileStorage:
             stats = self._read_file(self.stats_file)
             return list(stats.values())
 
+    def get_stats(self, sensor_id: str) -> Optional[Dict[str, Any]]:
+        """Get statistics for one sensor."""
+        with self.lock:
+            return self._read_file(self.stats_file).get(sensor_id)
+
+    def get_alert_rules(self) -> Tuple[Optional[int], Dict[str, Any]]:
+        """Get alert rule definitions by id, with the file's modification time.
+
+        The modification time lets callers cheaply notice rules changed by
+        another process.
+        """
+        with self.lock:
+            return self._mtime(self.alert_rules_file), self._read_file(
+                self.alert_rules_file
+            )
+
+    def alert_rules_mtime(self) -> Optional[int]:
+        return self._mtime(self.alert_rules_file)
+
+    def save_alert_rules(self, rules: Dict[str, Any]) -> Optional[int]:
+        """Replace all alert rule definitions; returns the new modification time."""
+        with self.lock:
+            self._write_file(self.alert_rules_file, rules)
+            return self._mtime(self.alert_rules_file)
+
     def cleanup_old_data(self, days: int = 7):
-        """Clean up old readings."""
+        """Clean up old readings, and archived blocks that are entirely old."""
         with self.lock:
             readings = self._read_file(self.readings_file)
             cutoff_time = datetime.now() - timedelta(days=days)
@@ -139,17 +876,81 @@ class FileStorage:
             for sensor_id in readings:
                 original_count = len(readings[sensor_id])
                 readings[sensor_id] = [
-                    r
-                    for r in readings[sensor_id]
-                    if datetime.fromisoformat(r["timestamp"].replace("Z", "+00:00"))
-                    >= cutoff_time
+                    r for r in readings[sensor_id] if reading_time(r) >= cutoff_time
                 ]
                 cleaned_count += original_count - len(readings[sensor_id])
 
+                archive = self._read_archive(sensor_id)
+                if archive:
+                    archive, dropped = drop_frames_before(archive, cutoff_time)
+                    if dropped:
+                        with open(self._archive_path(sensor_id), "wb") as f:
+                            f.write(archive)
+                        cleaned_count += dropped
+
             self._write_file(self.readings_file, readings)
             logger.info(f"Cleaned up {cleaned_count} old readings")
             return cleaned_count
 
 
-# Global storage instance
-file_storage = FileStorage()
+def _archived(
+    archive: bytes,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    ordered: bool = False,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Decoded archive blocks overlapping [start, end), trimmed to the range.
+
+    With ``ordered`` the blocks come in time order across the archive.
+    """
+    frames = iter_ordered_frames if ordered else iter_frames
+    for times, values in frames(archive, start, end):
+        mask = np.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= np.datetime64(start, "us")
+        if end is not None:
+            mask &= times < np.datetime64(end, "us")
+        yield times[mask], values[mask]
+
+
+def _concatenate(blocks) -> Tuple[np.ndarray, np.ndarray]:
+    """Join ``(times, values)`` blocks into one series in time order."""
+    if not blocks:
+        return np.array([], dtype="datetime64[us]"), np.array([], dtype=float)
+    times = np.concatenate([times for times, _ in blocks])
+    values = np.concatenate([values for _, values in blocks])
+    if len(times) > 1 and (np.diff(times) < np.timedelta64(0, "us")).any():
+        order = np.argsort(times, kind="stable")
+        times, values = times[order], values[order]
+    return times, values
+
+
+def _fold(buckets: Dict[str, List[float]], key: str, bucket: List[float]):
+    """Merge ``[count, sum]`` or ``[count, sum, min, max]`` into ``buckets[key]``."""
+    count, total, *extremes = bucket
+    low, high = extremes or (total, total)
+    current = buckets.get(key)
+    if current is None:
+        buckets[key] = [count, total, low, high]
+    else:
+        current[0] += count
+        current[1] += total
+        current[2] = min(current[2], low)
+        current[3] = max(current[3], high)
+
+
+def _sensor_fields(reading_data: Dict[str, Any]) -> Dict[str, Any]:
+    """The registry fields present in a reading (``type`` is an alias)."""
+    fields = {f: reading_data[f] for f in SENSOR_FIELDS if f in reading_data}
+    if "sensor_type" not in fields and "type" in reading_data:
+        fields["sensor_type"] = reading_data["type"]
+    return fields
+
+
+def _measurement(reading_data: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a reading stored per measurement."""
+    return {
+        key: value
+        for key, value in reading_data.items()
+        if key not in SENSOR_FIELDS and key not in ("sensor_id", "type")
+    }
@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Lag stages: device clock to our MQTT/HTTP receipt, waiting to be
+# processed, processing up to the emit, and device clock to delivery
+LAG_STAGES = ("receive", "queue", "process", "end_to_end")
+
+
+def _iso(at: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(at).isoformat() if at is not None else None
+
+
+class FreshnessTracker:
+    """How far behind real time each sensor and the pipeline as a whole are.
+
+    The ingest path reports when a reading was received and processed, and
+    the update bus when it was delivered; lags are measured against the
+    reading's device timestamp. A sensor is stale once no update for it has
+    been delivered for ``stale_after`` seconds, and ingest has stalled once
+    nothing at all has been delivered for ``stall_after`` seconds, counting
+    from ``started_at`` until the first delivery.
+    """
+
+    def __init__(
+        self,
+        stale_after: float = 300.0,
+        stall_after: float = 120.0,
+        window: int = 10000,
+        started_at: Optional[float] = None,
+    ):
+        self.stale_after = stale_after
+        self.stall_after = stall_after
+        self.started_at = time.time() if started_at is None else started_at
+        self.lock = threading.Lock()
+        self.sensors: Dict[str, Dict[str, Optional[float]]] = {}
+        self.samples = {stage: deque(maxlen=window) for stage in LAG_STAGES}
+        self.last_delivery: Optional[float] = None
+
+    def _sensor(self, sensor_id: str) -> Dict[str, Optional[float]]:
+        sensor = self.sensors.get(sensor_id)
+        if sensor is None:
+            sensor = self.sensors[sensor_id] = dict.fromkeys(
+                ("device_time", "received_at", "processed_at", "emitted_at", "lag")
+            )
+        return sensor
+
+    def seed(self, last_readings: Dict[str, float]):
+        """Start sensors not delivered yet from their last stored reading.
+
+        ``last_readings`` maps sensor ids to device times. Their delivery is
+        taken to be the reading's own time, so a sensor that went quiet
+        before this process started is still reported stale.
+        """
+        with self.lock:
+            for sensor_id, device_time in last_readings.items():
+                sensor = self._sensor(sensor_id)
+                if sensor["emitted_at"] is None:
+                    sensor["device_time"] = device_time
+                    sensor["emitted_at"] = device_time
+
+    def ingested(
+        self,
+        sensor_id: str,
+        device_time: float,
+        received_at: float,
+        started_at: float,
+        emitted_at: float,
+    ):
+        """Record the ingest timings of one reading."""
+        with self.lock:
+            sensor = self._sensor(sensor_id)
+            sensor["received_at"] = received_at
+            sensor["processed_at"] = started_at
+            self.samples["receive"].append(received_at - device_time)
+            self.samples["queue"].append(started_at - received_at)
+            self.samples["process"].append(emitted_at - started_at)
+
+    def delivered(
+        self, sensor_id: str, device_time: float, at: Optional[float] = None
+    ) -> float:
+        """Record an update reaching this process's clients; returns its lag."""
+        at = time.time() if at is None else at
+        lag = at - device_time
+        with self.lock:
+            sensor = self._sensor(sensor_id)
+            sensor["device_time"] = device_time
+            sensor["emitted_at"] = at
+            sensor["lag"] = lag
+            self.samples["end_to_end"].append(lag)
+            self.last_delivery = at
+        return lag
+
+    def report(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Per-sensor timings, lag and staleness, most stale first."""
+        now = time.time() if now is None else now
+        with self.lock:
+            sensors = [(sensor_id, dict(s)) for sensor_id, s in self.sensors.items()]
+        rows = []
+        for sensor_id, sensor in sensors:
+            emitted_at = sensor["emitted_at"]
+            staleness = now - emitted_at if emitted_at is not None else None
+            rows.append(
+                {
+                    "sensor_id": sensor_id,
+                    "device_time": _iso(sensor["device_time"]),
+                    "received_at": _iso(sensor["received_at"]),
+                    "processed_at": _iso(sensor["processed_at"]),
+                    "emitted_at": _iso(emitted_at),
+                    "lag": sensor["lag"],
+                    "staleness": staleness,
+                    "stale": staleness is not None and staleness > self.stale_after,
+                }
+            )
+        rows.sort(key=lambda row: -(row["staleness"] or 0.0))
+        return rows
+
+    def stale_count(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self.lock:
+            return sum(
+                1
+                for sensor in self.sensors.values()
+                if sensor["emitted_at"] is not None
+                and now - sensor["emitted_at"] > self.stale_after
+            )
+
+    def lag_percentiles(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """p50/p90/p99/max of each lag stage over the recent window, in seconds."""
+        with self.lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+        percentiles = {}
+        for stage, values in samples.items():
+            if not values:
+                percentiles[stage] = {"count": 0}
+                continue
+            p50, p90, p99, top = np.percentile(values, [50, 90, 99, 100])
+            percentiles[stage] = {
+                "count": len(values),
+                "p50": float(p50),
+                "p90": float(p90),
+                "p99": float(p99),
+                "max": float(top),
+            }
+        return percentiles
+
+    def seconds_since_delivery(self, now: Optional[float] = None) -> float:
+        """Seconds since the last delivery, or since start if there was none."""
+        now = time.time() if now is None else now
+        since = (
+            self.last_delivery if self.last_delivery is not None else self.started_at
+        )
+        return now - since
+
+    def health(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Overall freshness status for health checks.
+
+        ``unhealthy`` if ingest has stalled, ``degraded`` if any sensor is
+        stale, otherwise ``healthy``. A process that has not delivered
+        anything yet is ``idle`` for its first ``stall_after`` seconds and
+        stalled after that, so ingest that is dead from startup is caught.
+        """
+        now = time.time() if now is None else now
+        silent = self.seconds_since_delivery(now)
+        if self.stall_after and silent > self.stall_after:
+            ingest = "stalled"
+        elif self.last_delivery is None:
+            ingest = "idle"
+        else:
+            ingest = "ok"
+        stale = self.stale_count(now)
+        if ingest == "stalled":
+            status = "unhealthy"
+        elif stale:
+            status = "degraded"
+        else:
+            status = "healthy"
+        end_to_end = self.lag_percentiles()["end_to_end"]
+        return {
+            "status": status,
+            "ingest": {
+                "status": ingest,
+                "last_update": _iso(self.last_delivery),
+                "seconds_since_update": silent,
+            },
+            "sensors": len(self.sensors),
+            "stale_sensors": stale,
+            "lag": {key: end_to_end.get(key) for key in ("p50", "p99")},
+        }
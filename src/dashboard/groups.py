@@ -0,0 +1,295 @@
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .file_storage import parse_timestamp, reading_time
+from .registry import GROUP_KEYS
+
+MEASURES = ("avg", "min", "max", "sensors", "active")
+OVERALL = "all"
+
+DEFAULT_VIEWS = [
+    {"id": "by_location", "by": "location", "measures": ["sensors", "active"]},
+    {"id": "temperature_by_location", "by": "location", "type": "temperature"},
+    {"id": "by_type", "by": "type"},
+]
+
+
+class GroupState:
+    """Running aggregates of one group of sensors.
+
+    ``latest`` holds each sensor's newest value with their ``total`` kept
+    alongside, so the average is O(1), and ``seen`` the time of that value.
+    Each sensor keeps its own monotonic deques of the window's maxima and
+    minima, so a sensor leaving the group takes its extremes with it; a
+    read expires them and compares the heads, once per sensor.
+    """
+
+    __slots__ = ("latest", "total", "seen", "maxima", "minima")
+
+    def __init__(self):
+        self.latest: Dict[str, float] = {}
+        self.total = 0.0
+        self.seen: Dict[str, float] = {}
+        self.maxima: Dict[str, deque] = {}
+        self.minima: Dict[str, deque] = {}
+
+    def add(self, sensor_id: str, value: float, at: float):
+        # A reading older than the sensor's latest only counts towards min/max
+        if at >= self.seen.get(sensor_id, at):
+            self.total += value - self.latest.get(sensor_id, 0.0)
+            self.latest[sensor_id] = value
+            self.seen[sensor_id] = at
+
+        _insert_extreme(self.maxima.setdefault(sensor_id, deque()), at, value, 1)
+        _insert_extreme(self.minima.setdefault(sensor_id, deque()), at, value, -1)
+
+    def remove(self, sensor_id: str):
+        """Forget a sensor that moved to another group."""
+        value = self.latest.pop(sensor_id, None)
+        if value is not None:
+            self.total -= value
+        self.seen.pop(sensor_id, None)
+        self.maxima.pop(sensor_id, None)
+        self.minima.pop(sensor_id, None)
+
+    def expire(self, cutoff: float, sensor_id: Optional[str] = None):
+        """Drop extremes older than ``cutoff``, of one sensor or all of them."""
+        for extremes in (self.maxima, self.minima):
+            sensor_ids = list(extremes) if sensor_id is None else [sensor_id]
+            for key in sensor_ids:
+                points = extremes.get(key)
+                while points and points[0][0] < cutoff:
+                    points.popleft()
+                if points is not None and not points:
+                    del extremes[key]
+
+    def active(self, cutoff: float) -> int:
+        return sum(1 for at in self.seen.values() if at >= cutoff)
+
+
+def _insert_extreme(points: deque, at: float, value: float, sign: int):
+    """Add a point to a monotonic deque of maxima (``sign`` 1) or minima (-1).
+
+    The deque stays in time order with values strictly falling (for maxima),
+    so its head is the extreme. A late point goes in at its time, unless a
+    point at or after that time is at least as extreme; the points before it
+    that it beats are dropped.
+    """
+    index = bisect.bisect_left(points, at, key=lambda point: point[0])
+    if index < len(points) and sign * points[index][1] >= sign * value:
+        return
+    while index and sign * points[index - 1][1] <= sign * value:
+        del points[index - 1]
+        index -= 1
+    points.insert(index, (at, value))
+
+
+class MaterializedView:
+    """A declarative aggregate over groups of sensors, kept up to date.
+
+    Sensors matching the view's ``type``/``location``/``tag`` selectors are
+    grouped ``by`` location, type or tag (or all together), and each group
+    serves the requested measures: ``avg`` of the sensors' latest values,
+    ``min``/``max`` of every reading within ``window`` seconds, the number
+    of ``sensors`` and the number ``active`` within the window.
+    """
+
+    def __init__(
+        self,
+        id: str,
+        by: Optional[str] = None,
+        sensor_type: Optional[str] = None,
+        location: Optional[str] = None,
+        tag: Optional[str] = None,
+        measures: Iterable[str] = MEASURES,
+        window: float = 300.0,
+    ):
+        self.id = id
+        self.by = by
+        self.sensor_type = sensor_type
+        self.location = location
+        self.tag = tag
+        self.measures = tuple(measures)
+        self.window = window
+        self.groups: Dict[str, GroupState] = {}
+        self.membership: Dict[str, tuple] = {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MaterializedView":
+        """Validate a view definition; raises ValueError if it is invalid."""
+        try:
+            view = cls(
+                id=str(data["id"]),
+                by=data.get("by"),
+                sensor_type=data.get("type"),
+                location=data.get("location"),
+                tag=data.get("tag"),
+                measures=data.get("measures", MEASURES),
+                window=float(data.get("window", 300.0)),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid group view: {e}")
+        if view.by is not None and view.by not in GROUP_KEYS:
+            raise ValueError(f"Invalid group view: unsupported 'by' {view.by!r}")
+        unknown = set(view.measures) - set(MEASURES)
+        if unknown or not view.measures:
+            raise ValueError(f"Invalid group view: unsupported measures {unknown}")
+        if view.window <= 0:
+            raise ValueError("Invalid group view: window must be positive")
+        return view
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "by": self.by,
+            "type": self.sensor_type,
+            "location": self.location,
+            "tag": self.tag,
+            "measures": list(self.measures),
+            "window": self.window,
+        }
+
+    def _keys(self, update: Dict[str, Any]) -> tuple:
+        if (
+            self.sensor_type is not None
+            and update.get("sensor_type") != self.sensor_type
+        ):
+            return ()
+        if self.location is not None and update.get("location") != self.location:
+            return ()
+        tags = update.get("tags") or ()
+        if self.tag is not None and self.tag not in tags:
+            return ()
+        if self.by is None:
+            return (OVERALL,)
+        if self.by == "tag":
+            return tuple(sorted(set(tags)))
+        value = update.get(GROUP_KEYS[self.by])
+        return (value,) if value is not None else ()
+
+    def apply(self, sensor_id: str, update: Dict[str, Any], value: float, at: float):
+        """Fold an update into its groups; returns the keys of changed groups."""
+        keys = self._keys(update)
+        previous = self.membership.get(sensor_id, ())
+        if keys != previous:
+            for key in set(previous) - set(keys):
+                self.groups[key].remove(sensor_id)
+                if not self.groups[key].latest:
+                    del self.groups[key]
+            if keys:
+                self.membership[sensor_id] = keys
+            else:
+                self.membership.pop(sensor_id, None)
+        for key in keys:
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = GroupState()
+            group.add(sensor_id, value, at)
+            group.expire(at - self.window, sensor_id)
+        return set(keys) | set(previous)
+
+    def read_group(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        group = self.groups.get(key)
+        if group is None:
+            return None
+        cutoff = now - self.window
+        group.expire(cutoff)
+        row: Dict[str, Any] = {}
+        for measure in self.measures:
+            if measure == "avg":
+                row["avg"] = group.total / len(group.latest) if group.latest else None
+            elif measure == "max":
+                row["max"] = max(
+                    (points[0][1] for points in group.maxima.values()), default=None
+                )
+            elif measure == "min":
+                row["min"] = min(
+                    (points[0][1] for points in group.minima.values()), default=None
+                )
+            elif measure == "sensors":
+                row["sensors"] = len(group.latest)
+            elif measure == "active":
+                row["active"] = group.active(cutoff)
+        return row
+
+    def read(self, now: float) -> Dict[str, Any]:
+        return {key: self.read_group(key, now) for key in list(self.groups)}
+
+
+class GroupViews:
+    """The set of materialized views fed from the update bus.
+
+    Every update is applied to each view as it is delivered. Groups whose
+    figures changed are remembered so they can be pushed to clients in
+    periodic batches rather than once per reading.
+    """
+
+    def __init__(self, definitions: Iterable[Dict[str, Any]] = DEFAULT_VIEWS):
+        self.lock = threading.Lock()
+        self.views: Dict[str, MaterializedView] = {}
+        for definition in definitions:
+            view = MaterializedView.from_dict(definition)
+            self.views[view.id] = view
+        self.seeded = False
+        self.running = False
+        self._dirty: Set[tuple] = set()
+
+    def apply(self, update: Dict[str, Any]):
+        sensor_id = update.get("sensor_id")
+        try:
+            value = float(update["value"])
+            at = parse_timestamp(update["timestamp"]).timestamp()
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return
+        with self.lock:
+            for view in self.views.values():
+                for key in view.apply(sensor_id, update, value, at):
+                    self._dirty.add((view.id, key))
+
+    def seed(self, updates: Iterable[Dict[str, Any]]):
+        """Apply stored updates for sensors the views have not seen yet.
+
+        They are applied in time order across sensors, as live ones arrive.
+        """
+        with self.lock:
+            known = set()
+            for view in self.views.values():
+                known.update(view.membership)
+        for update in sorted(updates, key=reading_time):
+            if update.get("sensor_id") not in known:
+                self.apply(update)
+        self.seeded = True
+
+    def read(self, view_id: Optional[str] = None, now: Optional[float] = None):
+        """One view, or all views, by id: each definition with its ``groups``."""
+        now = time.time() if now is None else now
+        with self.lock:
+            views = (
+                [self.views[view_id]] if view_id is not None else self.views.values()
+            )
+            return {
+                view.id: {**view.describe(), "groups": view.read(now)} for view in views
+            }
+
+    def drain(self, now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Rows of the groups changed since the last drain, by view."""
+        now = time.time() if now is None else now
+        with self.lock:
+            dirty, self._dirty = self._dirty, set()
+            changes: Dict[str, Dict[str, Any]] = {}
+            for view_id, key in dirty:
+                view = self.views[view_id]
+                changes.setdefault(view_id, {})[key] = view.read_group(key, now)
+            return changes
+
+
+def load_view_definitions(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Read view definitions from a JSON file, or use the defaults."""
+    if not path:
+        return DEFAULT_VIEWS
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,332 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .metrics import LOG_EVENTS_SUPPRESSED, LOG_RECORDS_DROPPED
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOG_FORMATS = ("text", "json")
+
+
+def parse_sample_rate(value) -> float:
+    """Validate a sample rate; raises ValueError unless it is in [0, 1]."""
+    rate = float(value)
+    if not 0.0 <= rate <= 1.0:
+        raise ValueError("sample_rate must be between 0 and 1")
+    return rate
+
+
+class HotEvent:
+    """A hot-path log line that can be sampled, rate limited or switched off.
+
+    Only a ``sample_rate`` fraction of occurrences is considered, and at
+    most ``rate_limit`` of those are logged per second (0 for no limit);
+    the number held back is reported with the next line that gets through.
+    Arguments are formatted by the handler, so a skipped occurrence costs a
+    few attribute reads. The counters are not locked: under contention a
+    line more or less may get through, which is fine for logging.
+    """
+
+    __slots__ = (
+        "name",
+        "logger",
+        "level",
+        "enabled",
+        "sample_rate",
+        "rate_limit",
+        "window",
+        "count",
+        "suppressed",
+        "suppressed_total",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        logger: logging.Logger,
+        level: int = logging.INFO,
+        sample_rate: float = 1.0,
+        rate_limit: int = 0,
+    ):
+        self.name = name
+        self.logger = logger
+        self.level = level
+        self.enabled = True
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.window = 0
+        self.count = 0
+        self.suppressed = 0
+        self.suppressed_total = LOG_EVENTS_SUPPRESSED.labels(name)
+
+    def __call__(self, msg: str, *args, exc_info=None, **fields):
+        """Log ``msg % args`` with ``fields`` attached, unless skipped."""
+        if not self.enabled or not self.logger.isEnabledFor(self.level):
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        if self.rate_limit:
+            window = int(time.monotonic())
+            if window != self.window:
+                self.window = window
+                self.count = 0
+            self.count += 1
+            if self.count > self.rate_limit:
+                self.suppressed += 1
+                self.suppressed_total.inc()
+                return
+        suppressed, self.suppressed = self.suppressed, 0
+        self.logger.log(
+            self.level,
+            msg,
+            *args,
+            exc_info=exc_info,
+            extra={"event": self.name, "fields": fields, "suppressed": suppressed},
+            stacklevel=2,
+        )
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "level": logging.getLevelName(self.level),
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "rate_limit": self.rate_limit,
+        }
+
+
+class HotEvents:
+    """The hot-path log events of this process, by name.
+
+    Events created with ``sampled=True`` fire once per message on success
+    and start at ``sample_rate``; the rest are logged in full. All of them
+    start at ``rate_limit`` lines per second.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, rate_limit: int = 0):
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        self.events: Dict[str, HotEvent] = {}
+
+    def event(
+        self,
+        name: str,
+        logger: logging.Logger,
+        level: int = logging.INFO,
+        sampled: bool = False,
+    ) -> HotEvent:
+        with self.lock:
+            event = self.events.get(name)
+            if event is None:
+                event = self.events[name] = HotEvent(
+                    name,
+                    logger,
+                    level,
+                    self.sample_rate if sampled else 1.0,
+                    self.rate_limit,
+                )
+            return event
+
+    def update(self, changes: Dict[str, Dict[str, Any]]):
+        """Change events' ``enabled``, ``sample_rate`` or ``rate_limit``.
+
+        ``changes`` maps event names to the settings to change. Raises
+        ValueError for an unknown event or a bad setting, in which case
+        nothing is changed.
+        """
+        updates = []
+        for name, settings in changes.items():
+            event = self.events.get(name)
+            if event is None:
+                raise ValueError(f"Unknown log event {name}")
+            if not isinstance(settings, dict):
+                raise ValueError(f"Settings of {name} must be an object")
+            unknown = set(settings) - {"enabled", "sample_rate", "rate_limit"}
+            if unknown:
+                raise ValueError(f"Unknown settings for {name}: {', '.join(unknown)}")
+            enabled = settings.get("enabled", event.enabled)
+            if not isinstance(enabled, bool):
+                raise ValueError("enabled must be true or false")
+            sample_rate = parse_sample_rate(
+                settings.get("sample_rate", event.sample_rate)
+            )
+            rate_limit = int(settings.get("rate_limit", event.rate_limit))
+            if rate_limit < 0:
+                raise ValueError("rate_limit must not be negative")
+            updates.append((event, enabled, sample_rate, rate_limit))
+        for event, enabled, sample_rate, rate_limit in updates:
+            event.enabled = enabled
+            event.sample_rate = sample_rate
+            event.rate_limit = rate_limit
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            events = sorted(self.events.items())
+        return {name: event.status() for name, event in events}
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, Any]:
+    fields = dict(getattr(record, "fields", None) or {})
+    suppressed = getattr(record, "suppressed", 0)
+    if suppressed:
+        fields["suppressed"] = suppressed
+    return fields
+
+
+class TextFormatter(logging.Formatter):
+    """The usual one-line format, followed by any fields as ``key=value``."""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        event = getattr(record, "event", None)
+        if event:
+            entry["event"] = event
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _StderrHandler(logging.StreamHandler):
+    """Writes to whatever ``sys.stderr`` is when a record is emitted."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a bounded queue for a background thread to write.
+
+    Records are not formatted here, so the logging thread only pays for the
+    record itself; pass values rather than objects that change afterwards.
+    When the queue is full the record is dropped and counted instead of
+    blocking the caller.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room so stopping never loses the sentinel to a full queue
+        self.queue.put(self._sentinel)
+
+
+class LogConfig:
+    """The handler this process's root logger writes through."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handler: Optional[logging.Handler] = None
+        self.listener: Optional[_QueueListener] = None
+        self.format = "text"
+        self.asynchronous = False
+
+    def configure(
+        self,
+        level: Optional[str] = None,
+        format: Optional[str] = None,
+        asynchronous: Optional[bool] = None,
+        queue_size: Optional[int] = None,
+    ):
+        """(Re)install the root handler; unset options come from the environment."""
+        level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+        format = format or os.getenv("LOG_FORMAT", "text")
+        if format not in LOG_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(LOG_FORMATS)}")
+        if asynchronous is None:
+            asynchronous = os.getenv("LOG_ASYNC", "true").lower() == "true"
+        if queue_size is None:
+            queue_size = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+        output = _StderrHandler()
+        output.setFormatter(
+            JsonFormatter() if format == "json" else TextFormatter(FORMAT)
+        )
+        root = logging.getLogger()
+        with self.lock:
+            self._stop()
+            if asynchronous:
+                records = queue.Queue(queue_size)
+                self.listener = _QueueListener(records, output)
+                self.listener.start()
+                self.handler = DroppingQueueHandler(records)
+            else:
+                self.handler = output
+            root.addHandler(self.handler)
+            root.setLevel(getattr(logging, level, logging.INFO))
+            self.format = format
+            self.asynchronous = asynchronous
+
+    def _stop(self):
+        if self.handler is not None:
+            logging.getLogger().removeHandler(self.handler)
+            self.handler = None
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def stop(self):
+        """Write out queued records and stop the background thread."""
+        with self.lock:
+            self._stop()
+
+    def status(self) -> Dict[str, Any]:
+        listener = self.listener
+        return {
+            "level": logging.getLevelName(logging.getLogger().level),
+            "format": self.format,
+            "async": self.asynchronous,
+            "queued": listener.queue.qsize() if listener is not None else 0,
+            "dropped": LOG_RECORDS_DROPPED.labels().get(),
+        }
+
+
+log_config = LogConfig()
+atexit.register(log_config.stop)
+
+events = HotEvents(
+    parse_sample_rate(os.getenv("LOG_SAMPLE_RATE", 0.01)),
+    int(os.getenv("LOG_RATE_LIMIT", 10)),
+)
+
+
+def configure_logging(level: Optional[str] = None, **options):
+    """Send this process's logs through one root handler; see ``LogConfig``."""
+    log_config.configure(level, **options)
@@ -0,0 +1,406 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from 50µs for in-memory stages up to whole-file rewrites
+DEFAULT_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class _Cells:
+    """Per-thread accumulators for one series.
+
+    Each thread only ever writes its own cell, so recording takes no lock
+    and cannot lose updates; a scrape sums the cells. Cells of threads that
+    have exited are folded into ``retired`` whenever a cell is added or the
+    cells are summed, so short-lived request threads do not accumulate even
+    when nothing scrapes.
+    """
+
+    __slots__ = ("size", "local", "lock", "cells", "retired")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.cells: List[Tuple[threading.Thread, List[float]]] = []
+        self.retired = [0.0] * size
+
+    def cell(self) -> List[float]:
+        try:
+            return self.local.cell
+        except AttributeError:
+            cell = self.local.cell = [0.0] * self.size
+            with self.lock:
+                self._retire()
+                self.cells.append((threading.current_thread(), cell))
+            return cell
+
+    def _retire(self):
+        live = []
+        for thread, cell in self.cells:
+            if thread.is_alive():
+                live.append((thread, cell))
+            else:
+                self.retired = [a + b for a, b in zip(self.retired, cell)]
+        self.cells = live
+
+    def total(self) -> List[float]:
+        with self.lock:
+            self._retire()
+            totals = list(self.retired)
+            for _, cell in self.cells:
+                totals = [a + b for a, b in zip(totals, cell)]
+        return totals
+
+
+class CounterValue:
+    __slots__ = ("_cells", "_local")
+
+    def __init__(self):
+        self._cells = _Cells(1)
+        self._local = self._cells.local
+
+    def inc(self, amount: float = 1.0):
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._cells.cell()[0] += amount
+
+    def get(self) -> float:
+        return self._cells.total()[0]
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: "HistogramValue"):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class HistogramValue:
+    """Bucket counts and the sum of observations; buckets are not cumulative."""
+
+    __slots__ = ("bounds", "_cells", "_local")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        # One cell per bucket, one for +Inf and one for the sum
+        self._cells = _Cells(len(self.bounds) + 2)
+        self._local = self._cells.local
+
+    def observe(self, value: float):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cells.cell()
+        cell[bisect_left(self.bounds, value)] += 1
+        cell[-1] += value
+
+    def time(self) -> _Timer:
+        """Context manager observing the time spent in its block."""
+        return _Timer(self)
+
+    def get(self) -> Tuple[List[float], float]:
+        totals = self._cells.total()
+        return totals[:-1], totals[-1]
+
+
+class Metric:
+    """A named family of series, one per combination of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def _child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The series for these label values.
+
+        Bind it once, e.g. at import, rather than on every observation.
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(
+                    f"{self.name} expects labels {self.labelnames}, got {values}"
+                )
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def series(self) -> List[Tuple[Dict[str, str], object]]:
+        with self._lock:
+            children = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child) for key, child in children]
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _child(self):
+        return CounterValue()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for labels, child in self.series():
+            yield self.name, labels, child.get()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self):
+        return HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def samples(self):
+        for labels, child in self.series():
+            counts, total = child.get()
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Gauge(Metric):
+    """A value set directly, or read from ``function`` at each scrape."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation)
+        self.function = function
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def samples(self):
+        yield self.name, {}, self.function() if self.function else self.value
+
+
+def _value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    """The metrics of this process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric; an existing metric of the same name and kind is reused."""
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if existing.kind != metric.kind:
+                    raise ValueError(
+                        f"Metric {metric.name} is already a {existing.kind}"
+                    )
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, function=None) -> Gauge:
+        return self.register(Gauge(name, documentation, function))
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                    name = f"{name}{{{pairs}}}"
+                lines.append(f"{name} {_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+MESSAGES_RECEIVED = registry.counter(
+    "iot_messages_received_total", "Readings received for ingestion", ["source"]
+)
+MESSAGES_PARSED = registry.counter(
+    "iot_messages_parsed_total", "Readings that parsed and validated", ["source"]
+)
+MESSAGES_FAILED = registry.counter(
+    "iot_messages_failed_total", "Readings rejected or failed in processing", ["source"]
+)
+MESSAGES_LATE = registry.counter(
+    "iot_messages_late_total",
+    "Readings behind the lateness watermark, sent to the correction path",
+    ["source"],
+)
+INGEST_SECONDS = registry.histogram(
+    "iot_ingest_seconds",
+    "Time to process one MQTT message or one HTTP batch",
+    ["source"],
+)
+STAGE_SECONDS = registry.histogram(
+    "iot_stage_seconds",
+    "Time spent in each ingest stage, per message or per batch",
+    ["source", "stage"],
+)
+STORAGE_SECONDS = registry.histogram(
+    "iot_storage_seconds", "Time spent reading and writing storage files", ["operation"]
+)
+STORAGE_BYTES = registry.counter(
+    "iot_storage_bytes_total",
+    "Bytes read from and written to storage files",
+    ["operation"],
+)
+LOCK_WAIT_SECONDS = registry.histogram(
+    "iot_storage_lock_wait_seconds", "Time spent waiting for the storage lock"
+)
+WEBSOCKET_EMITS = registry.counter(
+    "iot_websocket_emits_total", "sensor_update frames sent to Socket.IO clients"
+)
+WEBSOCKET_CLIENTS = registry.gauge(
+    "iot_websocket_clients", "Socket.IO clients connected to this process"
+)
+SSE_CLIENTS = registry.gauge(
+    "iot_sse_clients", "Server-Sent Events streams open in this process"
+)
+LAG_SECONDS = registry.histogram(
+    "iot_lag_seconds",
+    "Lag of readings behind their device timestamps, by pipeline stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
+)
+STALE_SENSORS = registry.gauge(
+    "iot_stale_sensors", "Sensors with no update delivered for SENSOR_STALE_AFTER"
+)
+SECONDS_SINCE_UPDATE = registry.gauge(
+    "iot_seconds_since_last_update", "Seconds since any update was delivered"
+)
+LOG_RECORDS_DROPPED = registry.counter(
+    "iot_log_records_dropped_total", "Log records dropped because the queue was full"
+)
+LOG_EVENTS_SUPPRESSED = registry.counter(
+    "iot_log_events_suppressed_total",
+    "Hot-path log lines held back by their rate limit",
+    ["event"],
+)
+
+
+class TimedLock:
+    """A lock that records how long each acquisition waited."""
+
+    def __init__(self, histogram: HistogramValue):
+        self._lock = threading.Lock()
+        self._histogram = histogram
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(False):
+            self._histogram.observe(0.0)
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        if acquired:
+            self._histogram.observe(time.perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
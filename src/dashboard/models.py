@@ -3,6 +3,8 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Any
 
+from .file_storage import parse_timestamp
+
 
 @dataclass
 class SensorReading:
@@ -13,9 +15,11 @@ class SensorReading:
     timestamp: datetime
     location: str | None = None
     metadata: dict[str, Any] | None = None
+    tags: list[str] | None = None
+    anomaly: dict[str, Any] | None = None
 
     def to_dict(self) -> dict[str, Any]:
-        return {
+        data = {
             "sensor_id": self.sensor_id,
             "sensor_type": self.sensor_type,
             "value": self.value,
@@ -24,12 +28,25 @@ class SensorReading:
             "location": self.location,
             "metadata": self.metadata or {},
         }
+        if self.tags:
+            data["tags"] = self.tags
+        if self.anomaly:
+            data["anomaly"] = self.anomaly
+        return data
 
     @classmethod
     def from_mqtt_payload(cls, topic: str, payload: str) -> "SensorReading":
         """Parse MQTT message into SensorReading object."""
         try:
             data = json.loads(payload)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid sensor data format: {e}")
+        return cls.from_dict(data, topic)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any], topic: str = "") -> "SensorReading":
+        """Build a SensorReading from decoded JSON, using the topic for defaults."""
+        try:
             topic_parts = topic.split("/")
 
             return cls(
@@ -41,15 +58,18 @@ class SensorReading:
                 ),
                 value=float(data["value"]),
                 unit=data.get("unit", ""),
+                # One clock for every timestamp: naive local time, so readings
+                # with and without an offset compare and bucket alike
                 timestamp=(
-                    datetime.fromisoformat(data["timestamp"])
+                    parse_timestamp(data["timestamp"])
                     if "timestamp" in data
                     else datetime.now()
                 ),
                 location=data.get("location"),
                 metadata=data.get("metadata"),
+                tags=data.get("tags"),
             )
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
             raise ValueError(f"Invalid sensor data format: {e}")
 
 
@@ -1,13 +1,18 @@
 import json
 import logging
 import os
+import time
 
 import paho.mqtt.client as mqtt
 
+from .logs import events
 from .tasks import process_sensor_data
 
 logger = logging.getLogger(__name__)
 
+LOG_MESSAGE = events.event("mqtt.message", logger, sampled=True)
+LOG_FAILED = events.event("mqtt.failed", logger, logging.ERROR)
+
 
 class FileStorage:
     def __init__(self, filepath="data.json"):
@@ -85,14 +90,15 @@ class MQTTClient:
     def _on_message(self, client, userdata, msg):
         """Process incoming MQTT messages."""
         try:
+            received_at = time.time()
             payload = msg.payload.decode("utf-8")
             if hasattr(process_sensor_data, "delay"):
-                process_sensor_data.delay(msg.topic, payload)
+                process_sensor_data.delay(msg.topic, payload, received_at=received_at)
             else:
-                process_sensor_data(msg.topic, payload)
-            logger.info(f"Processed sensor data for topic: {msg.topic}")
+                process_sensor_data(msg.topic, payload, received_at=received_at)
+            LOG_MESSAGE("Processed sensor data for topic: %s", msg.topic)
         except Exception as e:
-            logger.error(f"Error processing MQTT message: {e}")
+            LOG_FAILED("Error processing MQTT message: %s", e, topic=msg.topic)
 
     def _on_disconnect(self, client, userdata, rc):
         """Handle MQTT disconnection."""
@@ -125,6 +131,6 @@ class MQTTClient:
         """Publish message to MQTT topic."""
         try:
             self.client.publish(topic, payload, qos)
-            logger.debug(f"Published message to {topic}: {payload}")
+            logger.debug("Published message to %s: %s", topic, payload)
         except Exception as e:
             logger.error(f"Failed to publish message: {e}")
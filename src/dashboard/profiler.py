@@ -0,0 +1,149 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cpu", "wall")
+
+
+def _thread_cpu_time(ident: int) -> Optional[float]:
+    """CPU time used by a thread so far, where the platform exposes it."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+
+@lru_cache(maxsize=8192)
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    try:
+        filename = os.path.relpath(filename)
+    except ValueError:
+        pass
+    if filename.startswith(".."):
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """A statistical profiler for a running process.
+
+    A background thread wakes every ``interval`` seconds and records the
+    stack of every other thread. In ``cpu`` mode a thread is only sampled
+    if it used CPU since the previous sample, so threads blocked on a
+    socket or a lock do not drown out the hot spots; ``wall`` mode samples
+    them all. Stacks are counted in the folded format that flamegraph.pl,
+    speedscope and similar tools read: ``thread;outer;...;inner count``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.interval = 0.01
+        self.mode = "cpu"
+        self.started: Optional[float] = None
+        self.stopped: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(
+        self, interval: float = 0.01, duration: Optional[float] = None, mode="cpu"
+    ):
+        """Start sampling, for ``duration`` seconds or until ``stop``.
+
+        Raises RuntimeError if already running and ValueError for bad options.
+        """
+        if interval <= 0 or (duration is not None and duration <= 0):
+            raise ValueError("interval and duration must be positive")
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {', '.join(PROFILE_MODES)}")
+        with self.lock:
+            if self.running:
+                raise RuntimeError("Profiler is already running")
+            self.stacks = Counter()
+            self.samples = 0
+            self.interval = interval
+            self.mode = mode
+            self.started = time.time()
+            self.stopped = None
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(duration,),
+                name="sampling-profiler",
+                daemon=True,
+            )
+            self._thread.start()
+        logger.info(f"Sampling profiler started ({mode}, every {interval * 1000}ms)")
+
+    def _run(self, duration: Optional[float]):
+        own = threading.get_ident()
+        deadline = time.monotonic() + duration if duration else None
+        cpu_times: Dict[int, float] = {}
+        names: Dict[int, str] = {}
+        while not self._stop.wait(self.interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            frames = sys._current_frames()
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            sampled, previous_times, cpu_times = [], cpu_times, {}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                if self.mode == "cpu":
+                    cpu = _thread_cpu_time(ident)
+                    if cpu is not None:
+                        cpu_times[ident] = cpu
+                        if cpu <= previous_times.get(ident, cpu):
+                            continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                sampled.append(";".join(reversed(stack)))
+            with self.lock:
+                self.stacks.update(sampled)
+                self.samples += 1
+        self.stopped = time.time()
+
+    def stop(self):
+        """Stop sampling; the collected stacks are kept until the next start."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+            logger.info("Sampling profiler stopped")
+
+    def folded(self) -> str:
+        with self.lock:
+            stacks = self.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "running": self.running,
+                "mode": self.mode,
+                "interval": self.interval,
+                "started": self.started,
+                "stopped": self.stopped,
+                "samples": self.samples,
+                "stacks": len(self.stacks),
+            }
+
+
+profiler = SamplingProfiler()
@@ -1,31 +1,334 @@
+import json
 import logging
+import os
 
+import socketio as python_socketio
+from flask import request
 from flask_socketio import emit
 
 from . import socketio
+from .fanout import Fanout
+from .file_storage import parse_timestamp
+from .freshness import LAG_STAGES, FreshnessTracker
+from .groups import GroupViews, load_view_definitions
+from .metrics import (
+    LAG_SECONDS,
+    SECONDS_SINCE_UPDATE,
+    SSE_CLIENTS,
+    STALE_SENSORS,
+    WEBSOCKET_CLIENTS,
+    WEBSOCKET_EMITS,
+)
+from .sse import SSEHub
+from .stream import UpdateStream
 
 logger = logging.getLogger(__name__)
 
+update_stream = UpdateStream(int(os.getenv("STREAM_REPLAY_BUFFER", 256)))
 
-def emit_sensor_update(sensor_data: dict):
-    """Emit sensor data update to all connected clients."""
+EMITS = WEBSOCKET_EMITS.labels()
+
+
+def _send_update(sid: str, update: dict):
+    # Delivered straight to this worker's client, never back onto the queue
+    queue = fanout.clients.get(sid)
+    callback = (lambda *args: fanout.acked(sid)) if queue and queue.acks else None
+    socketio.server.emit(
+        "sensor_update", update, to=sid, ignore_queue=True, callback=callback
+    )
+    EMITS.inc()
+
+
+_backlog_probe_failed = False
+
+
+def _transport_backlog(sid: str) -> int:
+    """Number of frames still waiting in a client's engine.io send queue.
+
+    Only used for clients that do not acknowledge updates. This reads
+    engine.io internals, so if it stops working that is logged once and the
+    backlog is taken as 0, which means such clients are never demoted.
+    """
+    global _backlog_probe_failed
+    try:
+        eio_sid = socketio.server.manager.eio_sid_from_sid(sid, "/")
+        return socketio.server.eio._get_socket(eio_sid).queue.qsize()
+    except Exception as e:
+        if not _backlog_probe_failed:
+            _backlog_probe_failed = True
+            logger.warning(
+                f"Cannot read the transport backlog of clients that do not "
+                f"acknowledge updates, they will not be demoted: {e!r}"
+            )
+        return 0
+
+
+fanout = Fanout(
+    _send_update,
+    _transport_backlog,
+    max_pending=int(os.getenv("FANOUT_MAX_PENDING", 1000)),
+    max_bytes=int(os.getenv("FANOUT_MAX_QUEUED_BYTES", 256 * 1024)),
+    flush_interval=float(os.getenv("FANOUT_FLUSH_INTERVAL", 0.05)),
+    slow_backlog=int(os.getenv("FANOUT_SLOW_BACKLOG", 64)),
+)
+
+sse_hub = SSEHub(int(os.getenv("SSE_MAX_QUEUE", 256)))
+
+
+freshness = FreshnessTracker(
+    stale_after=float(os.getenv("SENSOR_STALE_AFTER", 300)),
+    stall_after=float(os.getenv("INGEST_STALL_AFTER", 120)),
+)
+LAG = {stage: LAG_SECONDS.labels(stage) for stage in LAG_STAGES}
+
+# Ingest timings ride along with a queued update and are removed on delivery
+INGEST_KEY = "_ingest"
+
+WEBSOCKET_CLIENTS.set_function(lambda: len(fanout.clients))
+SSE_CLIENTS.set_function(lambda: len(sse_hub.subscriptions))
+STALE_SENSORS.set_function(lambda: freshness.stale_count())
+SECONDS_SINCE_UPDATE.set_function(lambda: freshness.seconds_since_delivery())
+
+group_views = GroupViews(load_view_definitions(os.getenv("GROUP_VIEWS_FILE")))
+GROUP_VIEWS_INTERVAL = float(os.getenv("GROUP_VIEWS_INTERVAL", 1.0))
+
+
+def emit_sensor_update(sensor_data: dict, ingest: dict | None = None):
+    """Emit sensor data update to all connected clients.
+
+    With a message queue configured the update is published once and every
+    web worker delivers it through ``deliver_update``; otherwise it is
+    delivered to this process's clients directly. ``ingest`` holds the
+    reading's ``received_at``, ``started_at`` and ``emitted_at`` times and
+    travels with the update, so whichever process delivers it tracks
+    freshness with the ingest timings too.
+    """
     try:
-        socketio.emit("sensor_update", sensor_data, broadcast=True)
-        logger.debug(f"Emitted sensor update for {sensor_data.get('sensor_id')}")
+        if isinstance(socketio.server.manager, python_socketio.PubSubManager):
+            if ingest is not None:
+                sensor_data = {**sensor_data, INGEST_KEY: ingest}
+            socketio.emit("sensor_update", sensor_data)
+        else:
+            deliver_update(sensor_data, ingest)
+        logger.debug("Emitted sensor update for %s", sensor_data.get("sensor_id"))
     except Exception as e:
         logger.error(f"Error emitting sensor update: {e}")
 
 
+def emit_sensor_anomaly(anomaly: dict):
+    """Notify all connected clients that a reading was flagged as anomalous."""
+    try:
+        socketio.emit("sensor_anomaly", anomaly)
+        logger.debug("Emitted anomaly for %s", anomaly.get("sensor_id"))
+    except Exception as e:
+        logger.error(f"Error emitting sensor anomaly: {e}")
+
+
+def emit_sensor_alert(alert: dict):
+    """Notify all connected clients that an alert fired or resolved."""
+    try:
+        socketio.emit("sensor_alert", alert)
+        logger.debug(
+            "Emitted alert %s for %s", alert.get("rule_id"), alert.get("sensor_id")
+        )
+    except Exception as e:
+        logger.error(f"Error emitting sensor alert: {e}")
+
+
+def deliver_update(sensor_data: dict, ingest: dict | None = None):
+    """Sequence an update and queue it for this process's clients.
+
+    This is the internal update bus: Socket.IO connections and SSE streams
+    are both fed from here, sharing a single serialization of the update.
+    """
+    if INGEST_KEY in sensor_data:
+        sensor_data = dict(sensor_data)
+        ingest = sensor_data.pop(INGEST_KEY)
+    update = update_stream.publish(sensor_data)
+    group_views.apply(update)
+    _record_delivery(update, ingest)
+    encoded = json.dumps(update, default=str)
+    fanout.publish(update, size=len(encoded))
+    sse_hub.publish(update, encoded)
+
+
+def _record_delivery(update: dict, ingest: dict | None = None):
+    try:
+        device_time = parse_timestamp(update["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return
+    if isinstance(ingest, dict):
+        try:
+            record_ingest(update.get("sensor_id"), device_time, **ingest)
+        except TypeError:
+            logger.debug("Ignoring malformed ingest timings: %s", ingest)
+    lag = freshness.delivered(update.get("sensor_id"), device_time)
+    LAG["end_to_end"].observe(max(lag, 0.0))
+
+
+def seed_freshness(stats: list):
+    """Start freshness tracking from each sensor's last stored reading.
+
+    ``stats`` are the sensors' statistics; without this a restarted process
+    would only know sensors delivered since, and never flag a dead one.
+    """
+    last_readings = {}
+    for entry in stats:
+        try:
+            last_readings[entry["sensor_id"]] = parse_timestamp(
+                entry["last_reading"]
+            ).timestamp()
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+    freshness.seed(last_readings)
+
+
+def record_ingest(
+    sensor_id: str,
+    device_time: float,
+    received_at: float,
+    started_at: float,
+    emitted_at: float,
+):
+    """Record when a reading was received, processed and emitted."""
+    freshness.ingested(sensor_id, device_time, received_at, started_at, emitted_at)
+    LAG["receive"].observe(max(received_at - device_time, 0.0))
+    LAG["queue"].observe(max(started_at - received_at, 0.0))
+    LAG["process"].observe(max(emitted_at - started_at, 0.0))
+
+
+class UpdateRoutingMixin:
+    """Route queued ``sensor_update`` broadcasts through ``deliver_update``.
+
+    Mixed into the message-queue client managers so that updates published
+    by ingest processes get sequence numbers and per-client backpressure in
+    each web worker, instead of being written to every socket directly.
+    """
+
+    def _handle_emit(self, message):
+        if (
+            not self.write_only
+            and message.get("event") == "sensor_update"
+            and message.get("room") is None
+            and message.get("namespace", "/") == "/"
+        ):
+            data = message["data"]
+            deliver_update(data[0] if isinstance(data, list) else data)
+            return
+        super()._handle_emit(message)
+
+
+def queue_manager(url: str, channel: str, write_only: bool = False):
+    """Create the Socket.IO message-queue client manager for ``url``."""
+    if url.startswith(("redis://", "rediss://")):
+        base = python_socketio.RedisManager
+    elif url.startswith("kafka://"):
+        base = python_socketio.KafkaManager
+    elif url.startswith("zmq"):
+        base = python_socketio.ZmqManager
+    else:
+        base = python_socketio.KombuManager
+    manager_class = type(f"Routing{base.__name__}", (UpdateRoutingMixin, base), {})
+    return manager_class(url, channel=channel, write_only=write_only)
+
+
+def _ensure_fanout_running():
+    if not fanout.running:
+        fanout.running = True
+        socketio.start_background_task(fanout.run)
+
+
+def ensure_group_views_seeded():
+    """Fill the group views from storage the first time they are needed.
+
+    Views are otherwise fed only by live updates, so without this a freshly
+    started worker would report empty groups until every sensor reported.
+    """
+    if group_views.seeded:
+        return
+    from .tasks import get_latest_updates
+
+    group_views.seed(
+        get_latest_updates(max(v.window for v in group_views.views.values()))
+    )
+
+
+def _publish_group_views():
+    """Push changed group rows to this worker's clients periodically."""
+    while group_views.running:
+        socketio.sleep(GROUP_VIEWS_INTERVAL)
+        try:
+            changes = group_views.drain()
+            if changes:
+                socketio.server.emit("group_views_update", changes, ignore_queue=True)
+        except Exception as e:
+            logger.error(f"Error publishing group views: {e}")
+
+
+def _ensure_group_views_running():
+    if not group_views.running:
+        group_views.running = True
+        socketio.start_background_task(_publish_group_views)
+
+
+def build_sync(auth=None) -> dict:
+    """Build the catch-up payload for a (re)connecting client.
+
+    A client that passes the ``epoch`` and per-sensor ``last_seq`` it saw
+    before disconnecting gets only the buffered updates it missed; sensors
+    it has never seen or has fallen too far behind on are sent as a compact
+    snapshot of their statistics and latest update. ``truncated`` is set
+    when a resuming client could not be caught up from the buffer (another
+    epoch, or a gap on a sensor it had seen) and should refetch everything.
+    """
+    auth = auth if isinstance(auth, dict) else {}
+    resumed = auth.get("epoch") is not None
+    last_seq = auth.get("last_seq") if auth.get("epoch") == update_stream.epoch else {}
+    if not isinstance(last_seq, dict):
+        last_seq = {}
+
+    from .tasks import get_all_sensor_stats
+
+    stats = {s["sensor_id"]: s for s in get_all_sensor_stats()}
+    updates, stale, seq = update_stream.resume(last_seq, stats)
+
+    snapshot = []
+    for sensor_id in stale:
+        entry = {"sensor_id": sensor_id, "stats": stats.get(sensor_id)}
+        entry["latest"] = update_stream.latest(sensor_id)
+        snapshot.append(entry)
+
+    return {
+        "epoch": update_stream.epoch,
+        "seq": seq,
+        "updates": updates,
+        "snapshot": snapshot,
+        "truncated": resumed
+        and (
+            auth.get("epoch") != update_stream.epoch
+            or any(sensor_id in last_seq for sensor_id in stale)
+        ),
+    }
+
+
 @socketio.on("connect")
-def handle_connect():
-    """Handle client connection."""
+def handle_connect(auth=None):
+    """Handle client connection and send the client what it missed."""
     logger.info("Client connected to WebSocket")
+    fanout.register(request.sid, acks=isinstance(auth, dict) and bool(auth.get("ack")))
+    _ensure_fanout_running()
+    _ensure_group_views_running()
     emit("status", {"message": "Connected to IoT Dashboard"})
+    try:
+        emit("sensor_sync", build_sync(auth))
+    except Exception as e:
+        logger.error(f"Error building sensor sync: {e}")
 
 
 @socketio.on("disconnect")
 def handle_disconnect():
     """Handle client disconnection."""
+    fanout.unregister(request.sid)
     logger.info("Client disconnected from WebSocket")
 
 
@@ -49,6 +352,39 @@ def handle_sensor_data_request(data):
         emit("error", {"message": "Failed to retrieve sensor data"})
 
 
+@socketio.on("request_bulk_data")
+def handle_bulk_data_request(data):
+    """Handle client request for many sensors' history in one response."""
+    try:
+        from .tasks import query_sensor_readings
+        from .views import parse_bulk_query
+
+        result = query_sensor_readings(**parse_bulk_query(data or {}))
+        emit("bulk_history", result)
+        logger.debug(f"Sent bulk history for {len(result['sensors'])} sensors")
+
+    except (TypeError, ValueError) as e:
+        emit("error", {"message": str(e)})
+    except Exception as e:
+        logger.error(f"Error handling bulk data request: {e}")
+        emit("error", {"message": "Failed to retrieve sensor data"})
+
+
+@socketio.on("request_group_views")
+def handle_group_views_request(data=None):
+    """Handle client request for the current rows of the group views."""
+    try:
+        ensure_group_views_seeded()
+        view_id = (data or {}).get("view_id")
+        if view_id is not None and view_id not in group_views.views:
+            emit("error", {"message": f"Unknown group view: {view_id}"})
+            return
+        emit("group_views", {"views": group_views.read(view_id)})
+    except Exception as e:
+        logger.error(f"Error handling group views request: {e}")
+        emit("error", {"message": "Failed to retrieve group views"})
+
+
 @socketio.on("request_all_stats")
 def handle_stats_request():
     """Handle client request for all sensor statistics."""
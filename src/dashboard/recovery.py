@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .anomaly import AnomalyDetector
+from .file_storage import RAW_READINGS, FileStorage
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"IOTS"
+SNAPSHOT_VERSION = 1
+
+# Snapshot header: magic, format version, CRC-32 of the compressed body
+_HEADER = struct.Struct("<4sBI")
+
+
+def encode_snapshot(state: Dict[str, Any]) -> bytes:
+    body = zlib.compress(json.dumps(state, separators=(",", ":")).encode(), 6)
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, zlib.crc32(body)) + body
+
+
+def decode_snapshot(data: bytes) -> Dict[str, Any]:
+    """Decode a snapshot; raises ValueError if it is truncated or corrupt."""
+    try:
+        magic, version, checksum = _HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("Snapshot is truncated")
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError("Not a version 1 snapshot")
+    body = data[_HEADER.size :]
+    if zlib.crc32(body) != checksum:
+        raise ValueError("Snapshot checksum mismatch")
+    state = json.loads(zlib.decompress(body))
+    if not isinstance(state, dict):
+        raise ValueError("Snapshot is not an object")
+    return state
+
+
+class Recovery:
+    """Snapshots the state a restarted process cannot cheaply rebuild.
+
+    That is each sensor's anomaly model and the storage lateness watermarks.
+    On start the snapshot's models are loaded and only the readings stored
+    after each model's newest one are replayed, so anomaly scoring is warm
+    straight away; a sensor missing from the snapshot is warmed from its
+    newest ``max_replay`` readings. Snapshots are written every
+    ``interval`` seconds and on exit, to a temporary file that replaces
+    the previous one.
+    """
+
+    def __init__(
+        self, path: str, interval: float = 60.0, max_replay: int = RAW_READINGS
+    ):
+        self.path = path
+        self.interval = interval
+        self.max_replay = max_replay
+        self.saved = self.load()
+        self.written_at: Optional[float] = None
+        self.restored: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def load(self) -> Dict[str, Any]:
+        """The last snapshot written, or nothing if it is missing or corrupt."""
+        try:
+            with open(self.path, "rb") as f:
+                return decode_snapshot(f.read())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning(f"Ignoring recovery snapshot {self.path}: {e}")
+            return {}
+
+    def restore(
+        self, storage: FileStorage, detector: AnomalyDetector
+    ) -> Dict[str, Any]:
+        """Load the snapshot's models into ``detector`` and replay newer readings."""
+        started = time.perf_counter()
+        models = self.saved.get("anomaly") or {}
+        try:
+            detector.load(models)
+        except (AttributeError, ValueError) as e:
+            logger.warning(f"Discarding anomaly models from snapshot: {e}")
+            models = {}
+        replayed = self.replay(storage, detector)
+        self.restored = {
+            "snapshot": bool(self.saved),
+            "snapshot_written_at": self.saved.get("written_at"),
+            "models": len(models),
+            "replayed": replayed,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info(
+            f"Recovered {len(models)} anomaly models and replayed {replayed} "
+            f"readings in {self.restored['seconds']}s"
+        )
+        return self.restored
+
+    def replay(self, storage: FileStorage, detector: AnomalyDetector) -> int:
+        """Score readings newer than each sensor's model; returns how many."""
+        last_seen = detector.last_seen()
+        starts = {
+            sensor_id: last_seen.get(sensor_id)
+            for sensor_id in sorted(storage.select_sensors())
+        }
+        replayed = 0
+        for sensor_id, times, values in storage.iter_series(starts):
+            last = starts[sensor_id]
+            if last is not None:
+                newer = times > np.datetime64(last, "us")
+                times, values = times[newer], values[newer]
+            else:
+                times, values = times[-self.max_replay :], values[-self.max_replay :]
+            for at, value in zip(times.tolist(), values.tolist()):
+                detector.score(sensor_id, at, value)
+            replayed += len(values)
+        return replayed
+
+    def capture(
+        self, storage: FileStorage, detector: AnomalyDetector
+    ) -> Dict[str, Any]:
+        return {
+            "written_at": datetime.now().isoformat(),
+            "storage": storage.index(),
+            "anomaly": detector.to_dict(),
+        }
+
+    def write(self, storage: FileStorage, detector: AnomalyDetector):
+        """Write a snapshot of the current state."""
+        data = encode_snapshot(self.capture(storage, detector))
+        temporary = f"{self.path}.tmp"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, self.path)
+        self.written_at = time.time()
+
+    def start(self, storage: FileStorage, detector: AnomalyDetector):
+        """Write snapshots every ``interval`` seconds from a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(storage, detector), name="recovery", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, storage: FileStorage, detector: AnomalyDetector):
+        while not self._stop.wait(self.interval):
+            self._write_logged(storage, detector)
+        self._write_logged(storage, detector)
+
+    def _write_logged(self, storage: FileStorage, detector: AnomalyDetector):
+        try:
+            self.write(storage, detector)
+        except Exception as e:
+            logger.error(f"Error writing recovery snapshot: {e}")
+
+    def stop(self):
+        """Stop the snapshot thread after a final snapshot."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+            self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "interval": self.interval,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "written_at": self.written_at,
+            "restored": self.restored,
+        }
+
+
+recovery = Recovery(
+    os.getenv("RECOVERY_SNAPSHOT", os.path.join("data", "recovery.snapshot")),
+    float(os.getenv("RECOVERY_INTERVAL", 60)),
+)
@@ -0,0 +1,135 @@
+import json
+import sys
+from typing import Any, Dict, Iterable, Optional, Set
+
+# Reading fields that describe the sensor rather than the measurement
+SENSOR_FIELDS = ("sensor_type", "unit", "location", "metadata", "tags")
+GROUP_KEYS = {"type": "sensor_type", "location": "location", "tag": "tags"}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class SensorRegistry:
+    """Per-sensor metadata held once, with secondary indexes.
+
+    Entries hold ``sensor_type``, ``unit``, ``location``, ``metadata`` and
+    ``tags``. Strings are interned and identical metadata dicts are shared,
+    so thousands of sensors of the same model cost little more than one.
+    Sensor ids are indexed by type, location and each tag, so selections
+    like "all kitchen temperature sensors" are set intersections instead of
+    a scan.
+    """
+
+    def __init__(self):
+        self.sensors: Dict[str, Dict[str, Any]] = {}
+        self.indexes: Dict[str, Dict[Any, Set[str]]] = {
+            "sensor_type": {},
+            "location": {},
+            "tags": {},
+        }
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+
+    def _intern_metadata(self, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if not metadata:
+            metadata = {}
+        key = json.dumps(metadata, sort_keys=True, default=str)
+        return self._metadata.setdefault(key, metadata)
+
+    def _index(self, sensor_id: str, entry: Dict[str, Any], add: bool):
+        for field, index in self.indexes.items():
+            values = entry[field] if field == "tags" else [entry[field]]
+            for value in values:
+                if value is None:
+                    continue
+                if add:
+                    index.setdefault(value, set()).add(sensor_id)
+                else:
+                    members = index.get(value)
+                    if members is not None:
+                        members.discard(sensor_id)
+                        if not members:
+                            del index[value]
+
+    def register(self, sensor_id: str, fields: Dict[str, Any]) -> bool:
+        """Create or update a sensor from the sensor fields of a reading.
+
+        Fields missing from ``fields`` keep their current values. Returns
+        whether the entry changed.
+        """
+        current = self.sensors.get(sensor_id)
+        entry = (
+            dict(current)
+            if current
+            else {
+                "sensor_type": "",
+                "unit": "",
+                "location": None,
+                "metadata": self._intern_metadata(None),
+                "tags": (),
+            }
+        )
+        for field in SENSOR_FIELDS:
+            if field not in fields:
+                continue
+            value = fields[field]
+            if field == "metadata":
+                value = self._intern_metadata(value)
+            elif field == "tags":
+                value = tuple(sorted({_intern(str(tag)) for tag in value or ()}))
+            else:
+                value = _intern(value)
+            entry[field] = value
+
+        if entry == current:
+            return False
+        sensor_id = _intern(sensor_id)
+        if current:
+            self._index(sensor_id, current, add=False)
+        self.sensors[sensor_id] = entry
+        self._index(sensor_id, entry, add=True)
+        return True
+
+    def get(self, sensor_id: str) -> Optional[Dict[str, Any]]:
+        return self.sensors.get(sensor_id)
+
+    def describe(self, sensor_id: str) -> Dict[str, Any]:
+        """Return a sensor's entry as plain JSON-ready data."""
+        entry = self.sensors[sensor_id]
+        return {"sensor_id": sensor_id, **entry, "tags": list(entry["tags"])}
+
+    def select(
+        self,
+        sensor_ids: Optional[Iterable[str]] = None,
+        sensor_type: Optional[str] = None,
+        location: Optional[str] = None,
+        tag: Optional[str] = None,
+    ) -> Set[str]:
+        """Ids of registered sensors matching every given selector."""
+        selected = set(self.sensors) if sensor_ids is None else set(sensor_ids)
+        for field, value in (
+            ("sensor_type", sensor_type),
+            ("location", location),
+            ("tags", tag),
+        ):
+            if value is not None:
+                selected &= self.indexes[field].get(value, set())
+        return selected
+
+    def groups(self, by: str) -> Dict[Any, Set[str]]:
+        """Sensor ids per distinct ``type``, ``location`` or ``tag``."""
+        return self.indexes[GROUP_KEYS[by]]
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {sensor_id: self.describe(sensor_id) for sensor_id in self.sensors}
+
+    def load(self, data: Dict[str, Dict[str, Any]]):
+        """Replace the registry with the contents of ``sensors.json``."""
+        self.sensors.clear()
+        for index in self.indexes.values():
+            index.clear()
+        self._metadata.clear()
+        for sensor_id, fields in data.items():
+            if isinstance(fields, dict):
+                self.register(sensor_id, fields)
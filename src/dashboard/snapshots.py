@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Hashable, Optional
+
+from flask import Response, request
+
+
+@dataclass
+class Snapshot:
+    version: int
+    last_modified: datetime
+    body: bytes
+    gzipped: bytes
+    digest: str
+
+
+class SnapshotCache:
+    """Serialized (and gzip-compressed) response bodies keyed by version.
+
+    A body is rebuilt only when the change counter it was built from moves
+    on; in between, every poll is answered from the cached bytes or with
+    ``304 Not Modified``. The counters are per process, so ETags are built
+    from a hash of the body rather than from the version: every worker,
+    before and after a restart, gives the same data the same tag.
+
+    Keys come from request arguments, so only the ``max_entries`` most
+    recently used snapshots are kept.
+    """
+
+    def __init__(self, compresslevel: int = 6, max_entries: int = 256):
+        self.compresslevel = compresslevel
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._snapshots: "OrderedDict[Hashable, Snapshot]" = OrderedDict()
+
+    def get(
+        self,
+        key: Hashable,
+        version: int,
+        last_modified: datetime,
+        build: Callable[[], Any],
+    ) -> Optional[Snapshot]:
+        """The snapshot of ``key`` at ``version``, built if needed.
+
+        Returns None, and caches nothing, when ``build`` returns None.
+        """
+        with self.lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        data = build()
+        if data is None:
+            return None
+        body = json.dumps(data, default=str).encode("utf-8")
+        snapshot = Snapshot(
+            version=version,
+            last_modified=last_modified,
+            body=body,
+            gzipped=gzip.compress(body, compresslevel=self.compresslevel),
+            digest=hashlib.blake2b(body, digest_size=16).hexdigest(),
+        )
+        with self.lock:
+            self._snapshots[key] = snapshot
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+
+def snapshot_response(snapshot: Snapshot, tag: str) -> Response:
+    """Serve a snapshot with ETag/Last-Modified, gzip when accepted, or a 304."""
+    use_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+    body = snapshot.gzipped if use_gzip else snapshot.body
+    response = Response(body, mimetype="application/json")
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    response.set_etag(f"{tag}-{snapshot.digest}" + ("-gzip" if use_gzip else ""))
+    response.last_modified = snapshot.last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
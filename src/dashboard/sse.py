@@ -0,0 +1,92 @@
+import json
+import queue
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+
+def format_event(update: Dict[str, Any], encoded: Optional[str] = None) -> bytes:
+    """Serialize an update as a Server-Sent Events frame."""
+    encoded = encoded if encoded is not None else json.dumps(update, default=str)
+    return (
+        f"id: {update.get('sensor_id')}:{update.get('seq', '')}\n"
+        f"event: sensor_update\n"
+        f"data: {encoded}\n\n"
+    ).encode("utf-8")
+
+
+class Subscription:
+    """One SSE client: its filters and a bounded queue of encoded frames."""
+
+    def __init__(
+        self,
+        sensor_ids: Optional[Iterable[str]] = None,
+        types: Optional[Iterable[str]] = None,
+        max_queue: int = 256,
+    ):
+        self.sensor_ids = frozenset(sensor_ids) if sensor_ids else None
+        self.types = frozenset(types) if types else None
+        self.frames: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def matches(self, update: Dict[str, Any]) -> bool:
+        if (
+            self.sensor_ids is not None
+            and update.get("sensor_id") not in self.sensor_ids
+        ):
+            return False
+        if self.types is not None and update.get("sensor_type") not in self.types:
+            return False
+        return True
+
+    def put(self, frame: bytes):
+        """Queue a frame, discarding the oldest one if the client lags."""
+        while True:
+            try:
+                self.frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float) -> Optional[bytes]:
+        try:
+            return self.frames.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SSEHub:
+    """Fan updates out to Server-Sent Events subscribers.
+
+    Each update is encoded into an SSE frame once, the first time a matching
+    subscriber needs it, and the same bytes are queued for every subscriber,
+    so an extra client costs a filter check and a queue put per event.
+    """
+
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.subscriptions: set = set()
+
+    def subscribe(self, sensor_ids=None, types=None) -> Subscription:
+        subscription = Subscription(sensor_ids, types, self.max_queue)
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, update: Dict[str, Any], encoded: Optional[str] = None):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        frame = None
+        for subscription in subscriptions:
+            if subscription.matches(update):
+                if frame is None:
+                    frame = format_event(update, encoded)
+                subscription.put(frame)
@@ -0,0 +1,70 @@
+import threading
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class UpdateStream:
+    """Per-sensor sequence numbers with a bounded replay buffer.
+
+    Every published update gets the next sequence number for its sensor and
+    is kept in a fixed-size buffer, so a reconnecting client can be sent only
+    the updates it missed. The ``epoch`` identifies this process's counters;
+    a client holding sequence numbers from another epoch (a restart or a
+    different web worker) cannot resume and gets a snapshot instead.
+    """
+
+    def __init__(self, buffer_size: int = 256):
+        self.buffer_size = buffer_size
+        self.epoch = uuid.uuid4().hex
+        self.lock = threading.Lock()
+        self._seq: Dict[str, int] = {}
+        self._buffers: Dict[str, deque] = {}
+
+    def publish(self, update: Dict[str, Any]) -> Dict[str, Any]:
+        """Stamp an update with its sensor's next sequence number and buffer it."""
+        sensor_id = update.get("sensor_id")
+        with self.lock:
+            seq = self._seq.get(sensor_id, 0) + 1
+            self._seq[sensor_id] = seq
+            stamped = {**update, "seq": seq}
+            buffer = self._buffers.get(sensor_id)
+            if buffer is None:
+                buffer = self._buffers[sensor_id] = deque(maxlen=self.buffer_size)
+            buffer.append(stamped)
+        return stamped
+
+    def latest(self, sensor_id: str) -> Optional[Dict[str, Any]]:
+        """Return the most recent buffered update for a sensor."""
+        with self.lock:
+            buffer = self._buffers.get(sensor_id)
+            return buffer[-1] if buffer else None
+
+    def resume(
+        self, last_seq: Dict[str, int], sensor_ids=()
+    ) -> Tuple[List[Dict[str, Any]], List[str], Dict[str, int]]:
+        """Work out what a client needs to catch up.
+
+        Returns the missed updates that are still buffered, in sequence order
+        per sensor, the ids of sensors that need a snapshot because the client
+        has never seen them or has fallen behind the buffer, and the sequence
+        numbers the client is caught up to afterwards. Sensors in
+        ``sensor_ids`` that this stream has not seen yet are only snapshotted
+        when the client does not know them either.
+        """
+        updates: List[Dict[str, Any]] = []
+        stale: List[str] = []
+        with self.lock:
+            for sensor_id in set(self._seq) | set(sensor_ids) | set(last_seq):
+                current = self._seq.get(sensor_id, 0)
+                seen = last_seq.get(sensor_id)
+                if seen is not None and seen == current:
+                    continue
+                buffer = self._buffers.get(sensor_id)
+                if seen is not None and buffer and buffer[0]["seq"] <= seen + 1:
+                    if seen < current:
+                        updates.extend(u for u in buffer if u["seq"] > seen)
+                        continue
+                if current or seen is None:
+                    stale.append(sensor_id)
+            return updates, stale, dict(self._seq)
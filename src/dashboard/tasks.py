@@ -1,18 +1,78 @@
+import atexit
+import base64
 import json
 import logging
 import os
+import threading
 import time
-import traceback
+from collections.abc import Iterator
 from datetime import datetime, timedelta
 from typing import Any
 
-from .file_storage import FileStorage
+import numpy as np
+
+from .aggregation import (
+    aggregate_raw,
+    aggregate_rollups,
+    can_use_rollups,
+    rollup_raw,
+)
+from .alerts import AlertEngine, AlertRule, WebhookNotifier
+from .anomaly import AnomalyDetector
+from .export import export_readings
+from .file_storage import FileStorage, parse_timestamp
+from .logs import events
+from .metrics import (
+    INGEST_SECONDS,
+    MESSAGES_FAILED,
+    MESSAGES_LATE,
+    MESSAGES_PARSED,
+    MESSAGES_RECEIVED,
+    STAGE_SECONDS,
+)
 from .models import SensorReading, SensorStats
-from .realtime import emit_sensor_update
+from .realtime import (
+    emit_sensor_alert,
+    emit_sensor_anomaly,
+    emit_sensor_update,
+    ensure_group_views_seeded,
+    seed_freshness,
+)
+from .recovery import recovery
+from .tracing import annotate, span, tracer
 
 logger = logging.getLogger(__name__)
 
-file_storage = FileStorage()
+# Series bound once so recording on the hot path is a single call
+STAGES = {
+    source: {
+        stage: STAGE_SECONDS.labels(source, stage)
+        for stage in ("parse", "late", "anomaly", "store", "stats", "alerts", "emit")
+    }
+    for source in ("mqtt", "batch")
+}
+MESSAGE_METRICS = {
+    source: (
+        MESSAGES_RECEIVED.labels(source),
+        MESSAGES_PARSED.labels(source),
+        MESSAGES_FAILED.labels(source),
+        MESSAGES_LATE.labels(source),
+        INGEST_SECONDS.labels(source),
+    )
+    for source in ("mqtt", "batch")
+}
+
+# Per-message log lines, sampled and rate limited (see logs.HotEvents)
+LOG_PROCESSED = events.event("ingest.processed", logger, sampled=True)
+LOG_BATCH = events.event("ingest.batch", logger)
+LOG_LATE = events.event("ingest.late", logger)
+LOG_ANOMALY = events.event("ingest.anomaly", logger)
+LOG_FAILED = events.event("ingest.failed", logger, logging.ERROR)
+
+file_storage = FileStorage(
+    lateness=float(os.getenv("READING_LATENESS", 300)),
+    index=recovery.saved.get("storage"),
+)
 
 
 class SimpleRedisClient:
@@ -29,9 +89,47 @@ class SimpleRedisClient:
 # Exposed for tests to patch
 redis_client = SimpleRedisClient()
 
+anomaly_detector = AnomalyDetector(
+    alpha=float(os.getenv("ANOMALY_ALPHA", 0.05)),
+    threshold=float(os.getenv("ANOMALY_THRESHOLD", 4.0)),
+    warmup=int(os.getenv("ANOMALY_WARMUP", 30)),
+)
+
+alert_engine = AlertEngine()
+# Records alerts, and POSTs them when a webhook URL is configured
+alert_webhook = WebhookNotifier(os.getenv("ALERT_WEBHOOK_URL"))
+ALERT_RULES_CHECK_INTERVAL = 1.0
+
+
+def start_recovery(ingest: bool = True) -> dict[str, Any]:
+    """Warm this process up from the recovery snapshot before it serves.
+
+    Anomaly models are restored and caught up on readings stored since the
+    snapshot, and the live group views and freshness tracking are seeded
+    from storage. Only one process sharing
+    a data directory, the one that ingests MQTT, passes ``ingest``: it first
+    migrates data written by older versions, loads the alert rules and
+    starts the absence monitor, then writes snapshots from then on.
+    """
+    if ingest:
+        file_storage.migrate()
+    summary = recovery.restore(file_storage, anomaly_detector)
+    ensure_group_views_seeded()
+    seed_freshness(file_storage.get_all_stats())
+    if ingest:
+        sync_alert_rules(force=True)
+        _ensure_alert_monitor()
+        recovery.start(file_storage, anomaly_detector)
+        atexit.register(recovery.stop)
+    return summary
+
+
+def process_sensor_data(*args, received_at: float | None = None):
+    """Process sensor data; supports both (topic, payload) and (task, topic, payload).
 
-def process_sensor_data(*args):
-    """Process sensor data; supports both (topic, payload) and (task, topic, payload)."""
+    ``received_at`` is when the MQTT client received the message, as a Unix
+    time; it defaults to now.
+    """
     task = None
     if len(args) == 2:
         topic, payload = args
@@ -42,19 +140,62 @@ def process_sensor_data(*args):
             "process_sensor_data expects (topic, payload) or (task, topic, payload)"
         )
 
+    with tracer.trace("process_sensor_data", source="mqtt", topic=topic):
+        return _process_message(task, topic, payload, received_at)
+
+
+def _process_message(
+    task, topic: str, payload: str, received_at: float | None
+) -> dict[str, Any]:
+    """Run one MQTT message through the ingest stages, timing each."""
     start_time = time.time()
+    received, parsed, failed, late, ingest_seconds = MESSAGE_METRICS["mqtt"]
+    stages = STAGES["mqtt"]
+    received.inc()
 
     try:
-        logger.info(f"Processing sensor data from topic: {topic}")
-        reading = SensorReading.from_mqtt_payload(topic, payload)
+        with span("parse", stages["parse"]):
+            reading = SensorReading.from_mqtt_payload(topic, payload)
+        parsed.inc()
+        annotate(sensor_id=reading.sensor_id)
 
-        store_raw_reading(reading)
-        update_sensor_statistics(reading)
-        emit_sensor_update(reading.to_dict())
+        with span("late", stages["late"]):
+            reading_is_late = is_late(reading)
+        if reading_is_late:
+            late.inc()
+            annotate(late=True)
+            correct_late_readings([reading])
+            processing_time = time.time() - start_time
+            ingest_seconds.observe(processing_time)
+            return {
+                "status": "late",
+                "sensor_id": reading.sensor_id,
+                "processing_time": processing_time,
+            }
+
+        with span("anomaly", stages["anomaly"]):
+            anomaly = detect_anomaly(reading)
+        with span("store", stages["store"]):
+            store_raw_reading(reading)
+        with span("stats", stages["stats"]):
+            update_sensor_statistics(reading)
+        with span("alerts", stages["alerts"]):
+            evaluate_alerts(reading)
+        with span("emit", stages["emit"]):
+            emit_sensor_update(
+                reading.to_dict(), _ingest_timings(received_at, start_time)
+            )
+            if anomaly:
+                emit_sensor_anomaly(anomaly)
 
         processing_time = time.time() - start_time
-        logger.info(
-            f"Successfully processed reading from sensor {reading.sensor_id}: {reading.value} {reading.unit} (Processing time: {processing_time:.3f}s)"
+        ingest_seconds.observe(processing_time)
+        LOG_PROCESSED(
+            "Processed reading from sensor %s: %s %s (Processing time: %.3fs)",
+            reading.sensor_id,
+            reading.value,
+            reading.unit,
+            processing_time,
         )
         return {
             "status": "success",
@@ -63,86 +204,395 @@ def process_sensor_data(*args):
         }
 
     except Exception as e:
-        logger.error(f"Error processing sensor data: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        failed.inc()
+        LOG_FAILED("Error processing sensor data: %s", e, exc_info=True, topic=topic)
         if task is not None and hasattr(task, "retry"):
             task.retry()
         raise
 
 
+def _ingest_timings(received_at: float | None, started_at: float) -> dict:
+    """When a reading was received, processing started and it was emitted."""
+    return {
+        "received_at": received_at or started_at,
+        "started_at": started_at,
+        "emitted_at": time.time(),
+    }
+
+
+def is_late(reading: SensorReading) -> bool:
+    """Whether a reading is behind its sensor's lateness watermark."""
+    return file_storage.late_mask([(reading.sensor_id, reading.timestamp.isoformat())])[
+        0
+    ]
+
+
+def correct_late_readings(readings: list[SensorReading]) -> None:
+    """Fold readings that arrived past the watermark into stored history.
+
+    They are inserted in time order and counted in statistics and their
+    own minute's rollup, which advances the sensors' change counters so
+    cached history and aggregates are refreshed. They skip the live path:
+    anomaly models, alert rules and live views only see on-time readings.
+    """
+    batch = [(reading.sensor_id, reading.to_dict()) for reading in readings]
+    file_storage.store_readings(batch)
+    file_storage.update_stats_many(batch)
+    file_storage.update_rollups(batch)
+    for reading in readings:
+        LOG_LATE(
+            "Corrected history of sensor %s with late reading from %s",
+            reading.sensor_id,
+            reading.timestamp,
+        )
+
+
+def detect_anomaly(reading: SensorReading) -> dict[str, Any] | None:
+    """Score a reading against its sensor's model and flag it if anomalous.
+
+    The flag is attached to the reading so it is stored and emitted with it;
+    the returned event describes the anomaly for ``sensor_anomaly``.
+    """
+    try:
+        flag = anomaly_detector.score(
+            reading.sensor_id, reading.timestamp, reading.value
+        )
+    except Exception as e:
+        logger.error(f"Error scoring reading from sensor {reading.sensor_id}: {e}")
+        return None
+    if flag is None:
+        return None
+
+    reading.anomaly = flag
+    LOG_ANOMALY(
+        "Anomalous reading from sensor %s: %s (expected %s, score %s)",
+        reading.sensor_id,
+        reading.value,
+        flag["expected"],
+        flag["score"],
+    )
+    return {
+        "sensor_id": reading.sensor_id,
+        "sensor_type": reading.sensor_type,
+        "location": reading.location,
+        "timestamp": reading.timestamp.isoformat(),
+        "value": reading.value,
+        **flag,
+    }
+
+
 def store_raw_reading(reading: SensorReading) -> None:
     """Store raw sensor reading in file storage and Redis (mockable)."""
     try:
         reading_data = reading.to_dict()
         # File-based persistence for app logic
         file_storage.store_reading(reading.sensor_id, reading_data)
-        # Redis-mockable side-effect for tests
-        key = f"reading:{reading.sensor_id}:{reading_data['timestamp']}"
-        redis_client.setex(key, 3600, json.dumps(reading_data))
-        logger.debug(f"Stored raw reading for sensor {reading.sensor_id}")
+        _cache_reading(reading, reading_data)
+        logger.debug("Stored raw reading for sensor %s", reading.sensor_id)
 
     except Exception as e:
         logger.error(f"Error storing raw reading: {e}")
         raise
 
 
+def _cache_reading(reading: SensorReading, reading_data: dict[str, Any]) -> None:
+    # Redis-mockable side-effect for tests
+    key = f"reading:{reading.sensor_id}:{reading_data['timestamp']}"
+    redis_client.setex(key, 3600, json.dumps(reading_data))
+
+
 def update_sensor_statistics(reading: SensorReading) -> None:
     """Update sensor statistics using file storage and Redis (mockable)."""
     try:
         reading_data = reading.to_dict()
         # File-based stats for app logic
         file_storage.update_stats(reading.sensor_id, reading_data)
+        file_storage.update_rollup(reading.sensor_id, reading_data)
+        _cache_stats(reading, reading_data)
+        logger.debug("Updated statistics for sensor %s", reading.sensor_id)
 
-        # Redis-mockable stats for tests
-        stats_key = f"stats:{reading.sensor_id}"
-        raw = redis_client.get(stats_key)
-        if raw:
-            try:
-                current = json.loads(raw)
-            except Exception:
-                current = None
-        else:
+    except Exception as e:
+        logger.error(f"Error updating sensor statistics: {e}")
+        raise
+
+
+def _cache_stats(reading: SensorReading, reading_data: dict[str, Any]) -> None:
+    # Redis-mockable stats for tests
+    stats_key = f"stats:{reading.sensor_id}"
+    raw = redis_client.get(stats_key)
+    if raw:
+        try:
+            current = json.loads(raw)
+        except Exception:
             current = None
+    else:
+        current = None
 
-        if not current:
-            stats = {
-                "sensor_id": reading.sensor_id,
-                "min_value": reading.value,
-                "max_value": reading.value,
-                "avg_value": reading.value,
-                "count": 1,
-                "last_reading": reading_data["timestamp"],
-            }
-        else:
-            count = int(current.get("count", 0)) + 1
-            total = (
-                float(current.get("avg_value", reading.value)) * (count - 1)
-                + reading.value
-            )
-            stats = {
-                "sensor_id": reading.sensor_id,
-                "min_value": min(
-                    float(current.get("min_value", reading.value)), reading.value
-                ),
-                "max_value": max(
-                    float(current.get("max_value", reading.value)), reading.value
-                ),
-                "avg_value": total / count,
-                "count": count,
-                "last_reading": reading_data["timestamp"],
-            }
+    if not current:
+        stats = {
+            "sensor_id": reading.sensor_id,
+            "min_value": reading.value,
+            "max_value": reading.value,
+            "avg_value": reading.value,
+            "count": 1,
+            "last_reading": reading_data["timestamp"],
+        }
+    else:
+        count = int(current.get("count", 0)) + 1
+        total = (
+            float(current.get("avg_value", reading.value)) * (count - 1) + reading.value
+        )
+        stats = {
+            "sensor_id": reading.sensor_id,
+            "min_value": min(
+                float(current.get("min_value", reading.value)), reading.value
+            ),
+            "max_value": max(
+                float(current.get("max_value", reading.value)), reading.value
+            ),
+            "avg_value": total / count,
+            "count": count,
+            "last_reading": reading_data["timestamp"],
+        }
+
+    redis_client.setex(stats_key, 3600, json.dumps(stats))
 
-        redis_client.setex(stats_key, 3600, json.dumps(stats))
-        logger.debug(f"Updated statistics for sensor {reading.sensor_id}")
 
+def sync_alert_rules(force: bool = False) -> None:
+    """Reload alert rules when the rules file has changed.
+
+    The file is checked at most once per ``ALERT_RULES_CHECK_INTERVAL`` so
+    rules edited through another process are picked up without a stat per
+    reading.
+    """
+    now = time.monotonic()
+    if not force and now - alert_engine.rules_checked < ALERT_RULES_CHECK_INTERVAL:
+        return
+    alert_engine.rules_checked = now
+    if not force and file_storage.alert_rules_mtime() == alert_engine.rules_version:
+        return
+
+    version, definitions = file_storage.get_alert_rules()
+    rules = []
+    for rule_id, definition in definitions.items():
+        try:
+            rules.append(AlertRule.from_dict(definition))
+        except ValueError as e:
+            logger.error(f"Skipping alert rule {rule_id}: {e}")
+    alert_engine.set_rules(rules, version)
+    logger.info(f"Loaded {len(rules)} alert rules")
+    watch_absence()
+
+
+def watch_absence() -> None:
+    """Start absence deadlines for every registered sensor.
+
+    A deadline is otherwise only set by a reading, so a sensor that went
+    quiet before a restart or a rule change would never fire. Each one
+    counts from the sensor's last stored reading.
+    """
+    if not any(rule.kind == "absence" for rule in alert_engine.rules.values()):
+        return
+    last_readings = {
+        entry.get("sensor_id"): entry.get("last_reading")
+        for entry in file_storage.get_all_stats()
+    }
+    now = datetime.now()
+    for sensor in file_storage.list_sensors():
+        try:
+            last = parse_timestamp(last_readings[sensor["sensor_id"]])
+            silent_for = max((now - last).total_seconds(), 0.0)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            silent_for = 0.0
+        alert_engine.watch(
+            sensor["sensor_id"],
+            sensor.get("sensor_type"),
+            sensor.get("location"),
+            sensor.get("tags") or (),
+            silent_for,
+        )
+
+
+def evaluate_alerts(reading: SensorReading) -> list[dict[str, Any]]:
+    """Run a reading through the alert rules that match its sensor."""
+    try:
+        sync_alert_rules()
+        alerts = alert_engine.evaluate(
+            reading.sensor_id,
+            reading.timestamp,
+            reading.value,
+            reading.sensor_type,
+            reading.location,
+            reading.tags or (),
+        )
     except Exception as e:
-        logger.error(f"Error updating sensor statistics: {e}")
-        raise
+        logger.error(f"Error evaluating alerts for sensor {reading.sensor_id}: {e}")
+        return []
+
+    for alert in alerts:
+        notify_alert(alert)
+    _ensure_alert_monitor()
+    return alerts
+
+
+def notify_alert(alert: dict[str, Any]) -> None:
+    logger.warning(
+        f"Alert {alert['state']}: {alert['rule_name']} on sensor "
+        f"{alert['sensor_id']} ({alert['condition']})"
+    )
+    emit_sensor_alert(alert)
+    alert_webhook.send(alert)
+
 
+def _ensure_alert_monitor() -> None:
+    """Start the absence check loop once absence rules exist."""
+    if alert_engine.running:
+        return
+    if any(rule.kind == "absence" for rule in alert_engine.rules.values()):
+        alert_engine.running = True
+        threading.Thread(
+            target=alert_engine.run, args=(notify_alert,), daemon=True
+        ).start()
 
-def get_all_sensor_stats() -> list[dict[str, Any]]:
+
+def get_alert_rules() -> list[dict[str, Any]]:
+    _, definitions = file_storage.get_alert_rules()
+    return list(definitions.values())
+
+
+def save_alert_rule(definition: dict[str, Any]) -> dict[str, Any]:
+    """Create or replace an alert rule; raises ValueError if it is invalid."""
+    rule = AlertRule.from_dict(definition)
+    _, definitions = file_storage.get_alert_rules()
+    definitions[rule.id] = rule.to_dict()
+    file_storage.save_alert_rules(definitions)
+    sync_alert_rules(force=True)
+    return rule.to_dict()
+
+
+def delete_alert_rule(rule_id: str) -> bool:
+    _, definitions = file_storage.get_alert_rules()
+    if definitions.pop(rule_id, None) is None:
+        return False
+    file_storage.save_alert_rules(definitions)
+    sync_alert_rules(force=True)
+    return True
+
+
+def get_alerts() -> dict[str, Any]:
+    """Alerts firing in this process and the most recent alert changes."""
+    return {"active": alert_engine.active(), "recent": alert_webhook.recent()}
+
+
+def parse_reading_batch(
+    items: list[Any],
+) -> tuple[list[SensorReading], list[dict[str, Any]]]:
+    """Validate a batch of decoded readings.
+
+    Returns the readings that parsed and a report of the ones that did not,
+    each as ``{"index": i, "error": message}``.
+    """
+    readings, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, ValueError):
+                raise item
+            if not isinstance(item, dict):
+                raise ValueError("Invalid sensor data format: expected an object")
+            if not item.get("sensor_id"):
+                raise ValueError("Invalid sensor data format: missing 'sensor_id'")
+            readings.append(SensorReading.from_dict(item))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    return readings, errors
+
+
+def process_sensor_batch(
+    items: list[Any], received_at: float | None = None
+) -> dict[str, Any]:
+    """Validate and process a batch of readings through the ingest pipeline.
+
+    Valid readings are stored, folded into statistics and rollups with one
+    storage write per file for the whole batch, and then emitted; invalid
+    ones are reported by index without failing the rest of the batch.
+    Readings behind the lateness watermark take the correction path.
+    """
+    with tracer.trace("process_sensor_batch", source="batch", size=len(items)):
+        return _process_batch(items, received_at)
+
+
+def _process_batch(items: list[Any], received_at: float | None) -> dict[str, Any]:
+    """Run a batch through the ingest stages, timing each."""
+    start_time = time.time()
+    received, parsed, failed, late_count, ingest_seconds = MESSAGE_METRICS["batch"]
+    stages = STAGES["batch"]
+    received.inc(len(items))
+    with span("parse", stages["parse"]):
+        readings, errors = parse_reading_batch(items)
+    parsed.inc(len(readings))
+    failed.inc(len(errors))
+
+    with span("late", stages["late"]):
+        late_mask = file_storage.late_mask(
+            [(reading.sensor_id, reading.timestamp.isoformat()) for reading in readings]
+        )
+    late = [reading for reading, flag in zip(readings, late_mask) if flag]
+    if late:
+        late_count.inc(len(late))
+        correct_late_readings(late)
+        readings = [reading for reading, flag in zip(readings, late_mask) if not flag]
+
+    if readings:
+        with span("anomaly", stages["anomaly"]):
+            anomalies = [detect_anomaly(reading) for reading in readings]
+        batch = [(reading.sensor_id, reading.to_dict()) for reading in readings]
+        with span("store", stages["store"]):
+            file_storage.store_readings(batch)
+        with span("stats", stages["stats"]):
+            file_storage.update_stats_many(batch)
+            file_storage.update_rollups(batch)
+        with span("alerts", stages["alerts"]):
+            for reading in readings:
+                evaluate_alerts(reading)
+        with span("emit", stages["emit"]):
+            timings = _ingest_timings(received_at, start_time)
+            for reading, (_, reading_data) in zip(readings, batch):
+                _cache_reading(reading, reading_data)
+                _cache_stats(reading, reading_data)
+                emit_sensor_update(reading_data, timings)
+            for anomaly in filter(None, anomalies):
+                emit_sensor_anomaly(anomaly)
+
+    processing_time = time.time() - start_time
+    ingest_seconds.observe(processing_time)
+    LOG_BATCH(
+        "Processed batch of %d readings: %d on time, %d late, %d rejected "
+        "(Processing time: %.3fs)",
+        len(items),
+        len(readings),
+        len(late),
+        len(errors),
+        processing_time,
+    )
+    return {
+        "accepted": len(readings) + len(late),
+        "late": len(late),
+        "rejected": len(errors),
+        "errors": errors,
+        "processing_time": processing_time,
+    }
+
+
+def get_all_sensor_stats(**selectors) -> list[dict[str, Any]]:
+    """Statistics of all sensors, or of those matching registry selectors.
+
+    ``selectors`` are ``sensor_type``, ``location`` and ``tag``.
+    """
     try:
         stats_list = file_storage.get_all_stats()
+        if selectors:
+            selected = file_storage.select_sensors(**selectors)
+            stats_list = [s for s in stats_list if s.get("sensor_id") in selected]
         logger.info(f"Retrieved statistics for {len(stats_list)} sensors")
         return stats_list
     except Exception as e:
@@ -150,10 +600,98 @@ def get_all_sensor_stats() -> list[dict[str, Any]]:
         return []
 
 
+def get_sensor_stats(sensor_id: str) -> dict[str, Any] | None:
+    try:
+        return file_storage.get_stats(sensor_id)
+    except Exception as e:
+        logger.error(f"Error retrieving statistics for sensor {sensor_id}: {e}")
+        return None
+
+
+def list_sensors(
+    sensor_type: str | None = None,
+    location: str | None = None,
+    tag: str | None = None,
+) -> list[dict[str, Any]]:
+    """Registry entries of the sensors matching the given selectors."""
+    return file_storage.list_sensors(
+        sensor_type=sensor_type, location=location, tag=tag
+    )
+
+
+def group_sensor_stats(
+    by: str,
+    sensor_type: str | None = None,
+    location: str | None = None,
+    tag: str | None = None,
+) -> dict[str, Any]:
+    """Combine sensor statistics per ``type``, ``location`` or ``tag``.
+
+    Group membership comes from the registry indexes, and each group's
+    figures are merged from its sensors' statistics: ``avg_value`` is
+    weighted by reading count.
+    """
+    groups = file_storage.get_groups(by)
+    selected = None
+    if sensor_type is not None or location is not None or tag is not None:
+        selected = file_storage.select_sensors(
+            sensor_type=sensor_type, location=location, tag=tag
+        )
+    stats = {s["sensor_id"]: s for s in file_storage.get_all_stats()}
+
+    result = {}
+    for key, sensor_ids in groups.items():
+        if selected is not None:
+            sensor_ids = [i for i in sensor_ids if i in selected]
+        members = [stats[i] for i in sensor_ids if i in stats]
+        if not members:
+            continue
+        count = sum(m["count"] for m in members)
+        result[key] = {
+            "sensors": sensor_ids,
+            "count": count,
+            "avg_value": (
+                sum(m["avg_value"] * m["count"] for m in members) / count
+                if count
+                else None
+            ),
+            "min_value": min(m["min_value"] for m in members),
+            "max_value": max(m["max_value"] for m in members),
+            "last_reading": max(m["last_reading"] for m in members),
+        }
+    return {"by": by, "groups": result}
+
+
+def get_latest_updates(window: float) -> list[dict[str, Any]]:
+    """Stored readings to seed live views with, in time order per sensor.
+
+    Each sensor contributes its readings from the last ``window`` seconds,
+    or just its newest reading if it has been quiet for longer.
+    """
+    cutoff = datetime.now() - timedelta(seconds=window)
+    updates = []
+    for rows in file_storage.scan_readings(archived=False).values():
+        recent = [reading for reading_time, reading in rows if reading_time >= cutoff]
+        updates.extend(recent or [reading for _, reading in rows[-1:]])
+    return updates
+
+
+def get_stats_version(sensor_id: str | None = None) -> tuple[int, datetime]:
+    """Return the change counter and last-modified time of sensor statistics.
+
+    With ``sensor_id`` the counter is that sensor's own; otherwise it covers
+    all sensors.
+    """
+    if sensor_id is None:
+        version = file_storage.get_version()
+    else:
+        version = file_storage.get_sensor_version(sensor_id)
+    return version, file_storage.last_modified
+
+
 def get_sensor_readings(sensor_id: str, hours: int = 24) -> list[dict[str, Any]]:
     try:
         readings = file_storage.get_readings(sensor_id, hours)
-        readings.sort(key=lambda x: x.get("timestamp", ""))
         logger.info(
             f"Retrieved {len(readings)} readings for sensor {sensor_id} over {hours} hours"
         )
@@ -163,6 +701,167 @@ def get_sensor_readings(sensor_id: str, hours: int = 24) -> list[dict[str, Any]]
         return []
 
 
+def encode_cursor(timestamp: datetime, skip: int) -> str:
+    """Encode a pagination position: after ``skip`` readings at ``timestamp``."""
+    raw = json.dumps([timestamp.isoformat(), skip]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by ``encode_cursor``; raises ValueError."""
+    try:
+        timestamp, skip = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), int(skip)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def iter_sensor_readings(
+    sensor_id: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    cursor: tuple[datetime, int] | None = None,
+) -> Iterator[tuple[dict[str, Any], str]]:
+    """Yield ``(reading, cursor)`` pairs in time order.
+
+    Each cursor points just past its reading, so passing the last one seen
+    back in resumes the scan where it stopped, even when several readings
+    share a timestamp. The scan starts at the cursor's time, so a page costs
+    the same however far into the history it is.
+    """
+    after, skip = cursor if cursor else (None, 0)
+    if after is not None and (start is None or after > start):
+        start = after
+    run_time, run = after, skip
+    for reading_time, reading in file_storage.iter_readings(sensor_id, start, end):
+        if skip and reading_time == after:
+            skip -= 1
+            continue
+        run = run + 1 if reading_time == run_time else 1
+        run_time = reading_time
+        yield reading, encode_cursor(reading_time, run)
+
+
+def aggregate_sensor_readings(
+    sensor_id: str,
+    bucket_seconds: int,
+    functions: list[str],
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> dict[str, Any]:
+    """Aggregate a sensor's history into time buckets.
+
+    Stored one-minute rollups answer whole-minute buckets of avg, min, max,
+    count and sum; anything else (percentiles, sub-minute buckets, sensors
+    without rollups) falls back to a vectorized scan of raw readings. Rollups
+    only reach back to their oldest retained minute, so the part of the range
+    before it is rolled up from raw readings and merged in (``"mixed"``).
+    """
+    result: dict[str, Any] = {"sensor_id": sensor_id, "bucket_seconds": bucket_seconds}
+
+    if can_use_rollups(bucket_seconds, functions):
+        covered, rollups = file_storage.get_covered_rollups(sensor_id, start, end)
+        if rollups:
+            minutes, counts, sums, mins, maxs = zip(*rollups)
+            columns = {
+                "minutes": np.array(minutes, dtype="datetime64[s]"),
+                "counts": np.array(counts, dtype=np.int64),
+                "sums": np.array(sums, dtype=float),
+                "mins": np.array(mins, dtype=float),
+                "maxs": np.array(maxs, dtype=float),
+            }
+            result["source"] = "rollup"
+            if start is None or start < covered:
+                times, values = file_storage.get_series(sensor_id, start, covered)
+                if len(values):
+                    gap = rollup_raw(times, values)
+                    columns = {
+                        key: np.concatenate([gap[key], columns[key]]) for key in columns
+                    }
+                    result["source"] = "mixed"
+            result.update(
+                aggregate_rollups(
+                    **columns, bucket_seconds=bucket_seconds, functions=functions
+                )
+            )
+            return result
+
+    times, values = file_storage.get_series(sensor_id, start, end)
+    result["source"] = "raw"
+    result.update(aggregate_raw(times, values, bucket_seconds, functions))
+    return result
+
+
+def score_sensor_history(
+    sensor_id: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    threshold: float | None = None,
+) -> dict[str, Any]:
+    """Re-score a sensor's stored history and return the anomalous readings.
+
+    Uses the live detector's settings on a fresh model, so a tuned
+    ``threshold`` can be tried against history before it is deployed.
+    """
+    times, values = file_storage.get_series(sensor_id, start, end)
+    expected, scores, flagged = anomaly_detector.score_history(times, values, threshold)
+    anomalies = [
+        {
+            "timestamp": times[i].item().isoformat(),
+            "value": float(values[i]),
+            "expected": round(float(expected[i]), 4),
+            "score": round(float(scores[i]), 2),
+        }
+        for i in np.flatnonzero(flagged)
+    ]
+    return {
+        "sensor_id": sensor_id,
+        "scored": len(values),
+        "threshold": anomaly_detector.threshold if threshold is None else threshold,
+        "anomalies": anomalies,
+    }
+
+
+def query_sensor_readings(
+    sensor_ids: list[str] | None = None,
+    sensor_type: str | None = None,
+    location: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    tag: str | None = None,
+) -> dict[str, Any]:
+    """Resolve many sensors over a shared time range in one storage pass.
+
+    Returns columnar data per sensor: parallel ``timestamps`` and
+    ``values`` arrays in time order.
+    """
+    rows_by_sensor = file_storage.scan_readings(
+        sensor_ids, start, end, sensor_type=sensor_type, location=location, tag=tag
+    )
+    sensors = {}
+    for sensor_id, rows in rows_by_sensor.items():
+        sensors[sensor_id] = {
+            "timestamps": [reading["timestamp"] for _, reading in rows],
+            "values": [reading.get("value") for _, reading in rows],
+        }
+    logger.info(f"Bulk query resolved {len(sensors)} sensors")
+    return {
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "sensors": sensors,
+    }
+
+
+def export_sensor_readings(
+    fmt: str,
+    sensor_ids: list[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Iterator[bytes]:
+    """Stream sensor history as CSV, Parquet or Arrow IPC."""
+    return export_readings(file_storage, fmt, sensor_ids, start, end)
+
+
 def cleanup_old_data(days: int = 7):
     try:
         cleaned_count = file_storage.cleanup_old_data(days)
@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .logs import events, parse_sample_rate
+
+logger = logging.getLogger(__name__)
+
+# Sampled traces are already rare, but a raised sample rate must not flood
+LOG_TRACE = events.event("tracing.trace", logger)
+
+_local = threading.local()
+
+
+class Trace:
+    """Span timings of one traced message or batch."""
+
+    __slots__ = ("id", "name", "attributes", "started_at", "start", "spans", "depth")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = attributes
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.spans: List[tuple] = []
+        self.depth = 0
+
+    def to_dict(self, duration: float) -> Dict[str, Any]:
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(duration * 1000, 3),
+            "attributes": self.attributes,
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round(start * 1000, 3),
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "depth": depth,
+                }
+                for name, start, elapsed, depth in sorted(
+                    self.spans, key=lambda span: span[1]
+                )
+            ],
+        }
+
+
+class Span:
+    """Times a block into an optional histogram and the current trace.
+
+    Outside a sampled trace this costs a thread-local lookup on top of the
+    histogram observation, so spans can stay in the hot path.
+    """
+
+    __slots__ = ("name", "histogram", "start", "trace")
+
+    def __init__(self, name: str, histogram=None):
+        self.name = name
+        self.histogram = histogram
+
+    def __enter__(self):
+        trace = self.trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.histogram is not None:
+            self.histogram.observe(elapsed)
+        trace = self.trace
+        if trace is not None:
+            trace.depth -= 1
+            trace.spans.append(
+                (self.name, self.start - trace.start, elapsed, trace.depth)
+            )
+
+
+def span(name: str, histogram=None) -> Span:
+    return Span(name, histogram)
+
+
+def annotate(**attributes):
+    """Add attributes to the current trace, if this message is being traced."""
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+class _Traced:
+    __slots__ = ("tracer", "name", "attributes", "trace")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace = None
+
+    def __enter__(self) -> Optional[Trace]:
+        rate = self.tracer.sample_rate
+        if rate and getattr(_local, "trace", None) is None and random.random() < rate:
+            self.trace = _local.trace = Trace(self.name, self.attributes)
+        return self.trace
+
+    def __exit__(self, *exc):
+        trace = self.trace
+        if trace is not None:
+            _local.trace = None
+            self.tracer.record(trace, time.perf_counter() - trace.start)
+
+
+class _Json:
+    """Log argument that is only serialized if the line is written."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Any):
+        self.data = data
+
+    def __str__(self) -> str:
+        return json.dumps(self.data, default=str)
+
+
+class Tracer:
+    """Samples messages for span tracing and keeps the most recent traces.
+
+    ``sample_rate`` is the fraction of messages traced and can be changed
+    while the process runs. Finished traces are logged as JSON through the
+    rate-limited ``tracing.trace`` event and kept in a ring buffer of
+    ``capacity`` entries.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, capacity: int = 100):
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+        self.traces: deque = deque(maxlen=capacity)
+
+    def trace(self, name: str, **attributes) -> _Traced:
+        """Context manager that traces its block if the message is sampled."""
+        return _Traced(self, name, attributes)
+
+    def record(self, trace: Trace, duration: float):
+        data = trace.to_dict(duration)
+        with self.lock:
+            self.traces.append(data)
+        LOG_TRACE("Trace %s", _Json(data))
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Finished traces, newest first."""
+        with self.lock:
+            traces = list(self.traces)
+        traces.reverse()
+        return traces[:limit] if limit is not None else traces
+
+
+tracer = Tracer(
+    parse_sample_rate(os.getenv("TRACE_SAMPLE_RATE", 0.01)),
+    int(os.getenv("TRACE_BUFFER", 100)),
+)
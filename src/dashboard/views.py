@@ -1,8 +1,40 @@
+import hmac
+import json
 import logging
+import os
+from datetime import datetime, timedelta
 
-from flask import Blueprint, jsonify, render_template, request
+from flask import Blueprint, Response, current_app, jsonify, render_template, request
 
-from .tasks import get_all_sensor_stats, get_sensor_readings
+from .aggregation import parse_bucket, parse_functions
+from .batch import decode_batch
+from .export import EXPORT_FORMATS, available_formats
+from .file_storage import parse_timestamp
+from .logs import events, log_config
+from .metrics import CONTENT_TYPE, registry
+from .profiler import profiler
+from .registry import GROUP_KEYS
+from .snapshots import SnapshotCache, snapshot_response
+from .tasks import (
+    aggregate_sensor_readings,
+    decode_cursor,
+    delete_alert_rule,
+    export_sensor_readings,
+    get_alert_rules,
+    get_alerts,
+    get_all_sensor_stats,
+    get_sensor_readings,
+    get_sensor_stats,
+    get_stats_version,
+    group_sensor_stats,
+    iter_sensor_readings,
+    list_sensors,
+    process_sensor_batch,
+    query_sensor_readings,
+    save_alert_rule,
+    score_sensor_history,
+)
+from .tracing import parse_sample_rate, tracer
 
 logger = logging.getLogger(__name__)
 
@@ -15,33 +47,594 @@ def dashboard():
     return render_template("dashboard.html")
 
 
+def _snapshot_cache() -> SnapshotCache:
+    return current_app.extensions.setdefault("sensor_snapshots", SnapshotCache())
+
+
 @main_bp.route("/api/sensors")
 def api_sensors():
-    """API endpoint to get all sensor statistics."""
+    """API endpoint to get all sensor statistics.
+
+    Supports conditional GET: the body is re-serialized only when the stats
+    change counter moves, and unchanged polls get ``304 Not Modified``.
+    ``type``, ``location`` and ``tag`` narrow the list through the sensor
+    registry.
+    """
     try:
-        stats = get_all_sensor_stats()
-        return jsonify({"sensors": stats})
+        selectors = _selector_args()
+        version, last_modified = get_stats_version()
+        snapshot = _snapshot_cache().get(
+            ("sensors", *sorted(selectors.items())) if selectors else "sensors",
+            version,
+            last_modified,
+            lambda: {"sensors": get_all_sensor_stats(**selectors)},
+        )
+        return snapshot_response(snapshot, "sensors")
     except Exception as e:
         logger.error(f"Error in /api/sensors endpoint: {e}")
         return jsonify({"error": "Failed to retrieve sensor data"}), 500
 
 
+def _selector_args() -> dict:
+    """Registry selectors given as ``type``, ``location`` and ``tag`` args."""
+    selectors = {
+        "sensor_type": request.args.get("type"),
+        "location": request.args.get("location"),
+        "tag": request.args.get("tag"),
+    }
+    return {key: value for key, value in selectors.items() if value is not None}
+
+
+@main_bp.route("/api/registry")
+def api_registry():
+    """API endpoint listing sensor metadata, filtered by type/location/tag."""
+    try:
+        return jsonify({"sensors": list_sensors(**_selector_args())})
+    except Exception as e:
+        logger.error(f"Error in /api/registry endpoint: {e}")
+        return jsonify({"error": "Failed to retrieve sensor registry"}), 500
+
+
+@main_bp.route("/api/groups")
+def api_groups():
+    """API endpoint for statistics combined per type, location or tag.
+
+    ``by`` picks the grouping (default ``location``); ``type``,
+    ``location`` and ``tag`` narrow which sensors are included, e.g.
+    ``?by=location&type=temperature`` for the temperature of each room.
+    """
+    try:
+        by = request.args.get("by", "location")
+        if by not in GROUP_KEYS:
+            return (
+                jsonify({"error": f"'by' must be one of {', '.join(GROUP_KEYS)}"}),
+                400,
+            )
+        return jsonify(group_sensor_stats(by, **_selector_args()))
+    except Exception as e:
+        logger.error(f"Error in /api/groups endpoint: {e}")
+        return jsonify({"error": "Failed to group sensor statistics"}), 500
+
+
+@main_bp.route("/api/sensors/<sensor_id>")
+def api_sensor(sensor_id):
+    """API endpoint to get statistics for one sensor, with conditional GET."""
+    try:
+        version, last_modified = get_stats_version(sensor_id)
+        snapshot = _snapshot_cache().get(
+            ("sensor", sensor_id),
+            version,
+            last_modified,
+            lambda: get_sensor_stats(sensor_id),
+        )
+        if snapshot is None:
+            return jsonify({"error": "Sensor not found"}), 404
+        return snapshot_response(snapshot, f"sensor-{sensor_id}")
+    except Exception as e:
+        logger.error(f"Error in /api/sensors/{sensor_id} endpoint: {e}")
+        return jsonify({"error": "Failed to retrieve sensor data"}), 500
+
+
+READING_PARAMS = ("start", "end", "limit", "cursor", "format")
+MAX_BATCH_SIZE = 10000
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+
+def _parse_time_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' timestamp: {value}")
+
+
 @main_bp.route("/api/sensors/<sensor_id>/readings")
 def api_sensor_readings(sensor_id):
-    """API endpoint to get readings for a specific sensor."""
+    """API endpoint to get readings for a specific sensor.
+
+    Without any of ``start``/``end``/``limit``/``cursor``/``format`` this
+    returns the last ``hours`` of readings as before. Otherwise readings
+    in [start, end) are returned one page at a time with a ``next_cursor``,
+    or streamed line by line with ``format=ndjson``.
+    """
     try:
-        hours = request.args.get("hours", 24, type=int)
-        readings = get_sensor_readings(sensor_id, hours)
-        return jsonify({"readings": readings})
+        if not any(name in request.args for name in READING_PARAMS):
+            hours = request.args.get("hours", 24, type=int)
+            readings = get_sensor_readings(sensor_id, hours)
+            return jsonify({"readings": readings})
+
+        try:
+            start = _parse_time_arg("start")
+            end = _parse_time_arg("end")
+            if start is None and "hours" in request.args:
+                hours = request.args.get("hours", type=int)
+                start = datetime.now() - timedelta(hours=hours)
+            cursor = request.args.get("cursor")
+            cursor = decode_cursor(cursor) if cursor else None
+            fmt = request.args.get("format", "json")
+            if fmt not in ("json", "ndjson"):
+                raise ValueError(f"Unsupported format: {fmt}")
+            default_limit = None if fmt == "ndjson" else DEFAULT_PAGE_SIZE
+            limit = request.args.get("limit", default_limit, type=int)
+            if limit is not None and limit < 1:
+                raise ValueError("'limit' must be a positive integer")
+            if fmt == "json":
+                limit = min(limit, MAX_PAGE_SIZE)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+
+        rows = iter_sensor_readings(sensor_id, start, end, cursor)
+
+        if fmt == "ndjson":
+            return Response(_ndjson_rows(rows, limit), mimetype="application/x-ndjson")
+
+        readings, next_cursor, last_cursor = [], None, None
+        for reading, row_cursor in rows:
+            if len(readings) >= limit:
+                next_cursor = last_cursor
+                break
+            readings.append(reading)
+            last_cursor = row_cursor
+        return jsonify({"readings": readings, "next_cursor": next_cursor})
     except Exception as e:
         logger.error(f"Error in /api/sensors/{sensor_id}/readings endpoint: {e}")
         return jsonify({"error": "Failed to retrieve sensor readings"}), 500
 
 
+@main_bp.route("/api/sensors/<sensor_id>/aggregate")
+def api_sensor_aggregate(sensor_id):
+    """API endpoint for bucketed aggregates of a sensor's readings.
+
+    ``bucket`` is a width such as ``5m`` and ``fn`` a comma-separated list
+    of ``avg``, ``min``, ``max``, ``count``, ``sum`` and percentiles like
+    ``p95``. The range defaults to the last ``hours`` (24).
+    """
+    try:
+        try:
+            bucket_seconds = parse_bucket(request.args.get("bucket", "5m"))
+            functions = parse_functions(request.args.get("fn", "avg,min,max"))
+            start = _parse_time_arg("start")
+            end = _parse_time_arg("end")
+            if start is None:
+                hours = request.args.get("hours", 24, type=int)
+                start = datetime.now() - timedelta(hours=hours)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Align the range to bucket boundaries so edge buckets are complete
+        start = _align(start, bucket_seconds)
+        result = aggregate_sensor_readings(
+            sensor_id, bucket_seconds, functions, start, end
+        )
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error in /api/sensors/{sensor_id}/aggregate endpoint: {e}")
+        return jsonify({"error": "Failed to aggregate sensor readings"}), 500
+
+
+def _align(moment, bucket_seconds):
+    epoch = datetime(1970, 1, 1)
+    offset = (moment - epoch).total_seconds() // bucket_seconds * bucket_seconds
+    return epoch + timedelta(seconds=offset)
+
+
+def _ndjson_rows(rows, limit=None):
+    """Stream readings as NDJSON; a final ``next_cursor`` line marks truncation."""
+    count, last_cursor = 0, None
+    for reading, row_cursor in rows:
+        if limit is not None and count >= limit:
+            yield json.dumps({"next_cursor": last_cursor}) + "\n"
+            return
+        yield json.dumps(reading, default=str) + "\n"
+        count += 1
+        last_cursor = row_cursor
+
+
+@main_bp.route("/api/sensors/<sensor_id>/anomalies")
+def api_sensor_anomalies(sensor_id):
+    """API endpoint to re-score a sensor's history for anomalies.
+
+    The range defaults to the last ``hours`` (24); ``threshold`` overrides
+    the detector's score threshold for this query.
+    """
+    try:
+        try:
+            start = _parse_time_arg("start")
+            end = _parse_time_arg("end")
+            if start is None:
+                hours = request.args.get("hours", 24, type=int)
+                start = datetime.now() - timedelta(hours=hours)
+            threshold = request.args.get("threshold", type=float)
+            if threshold is not None and threshold <= 0:
+                raise ValueError("threshold must be positive")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify(score_sensor_history(sensor_id, start, end, threshold))
+    except Exception as e:
+        logger.error(f"Error in /api/sensors/{sensor_id}/anomalies endpoint: {e}")
+        return jsonify({"error": "Failed to score sensor history"}), 500
+
+
+def parse_bulk_query(params) -> dict:
+    """Validate a bulk query given as query-string or JSON parameters.
+
+    Accepts ``sensor_ids`` (list or comma-separated string), ``type``,
+    ``location``, ``tag``, and a time range as ``start``/``end`` or
+    ``hours``. Raises ValueError on invalid input.
+    """
+    sensor_ids = params.get("sensor_ids")
+    if isinstance(sensor_ids, str):
+        sensor_ids = [s.strip() for s in sensor_ids.split(",") if s.strip()]
+    if sensor_ids is not None and not isinstance(sensor_ids, list):
+        raise ValueError("'sensor_ids' must be a list")
+    sensor_type = params.get("type")
+    location = params.get("location")
+    tag = params.get("tag")
+    if not (sensor_ids or sensor_type or location or tag):
+        raise ValueError("Give 'sensor_ids' or a 'type'/'location'/'tag' selector")
+
+    start = params.get("start")
+    end = params.get("end")
+    start = parse_timestamp(start) if start else None
+    end = parse_timestamp(end) if end else None
+    if start is None:
+        start = datetime.now() - timedelta(hours=float(params.get("hours", 24)))
+    return {
+        "sensor_ids": sensor_ids or None,
+        "sensor_type": sensor_type,
+        "location": location,
+        "tag": tag,
+        "start": start,
+        "end": end,
+    }
+
+
+@main_bp.route("/api/readings", methods=["POST"])
+def api_ingest_readings():
+    """Ingest a batch of readings posted as JSON, NDJSON or binary.
+
+    Returns a per-item report; the batch is accepted as long as at least
+    one reading is valid.
+    """
+    try:
+        try:
+            items = decode_batch(request.get_data(), request.content_type)
+        except (UnicodeDecodeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        if not items:
+            return jsonify({"error": "Empty batch"}), 400
+        if len(items) > MAX_BATCH_SIZE:
+            return (
+                jsonify({"error": f"Batch exceeds {MAX_BATCH_SIZE} readings"}),
+                413,
+            )
+
+        report = process_sensor_batch(items)
+        return jsonify(report), 200 if report["accepted"] else 400
+    except Exception as e:
+        logger.error(f"Error in /api/readings endpoint: {e}")
+        return jsonify({"error": "Failed to ingest readings"}), 500
+
+
+@main_bp.route("/api/readings/query", methods=["GET", "POST"])
+def api_readings_query():
+    """API endpoint resolving many sensors over one time range in one pass."""
+    try:
+        if request.method == "POST":
+            params = request.get_json(silent=True)
+            if not isinstance(params, dict):
+                return jsonify({"error": "Expected a JSON object"}), 400
+        else:
+            params = request.args.to_dict()
+            if "sensor_id" in request.args:
+                params["sensor_ids"] = _list_arg("sensor_id")
+        try:
+            query = parse_bulk_query(params)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(query_sensor_readings(**query))
+    except Exception as e:
+        logger.error(f"Error in /api/readings/query endpoint: {e}")
+        return jsonify({"error": "Failed to retrieve sensor readings"}), 500
+
+
+@main_bp.route("/api/group-views")
+@main_bp.route("/api/group-views/<view_id>")
+def api_group_views(view_id=None):
+    """API endpoint for materialized group views.
+
+    Rows are maintained incrementally as updates arrive, so serving them
+    does not touch storage or per-sensor statistics.
+    """
+    from .realtime import ensure_group_views_seeded, group_views
+
+    try:
+        if view_id is not None and view_id not in group_views.views:
+            return jsonify({"error": "Group view not found"}), 404
+        ensure_group_views_seeded()
+        views = group_views.read(view_id)
+        if view_id is not None:
+            return jsonify(views[view_id])
+        return jsonify({"views": list(views.values())})
+    except Exception as e:
+        logger.error(f"Error in /api/group-views endpoint: {e}")
+        return jsonify({"error": "Failed to retrieve group views"}), 500
+
+
+@main_bp.route("/api/alerts")
+def api_alerts():
+    """API endpoint for firing alerts and recent alert changes."""
+    try:
+        return jsonify(get_alerts())
+    except Exception as e:
+        logger.error(f"Error in /api/alerts endpoint: {e}")
+        return jsonify({"error": "Failed to retrieve alerts"}), 500
+
+
+@main_bp.route("/api/alerts/rules", methods=["GET", "POST"])
+def api_alert_rules():
+    """API endpoint to list alert rules, or create/replace one by ``id``."""
+    try:
+        if request.method == "GET":
+            return jsonify({"rules": get_alert_rules()})
+
+        definition = request.get_json(silent=True)
+        if not isinstance(definition, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        try:
+            rule = save_alert_rule(definition)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(rule), 201
+    except Exception as e:
+        logger.error(f"Error in /api/alerts/rules endpoint: {e}")
+        return jsonify({"error": "Failed to process alert rules"}), 500
+
+
+@main_bp.route("/api/alerts/rules/<rule_id>", methods=["DELETE"])
+def api_delete_alert_rule(rule_id):
+    """API endpoint to delete an alert rule."""
+    try:
+        if not delete_alert_rule(rule_id):
+            return jsonify({"error": "Alert rule not found"}), 404
+        return "", 204
+    except Exception as e:
+        logger.error(f"Error in /api/alerts/rules/{rule_id} endpoint: {e}")
+        return jsonify({"error": "Failed to delete alert rule"}), 500
+
+
+@main_bp.route("/api/export")
+def api_export():
+    """Stream sensor history as a CSV, Parquet or Arrow IPC download."""
+    try:
+        fmt = request.args.get("format", "csv")
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unsupported export format: {fmt}"}), 400
+        if fmt not in available_formats():
+            return jsonify({"error": f"{fmt} export requires pyarrow"}), 501
+        try:
+            start = _parse_time_arg("start")
+            end = _parse_time_arg("end")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        mimetype, extension = EXPORT_FORMATS[fmt]
+        body = export_sensor_readings(fmt, _list_arg("sensor_id") or None, start, end)
+        return Response(
+            body,
+            mimetype=mimetype,
+            headers={
+                "Content-Disposition": f"attachment; filename=readings.{extension}"
+            },
+        )
+    except Exception as e:
+        logger.error(f"Error in /api/export endpoint: {e}")
+        return jsonify({"error": "Failed to export sensor readings"}), 500
+
+
+def _list_arg(name):
+    """Collect a filter given as repeated and/or comma-separated parameters."""
+    values = []
+    for raw in request.args.getlist(name):
+        values.extend(v.strip() for v in raw.split(",") if v.strip())
+    return values
+
+
+@main_bp.route("/api/stream")
+def api_stream():
+    """Server-Sent Events stream of sensor updates.
+
+    Optional filters: ``sensor_id`` and ``type``, each repeated or
+    comma-separated.
+    """
+    from .realtime import sse_hub
+
+    sensor_ids, types = _list_arg("sensor_id"), _list_arg("type")
+    keepalive = float(os.getenv("SSE_KEEPALIVE", 15))
+
+    def generate():
+        # Subscribed only once the stream starts: closing a generator that
+        # never ran skips its ``finally``, which would leak the subscription
+        subscription = sse_hub.subscribe(sensor_ids, types)
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                frame = subscription.get(timeout=keepalive)
+                yield frame if frame is not None else b": keepalive\n\n"
+        finally:
+            sse_hub.unsubscribe(subscription)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@main_bp.route("/api/realtime/clients")
+def api_realtime_clients():
+    """API endpoint with per-connection send queue metrics."""
+    from .realtime import fanout
+
+    return jsonify(fanout.metrics())
+
+
+@main_bp.route("/api/freshness")
+def api_freshness():
+    """API endpoint with per-sensor staleness and pipeline lag percentiles."""
+    from .realtime import freshness
+
+    sensors = freshness.report()
+    if request.args.get("stale", "").lower() == "true":
+        sensors = [sensor for sensor in sensors if sensor["stale"]]
+    return jsonify(
+        {
+            "sensors": sensors,
+            "stale_after": freshness.stale_after,
+            "lag": freshness.lag_percentiles(),
+        }
+    )
+
+
+@main_bp.route("/metrics")
+def metrics():
+    """Prometheus metrics of this process."""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+def _admin_denied():
+    """Refuse admin requests without the ``ADMIN_TOKEN`` bearer token.
+
+    Admin endpoints are disabled unless ``ADMIN_TOKEN`` is set.
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        return jsonify({"error": "Admin endpoints are disabled"}), 403
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        return jsonify({"error": "Invalid admin token"}), 401
+    return None
+
+
+@main_bp.route("/api/admin/tracing", methods=["GET", "PUT"])
+def api_admin_tracing():
+    """Show or change the trace sample rate, with the most recent traces."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.method == "PUT":
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or "sample_rate" not in body:
+            return jsonify({"error": "Expected a JSON object with sample_rate"}), 400
+        try:
+            tracer.sample_rate = parse_sample_rate(body["sample_rate"])
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        logger.info(f"Trace sample rate set to {tracer.sample_rate}")
+    limit = request.args.get("limit", 20, type=int)
+    return jsonify(
+        {"sample_rate": tracer.sample_rate, "traces": tracer.recent(max(limit, 0))}
+    )
+
+
+@main_bp.route("/api/admin/logging", methods=["GET", "PUT"])
+def api_admin_logging():
+    """Show or change the log level and the hot-path log events."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.method == "PUT":
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        level = body.get("level")
+        if level is not None and not isinstance(
+            logging.getLevelName(str(level).upper()), int
+        ):
+            return jsonify({"error": f"Unknown log level {level}"}), 400
+        try:
+            events.update(body.get("events") or {})
+        except (AttributeError, TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        if level is not None:
+            logging.getLogger().setLevel(str(level).upper())
+        logger.info(f"Logging settings changed: {body}")
+    return jsonify({**log_config.status(), "events": events.status()})
+
+
+@main_bp.route("/api/admin/profiler", methods=["GET"])
+def api_admin_profiler():
+    """Profiler status, or the stacks sampled so far with ``?format=folded``."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.args.get("format") == "folded":
+        return Response(profiler.folded(), mimetype="text/plain")
+    return jsonify(profiler.status())
+
+
+@main_bp.route("/api/admin/profiler/start", methods=["POST"])
+def api_admin_profiler_start():
+    """Start the sampling profiler on this process."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    options = request.get_json(silent=True) or {}
+    try:
+        duration = options.get("duration")
+        profiler.start(
+            interval=float(options.get("interval", 0.01)),
+            duration=float(duration) if duration is not None else None,
+            mode=options.get("mode", "cpu"),
+        )
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(profiler.status()), 202
+
+
+@main_bp.route("/api/admin/profiler/stop", methods=["POST"])
+def api_admin_profiler_stop():
+    """Stop the profiler and return its stacks in the folded flamegraph format."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    profiler.stop()
+    return Response(profiler.folded(), mimetype="text/plain")
+
+
 @main_bp.route("/health")
 def health_check():
-    """Health check endpoint."""
-    return jsonify({"status": "healthy"}), 200
+    """Health check endpoint; 503 once ingest has stalled."""
+    from .realtime import freshness
+
+    health = freshness.health()
+    return jsonify(health), 503 if health["status"] == "unhealthy" else 200
 
 
 @main_bp.errorhandler(404)
@@ -5,6 +5,11 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from src.dashboard import create_app
+from src.dashboard.alerts import AlertEngine, WebhookNotifier
+from src.dashboard.anomaly import AnomalyDetector
+from src.dashboard.file_storage import FileStorage
+from src.dashboard.freshness import FreshnessTracker
+from src.dashboard.groups import GroupViews
 
 
 @pytest.fixture
@@ -22,6 +27,49 @@ def app():
         yield app
 
 
+@pytest.fixture(autouse=True)
+def file_storage(tmp_path):
+    """Point task storage at a temporary directory instead of ./data."""
+    storage = FileStorage(str(tmp_path / "data"))
+    with patch("src.dashboard.tasks.file_storage", storage):
+        yield storage
+
+
+@pytest.fixture(autouse=True)
+def anomaly_detector():
+    """Give each test fresh anomaly models."""
+    detector = AnomalyDetector()
+    with patch("src.dashboard.tasks.anomaly_detector", detector):
+        yield detector
+
+
+@pytest.fixture(autouse=True)
+def alert_engine():
+    """Give each test an alert engine with no rules and no webhook."""
+    engine = AlertEngine()
+    with (
+        patch("src.dashboard.tasks.alert_engine", engine),
+        patch("src.dashboard.tasks.alert_webhook", WebhookNotifier()),
+    ):
+        yield engine
+
+
+@pytest.fixture(autouse=True)
+def group_views():
+    """Give each test empty group views."""
+    views = GroupViews()
+    with patch("src.dashboard.realtime.group_views", views):
+        yield views
+
+
+@pytest.fixture(autouse=True)
+def freshness():
+    """Give each test a freshness tracker that has seen no readings."""
+    tracker = FreshnessTracker()
+    with patch("src.dashboard.realtime.freshness", tracker):
+        yield tracker
+
+
 @pytest.fixture
 def client(app):
     """Create test client."""
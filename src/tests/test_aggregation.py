@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from src.dashboard.aggregation import (
+    aggregate_raw,
+    aggregate_rollups,
+    can_use_rollups,
+    parse_bucket,
+    parse_functions,
+    rollup_raw,
+)
+
+
+class TestAggregation:
+    def test_parse_bucket(self):
+        assert parse_bucket("30s") == 30
+        assert parse_bucket("5m") == 300
+        assert parse_bucket("2h") == 7200
+        assert parse_bucket("1d") == 86400
+
+        for invalid in ["", "5", "0m", "5w"]:
+            with pytest.raises(ValueError):
+                parse_bucket(invalid)
+
+    def test_parse_functions(self):
+        assert parse_functions("avg, max,p95,p99.9") == ["avg", "max", "p95", "p99.9"]
+
+        with pytest.raises(ValueError):
+            parse_functions("avg,median")
+
+    def test_can_use_rollups(self):
+        assert can_use_rollups(300, ["avg", "min", "max"])
+        assert not can_use_rollups(30, ["avg"])
+        assert not can_use_rollups(300, ["avg", "p95"])
+
+    def test_aggregate_raw(self):
+        times = np.array(
+            ["2024-01-01T12:00:10", "2024-01-01T12:00:50", "2024-01-01T12:01:05"],
+            dtype="datetime64[s]",
+        )
+        values = np.array([1.0, 3.0, 10.0])
+
+        result = aggregate_raw(times, values, 60, ["avg", "count", "p50"])
+
+        assert result["buckets"] == ["2024-01-01T12:00:00", "2024-01-01T12:01:00"]
+        assert result["avg"] == [2.0, 10.0]
+        assert result["count"] == [2, 1]
+        assert result["p50"] == [2.0, 10.0]
+
+    def test_aggregate_raw_empty(self):
+        result = aggregate_raw(
+            np.array([], dtype="datetime64[s]"), np.array([]), 60, ["avg"]
+        )
+
+        assert result == {"buckets": [], "avg": []}
+
+    def test_aggregate_rollups_merges_minutes(self):
+        minutes = np.array(
+            ["2024-01-01T12:00", "2024-01-01T12:01", "2024-01-01T12:05"],
+            dtype="datetime64[s]",
+        )
+
+        result = aggregate_rollups(
+            minutes,
+            np.array([2, 2, 1]),
+            np.array([4.0, 8.0, 7.0]),
+            np.array([1.0, 3.0, 7.0]),
+            np.array([3.0, 5.0, 7.0]),
+            300,
+            ["avg", "min", "max", "count"],
+        )
+
+        assert result["avg"] == [3.0, 7.0]
+        assert result["min"] == [1.0, 7.0]
+        assert result["max"] == [5.0, 7.0]
+        assert result["count"] == [4, 1]
+
+    def test_rollup_raw_matches_stored_rollups(self):
+        times = np.array(
+            ["2024-01-01T12:00:10", "2024-01-01T12:00:50", "2024-01-01T12:01:05"],
+            dtype="datetime64[us]",
+        )
+
+        rollups = rollup_raw(times, np.array([1.0, 3.0, 10.0]))
+
+        assert rollups["minutes"].tolist() == list(
+            np.array(["2024-01-01T12:00", "2024-01-01T12:01"], dtype="datetime64[s]")
+        )
+        assert rollups["counts"].tolist() == [2, 1]
+        assert rollups["sums"].tolist() == [4.0, 10.0]
+        assert rollups["mins"].tolist() == [1.0, 10.0]
+        assert rollups["maxs"].tolist() == [3.0, 10.0]
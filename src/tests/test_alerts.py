@@ -0,0 +1,197 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.dashboard.alerts import AlertEngine, AlertRule, WebhookNotifier
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def _engine(*definitions):
+    engine = AlertEngine()
+    engine.set_rules([AlertRule.from_dict(d) for d in definitions])
+    return engine
+
+
+def _feed(engine, sensor_id, points, **meta):
+    alerts = []
+    for seconds, value in points:
+        alerts += engine.evaluate(
+            sensor_id, T0 + timedelta(seconds=seconds), value, **meta
+        )
+    return alerts
+
+
+class TestAlertRule:
+    def test_from_dict_defaults(self):
+        rule = AlertRule.from_dict({"kind": "threshold", "threshold": 30})
+
+        assert rule.id
+        assert rule.op == ">"
+        assert rule.describe() == "value > 30"
+
+    @pytest.mark.parametrize(
+        "definition",
+        [
+            {},
+            {"kind": "sometimes"},
+            {"kind": "threshold", "op": "~"},
+            {"kind": "threshold", "threshold": "hot"},
+            {"kind": "rate", "per": 0},
+            {"kind": "absence"},
+        ],
+    )
+    def test_from_dict_invalid(self, definition):
+        with pytest.raises(ValueError, match="Invalid alert rule"):
+            AlertRule.from_dict(definition)
+
+
+class TestAlertEngine:
+    def test_threshold_for_duration(self):
+        engine = _engine(
+            {"id": "hot", "kind": "threshold", "threshold": 30, "duration": 300}
+        )
+
+        alerts = _feed(engine, "t1", [(0, 31), (120, 32), (299, 33)])
+        assert alerts == []
+
+        alerts = _feed(engine, "t1", [(300, 31), (360, 35)])
+        assert [a["state"] for a in alerts] == ["firing"]
+        assert alerts[0]["condition"] == "value > 30 for 300s"
+        assert engine.active()[0]["sensor_id"] == "t1"
+
+        alerts = _feed(engine, "t1", [(400, 25)])
+        assert [a["state"] for a in alerts] == ["resolved"]
+        assert engine.active() == []
+
+    def test_threshold_dip_restarts_duration(self):
+        engine = _engine(
+            {"id": "hot", "kind": "threshold", "threshold": 30, "duration": 60}
+        )
+
+        assert _feed(engine, "t1", [(0, 31), (50, 29), (100, 31), (150, 31)]) == []
+
+    def test_rate_of_change_percent(self):
+        engine = _engine(
+            {"id": "jump", "kind": "rate", "threshold": 10, "per": 60, "percent": True}
+        )
+
+        # 50 -> 52 in a minute is 4%/min; 52 -> 60 is over 15%/min
+        alerts = _feed(engine, "h1", [(0, 50), (60, 52), (120, 60)])
+        assert [a["state"] for a in alerts] == ["firing"]
+        assert alerts[0]["condition"] == "change > 10%/60s"
+
+        alerts = _feed(engine, "h1", [(180, 60.5)])
+        assert [a["state"] for a in alerts] == ["resolved"]
+
+    def test_rate_direction(self):
+        engine = _engine(
+            {"id": "drop", "kind": "rate", "threshold": 5, "direction": "down"}
+        )
+
+        assert _feed(engine, "t1", [(0, 20), (60, 30)]) == []
+        assert len(_feed(engine, "t1", [(120, 20)])) == 1
+
+    def test_absence(self):
+        engine = _engine({"id": "quiet", "kind": "absence", "duration": 120})
+
+        engine.evaluate("t1", T0, 20.0, now=0.0)
+        engine.evaluate("t2", T0, 20.0, now=0.0)
+        engine.evaluate("t2", T0, 20.0, now=100.0)
+
+        assert engine.check_absence(now=119.0) == []
+        alerts = engine.check_absence(now=121.0)
+        assert [(a["sensor_id"], a["state"]) for a in alerts] == [("t1", "firing")]
+        assert engine.check_absence(now=500.0)[0]["sensor_id"] == "t2"
+        assert engine.check_absence(now=1000.0) == []
+
+        alerts = engine.evaluate("t1", T0, 20.0, now=1001.0)
+        assert [a["state"] for a in alerts] == ["resolved"]
+
+    def test_absence_keeps_one_deadline_per_sensor(self):
+        engine = _engine({"id": "quiet", "kind": "absence", "duration": 120})
+
+        for second in range(1000):
+            engine.evaluate("t1", T0, 20.0, now=second / 10)
+        assert len(engine._deadlines) == 1
+
+        # The first deadline has passed but readings pushed it back
+        assert engine.check_absence(now=150.0) == []
+        assert len(engine._deadlines) == 1
+        alerts = engine.check_absence(now=220.0)
+        assert [a["state"] for a in alerts] == ["firing"]
+        assert engine._deadlines == []
+
+    def test_absence_watches_sensors_that_never_report(self):
+        engine = _engine(
+            {"id": "quiet", "kind": "absence", "duration": 120, "location": "Attic"}
+        )
+
+        engine.watch("t1", location="Attic", silent_for=100.0, now=1000.0)
+        engine.watch("t2", location="Cellar", now=1000.0)
+        engine.evaluate("t3", T0, 20.0, location="Attic", now=990.0)
+        engine.watch("t3", location="Attic", silent_for=500.0, now=1000.0)
+
+        alerts = engine.check_absence(now=1021.0)
+        assert [a["sensor_id"] for a in alerts] == ["t1"]
+        assert [a["sensor_id"] for a in engine.check_absence(now=1111.0)] == ["t3"]
+        assert engine._deadlines == []
+
+    def test_incomparable_timestamp_restarts_rule(self):
+        engine = _engine(
+            {"id": "hot", "kind": "threshold", "threshold": 30, "duration": 60},
+            {"id": "jump", "kind": "rate", "threshold": 5},
+        )
+        aware = (T0 + timedelta(seconds=10)).replace(tzinfo=timezone.utc)
+
+        _feed(engine, "t1", [(0, 31)])
+        assert engine.evaluate("t1", aware, 31.0) == []
+
+        # The rules carry on from the reading that could not be compared
+        alerts = engine.evaluate("t1", aware + timedelta(seconds=60), 50.0)
+        assert {a["rule_id"] for a in alerts} == {"hot", "jump"}
+
+    def test_rules_index_by_selector(self):
+        engine = _engine(
+            {"id": "all", "kind": "threshold", "threshold": 100},
+            {"id": "kitchen", "kind": "threshold", "location": "Kitchen"},
+            {"id": "temp", "kind": "threshold", "type": "temperature"},
+            {"id": "one", "kind": "threshold", "sensor_ids": ["t9"]},
+            {"id": "tagged", "kind": "threshold", "tag": "ground"},
+        )
+
+        rules = engine.rules_for("t1", "temperature", "Kitchen", ["ground"])
+        assert {r.id for r in rules} == {"all", "kitchen", "temp", "tagged"}
+        assert {r.id for r in engine.rules_for("h1", "humidity")} == {"all"}
+
+        # A sensor that moves is re-indexed
+        assert {r.id for r in engine.rules_for("h1", "humidity", "Kitchen")} == {
+            "all",
+            "kitchen",
+        }
+
+    def test_set_rules_keeps_state_of_unchanged_rules(self):
+        hot = {"id": "hot", "kind": "threshold", "threshold": 30}
+        engine = _engine(hot)
+        _feed(engine, "t1", [(0, 31)])
+
+        engine.set_rules(
+            [
+                AlertRule.from_dict(hot),
+                AlertRule.from_dict({"id": "cold", "kind": "threshold", "op": "<"}),
+            ]
+        )
+        assert len(engine.active()) == 1
+
+        engine.set_rules([AlertRule.from_dict({**hot, "threshold": 40})])
+        assert engine.active() == []
+
+
+class TestWebhookNotifier:
+    def test_records_without_url(self):
+        notifier = WebhookNotifier(history=2)
+        for i in range(3):
+            notifier.send({"rule_id": str(i)})
+
+        assert [a["rule_id"] for a in notifier.recent()] == ["1", "2"]
+        assert notifier._worker is None
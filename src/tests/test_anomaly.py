@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src.dashboard.anomaly import AnomalyDetector
+
+
+def _series(n, start=datetime(2024, 1, 1), step=timedelta(minutes=10), seed=1):
+    rng = np.random.default_rng(seed)
+    times = [start + i * step for i in range(n)]
+    values = 20.0 + rng.normal(0, 0.5, n)
+    return times, values
+
+
+class TestAnomalyDetector:
+    def test_flags_spike_after_warmup(self):
+        detector = AnomalyDetector()
+        times, values = _series(100)
+        values[60] += 10
+
+        flagged = [
+            i
+            for i, (t, v) in enumerate(zip(times, values))
+            if detector.score("temp_01", t, v)
+        ]
+        assert flagged == [60]
+
+    def test_no_flags_during_warmup(self):
+        detector = AnomalyDetector(warmup=50)
+        times, values = _series(40)
+        values[30] += 10
+
+        assert not any(detector.score("temp_01", t, v) for t, v in zip(times, values))
+
+    def test_daily_cycle_is_not_anomalous(self):
+        detector = AnomalyDetector(threshold=4.0)
+        times, _ = _series(24 * 6 * 14, step=timedelta(minutes=10))
+        values = [20 + 5 * np.sin(t.hour / 24 * 2 * np.pi) for t in times]
+
+        flags = [detector.score("temp_01", t, v) for t, v in zip(times, values)]
+        # Once every hour has its own baseline the cycle is expected
+        assert not any(flags[24 * 6 * 7 :])
+
+    def test_models_are_per_sensor(self):
+        detector = AnomalyDetector(warmup=5)
+        times, values = _series(20)
+        for t, v in zip(times, values):
+            detector.score("temp_01", t, v)
+
+        assert detector.score("temp_02", times[-1], 500.0) is None
+        assert detector.score("temp_01", times[-1], 500.0)["score"] > 4
+
+        detector.reset("temp_01")
+        assert "temp_01" not in detector.models
+
+    def test_score_history_matches_streaming(self):
+        detector = AnomalyDetector(warmup=20, seasonal_min=3)
+        times, values = _series(24 * 6 * 3, step=timedelta(minutes=10))
+        values[[100, 250, 400]] += np.array([8, -9, 12])
+
+        streamed = [
+            i
+            for i, (t, v) in enumerate(zip(times, values))
+            if detector.score("temp_01", t, v)
+        ]
+        expected, scores, flagged = detector.score_history(
+            np.array(times, dtype="datetime64[us]"), values
+        )
+
+        assert np.flatnonzero(flagged).tolist() == streamed
+        assert {100, 250, 400} <= set(streamed)
+
+        detector.reset()
+        for t, v in zip(times[:400], values[:400]):
+            detector.score("temp_01", t, v)
+        flag = detector.score("temp_01", times[400], values[400])
+        assert flag["expected"] == pytest.approx(expected[400], abs=1e-4)
+        assert flag["score"] == pytest.approx(scores[400], abs=0.01)
+
+    def test_score_history_empty(self):
+        expected, scores, flagged = AnomalyDetector().score_history(
+            np.array([], dtype="datetime64[us]"), np.array([])
+        )
+        assert len(expected) == len(scores) == len(flagged) == 0
@@ -0,0 +1,71 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from benchmark import compare, main, run_config
+from src.dashboard.realtime import UpdateStream
+
+
+def _config(**overrides):
+    config = {
+        "storage": "file",
+        "mode": "single",
+        "batch_size": 1,
+        "sensors": 3,
+        "history": 5,
+        "messages": 12,
+        "queries": 2,
+        "seed": 0,
+        "log_level": "WARNING",
+    }
+    config.update(overrides)
+    return config
+
+
+@pytest.fixture(autouse=True)
+def update_stream():
+    """Keep the benchmark's updates out of the shared replay buffer."""
+    with patch("src.dashboard.realtime.update_stream", UpdateStream()):
+        yield
+
+
+class TestBenchmark:
+    @patch.dict("os.environ")
+    def test_run_config_reports_metrics(self):
+        result = run_config(_config())
+
+        assert result["messages_per_second"] > 0
+        for section in ("ingest", "query_sensors", "query_readings"):
+            assert result[section]["p50_ms"] <= result[section]["p99_ms"]
+        assert result["peak_rss_mb"] > 0
+
+    @patch.dict("os.environ")
+    def test_batch_mode(self):
+        result = run_config(_config(mode="batch", batch_size=4))
+
+        assert result["mode"] == "batch"
+        assert result["ingest"]["p50_ms"] is not None
+
+    @patch("benchmark.run_suite")
+    def test_main_writes_results_and_compares(self, mock_suite, tmp_path, capsys):
+        report = {"meta": {}, "results": [dict(_config(), **_metrics(100.0))]}
+        mock_suite.return_value = report
+        output = tmp_path / "results.json"
+
+        assert main(["--output", str(output)]) == 0
+        assert json.loads(output.read_text()) == report
+
+        compare([str(output), str(output)])
+        assert "100.0" in capsys.readouterr().out
+
+
+def _metrics(rate):
+    timings = {"p50_ms": 1.0, "p99_ms": 2.0, "max_ms": 3.0}
+    return {
+        "messages_per_second": rate,
+        "ingest": timings,
+        "query_sensors": timings,
+        "query_readings": timings,
+        "peak_rss_mb": 100.0,
+    }
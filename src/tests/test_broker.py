@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import paho.mqtt.client as mqtt
+import pytest
+
+from sensor_simulator import SensorSimulator
+from src.dashboard.broker import MQTTBroker, ensure_broker, topic_matches
+from src.dashboard.mqtt_client import MQTTClient
+
+
+@pytest.fixture
+def broker():
+    with MQTTBroker() as broker:
+        yield broker
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for MQTT traffic")
+        time.sleep(0.01)
+
+
+def _client(port, on_message=None):
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    connected = threading.Event()
+    client.on_connect = lambda *args: connected.set()
+    if on_message is not None:
+        client.on_message = on_message
+    client.connect("127.0.0.1", port)
+    client.loop_start()
+    assert connected.wait(5)
+    return client
+
+
+class TestTopicMatching:
+    def test_wildcards(self):
+        assert topic_matches("sensors/+/+", "sensors/temp_01/temperature")
+        assert not topic_matches("sensors/+/+", "sensors/temp_01")
+        assert not topic_matches("sensors/+", "sensors/temp_01/temperature")
+        assert topic_matches("sensors/#", "sensors/temp_01/temperature")
+        assert topic_matches("sensors/#", "sensors")
+        assert topic_matches("#", "a/b")
+        assert not topic_matches("#", "$SYS/uptime")
+        assert topic_matches("a/b", "a/b")
+        assert not topic_matches("a/b", "a/c")
+
+
+class TestMQTTBroker:
+    def test_publish_subscribe_at_qos_0_and_1(self, broker):
+        received = []
+        subscriber = _client(broker.port, lambda c, u, m: received.append(m))
+        subscriber.subscribe([("sensors/+/temperature", 1), ("other/#", 0)])
+        publisher = _client(broker.port)
+        _wait(lambda: broker.sessions and broker.sessions[0].subscriptions)
+
+        publisher.publish("sensors/t1/temperature", "a", qos=0)
+        publisher.publish("sensors/t1/temperature", "b", qos=1).wait_for_publish(5)
+        publisher.publish("sensors/t1/humidity", "c", qos=1)
+        publisher.publish("other/x", "d", qos=1)
+        _wait(lambda: len(received) == 3)
+
+        assert [(m.payload, m.qos) for m in received] == [
+            (b"a", 0),
+            (b"b", 1),
+            (b"d", 0),
+        ]
+        assert broker.received == 4
+
+        subscriber.unsubscribe("sensors/+/temperature")
+        _wait(lambda: "sensors/+/temperature" not in broker.sessions[0].subscriptions)
+        publisher.publish("sensors/t1/temperature", "e", qos=1).wait_for_publish(5)
+        publisher.publish("other/y", "f")
+        _wait(lambda: len(received) == 4)
+        assert received[-1].payload == b"f"
+
+        for client in (subscriber, publisher):
+            client.disconnect()
+            client.loop_stop()
+
+    @patch("src.dashboard.mqtt_client.process_sensor_data")
+    def test_simulator_to_mqtt_client(self, mock_process, broker):
+        """The ingest client receives what the simulator publishes."""
+        env = {"MQTT_BROKER_HOST": "127.0.0.1", "MQTT_BROKER_PORT": str(broker.port)}
+        with patch.dict("os.environ", env):
+            ingest = MQTTClient()
+            assert ingest.connect()
+            ingest.client.loop_start()
+            _wait(lambda: broker.sessions and broker.sessions[0].subscriptions)
+
+            simulator = SensorSimulator()
+            assert simulator.connect()
+            simulator.client.loop_start()
+        sensor = simulator.sensors[0]
+        data = simulator.generate_sensor_data(sensor)
+        simulator.client.publish(
+            f"sensors/{sensor['id']}/{sensor['type']}", json.dumps(data)
+        )
+        _wait(lambda: mock_process.delay.called)
+
+        topic, payload = mock_process.delay.call_args[0]
+        assert topic == "sensors/temp_living_room/temperature"
+        assert json.loads(payload)["value"] == data["value"]
+
+        simulator.stop()
+        simulator.client.loop_stop()
+        ingest.stop()
+        ingest.client.loop_stop()
+
+    def test_ensure_broker_reuses_running_broker(self, broker):
+        assert ensure_broker(broker.port) is None
+
+        started = ensure_broker(_free_port(), embedded=True)
+        try:
+            assert started is not None
+        finally:
+            started.stop()
+
+
+def _free_port():
+    with MQTTBroker() as probe:
+        return probe.port
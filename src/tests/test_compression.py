@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.dashboard.compression import (
+    decode_block,
+    drop_frames_before,
+    encode_block,
+    iter_frames,
+    iter_ordered_frames,
+    pack_frame,
+)
+
+T0 = np.datetime64("2024-01-01T12:00:00", "us")
+
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    steps = rng.integers(999_000, 1_001_000, n).astype("timedelta64[us]")
+    times = T0 + np.cumsum(steps)
+    values = np.round(20 + np.cumsum(rng.normal(0, 0.1, n)), 2)
+    return times, values
+
+
+class TestBlocks:
+    def test_round_trip_is_exact(self):
+        times, values = _series(1000)
+
+        decoded_times, decoded_values = decode_block(encode_block(times, values))
+
+        assert decoded_times.dtype == np.dtype("datetime64[us]")
+        np.testing.assert_array_equal(decoded_times, times)
+        np.testing.assert_array_equal(decoded_values, values)
+
+    def test_compresses_sensor_like_series(self):
+        times, values = _series(1000)
+        assert len(encode_block(times, values)) < 10 * len(times)
+
+        # Regular intervals and a steady value cost about two bits a point
+        steady = T0 + np.arange(1000) * np.timedelta64(5, "s")
+        assert len(encode_block(steady, np.full(1000, 21.5))) < 300
+
+    def test_special_values_and_irregular_times(self):
+        values = np.array([0.0, -0.0, np.inf, -np.inf, 1e308, 5e-324, np.nan, 3.0])
+        times = T0 + np.array(
+            [0, 10**12, 10**12 + 1, 5, 5, 10**15, -(10**15), 7], dtype="timedelta64[us]"
+        )
+
+        decoded_times, decoded_values = decode_block(encode_block(times, values))
+
+        np.testing.assert_array_equal(decoded_times, times)
+        assert (
+            decoded_values.view(np.uint64).tolist() == values.view(np.uint64).tolist()
+        )
+
+    def test_empty_and_truncated_blocks(self):
+        times, values = decode_block(encode_block(np.array([], "datetime64[us]"), []))
+        assert len(times) == len(values) == 0
+
+        block = encode_block(*_series(10))
+        with pytest.raises(ValueError, match="Truncated"):
+            decode_block(block[: len(block) // 2])
+
+
+class TestFrames:
+    def test_frames_outside_range_are_skipped(self):
+        times, values = _series(30)
+        archive = b"".join(
+            pack_frame(times[i : i + 10], values[i : i + 10]) for i in (0, 10, 20)
+        )
+        start = times[10].item()
+
+        blocks = list(iter_frames(archive, start=start, end=times[20].item()))
+
+        assert len(blocks) == 1
+        np.testing.assert_array_equal(blocks[0][0], times[10:20])
+
+        remaining, dropped = drop_frames_before(archive, times[15].item())
+        assert dropped == 10
+        assert [len(t) for t, _ in iter_frames(remaining)] == [10, 10]
+        assert drop_frames_before(archive, datetime(2000, 1, 1)) == (archive, 0)
+
+    def test_ordered_frames_merge_overlapping_frames(self):
+        times, values = _series(30)
+        late = np.concatenate([times[15:20], times[:1] + np.timedelta64(1, "us")])
+        archive = (
+            pack_frame(times[:10], values[:10])
+            + pack_frame(times[20:], values[20:])
+            + pack_frame(times[10:15], values[10:15])
+            + pack_frame(late, values[:6])
+        )
+
+        blocks = list(iter_ordered_frames(archive))
+
+        ordered = np.concatenate([t for t, _ in blocks])
+        assert len(ordered) == 31
+        assert (np.diff(ordered) >= np.timedelta64(0, "us")).all()
+        assert len(blocks[-1][0]) == 10  # the newest frame overlaps nothing
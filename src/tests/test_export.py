@@ -0,0 +1,63 @@
+import csv
+import io
+
+import pytest
+
+from src.dashboard.export import export_readings, iter_export_rows
+
+
+@pytest.fixture
+def history(file_storage):
+    for sensor_id in ["temp_01", "hum_01"]:
+        for minute in range(5):
+            file_storage.store_reading(
+                sensor_id,
+                {
+                    "sensor_id": sensor_id,
+                    "sensor_type": "temperature",
+                    "unit": "°C",
+                    "value": float(minute),
+                    "timestamp": f"2024-01-01T12:0{minute}:00",
+                },
+            )
+    return file_storage
+
+
+class TestExport:
+    def test_rows_are_chunked(self, history):
+        chunks = list(iter_export_rows(history, chunk_size=3))
+
+        assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+
+    def test_csv(self, history):
+        body = b"".join(export_readings(history, "csv", ["temp_01"]))
+
+        rows = list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+        assert len(rows) == 5
+        assert rows[0]["timestamp"] == "2024-01-01T12:00:00"
+        assert rows[0]["unit"] == "°C"
+
+    def test_parquet_row_group_per_chunk(self, history):
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+
+        body = b"".join(export_readings(history, "parquet", chunk_size=4))
+        parquet_file = pq.ParquetFile(io.BytesIO(body))
+        table = parquet_file.read()
+
+        assert parquet_file.num_row_groups == 3
+        assert table.num_rows == 10
+        assert table.schema.field("value").type == pa.float64()
+        assert table.schema.field("timestamp").type == pa.timestamp("us")
+
+    def test_arrow_stream(self, history):
+        pa = pytest.importorskip("pyarrow")
+        body = b"".join(export_readings(history, "arrow", ["hum_01"]))
+
+        table = pa.ipc.open_stream(body).read_all()
+        assert table.column("sensor_id").to_pylist() == ["hum_01"] * 5
+        assert table.column("value").to_pylist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+    def test_unknown_format(self, history):
+        with pytest.raises(ValueError):
+            export_readings(history, "xlsx")
@@ -0,0 +1,120 @@
+from src.dashboard.fanout import ClientQueue, Fanout
+
+
+class TestClientQueue:
+    def test_offer_conflates_updates_for_same_sensor(self):
+        queue = ClientQueue("sid", max_pending=10, max_bytes=1000)
+
+        queue.offer("temp_01", {"value": 1}, 10)
+        queue.offer("temp_01", {"value": 2}, 10)
+
+        assert queue.drain() == [{"value": 2}]
+        assert queue.conflated == 1
+        assert queue.queued_bytes == 0
+
+    def test_offer_drops_oldest_when_full(self):
+        queue = ClientQueue("sid", max_pending=2, max_bytes=1000)
+
+        for sensor_id in ["a", "b", "c"]:
+            queue.offer(sensor_id, {"sensor_id": sensor_id}, 10)
+
+        assert [u["sensor_id"] for u in queue.drain()] == ["b", "c"]
+        assert queue.dropped == 1
+
+    def test_offer_respects_byte_cap(self):
+        queue = ClientQueue("sid", max_pending=10, max_bytes=25)
+
+        for sensor_id in ["a", "b", "c"]:
+            queue.offer(sensor_id, {"sensor_id": sensor_id}, 10)
+
+        assert queue.queued_bytes == 20
+        assert queue.dropped == 1
+
+
+class TestFanout:
+    def _fanout(self, backlogs=None, **kwargs):
+        sent = []
+        backlogs = backlogs if backlogs is not None else {}
+        fanout = Fanout(
+            lambda sid, update: sent.append((sid, update)),
+            lambda sid: backlogs.get(sid, 0),
+            **kwargs,
+        )
+        return fanout, sent, backlogs
+
+    def test_publish_and_flush_delivers_to_every_client(self):
+        fanout, sent, _ = self._fanout()
+        fanout.register("a")
+        fanout.register("b")
+
+        fanout.publish({"sensor_id": "temp_01", "value": 1})
+        fanout.flush(now=0)
+
+        assert sorted(sid for sid, _ in sent) == ["a", "b"]
+
+    def test_slow_client_is_demoted_and_conflated(self):
+        fanout, sent, backlogs = self._fanout(slow_backlog=5, flush_interval=1.0)
+        fanout.register("fast")
+        fanout.register("slow")
+        backlogs["slow"] = 10
+
+        for value in range(3):
+            fanout.publish({"sensor_id": "temp_01", "value": value})
+            fanout.flush(now=value * 10)
+
+        slow = fanout.clients["slow"]
+        assert [u["value"] for sid, u in sent if sid == "fast"] == [0, 1, 2]
+        assert not [u for sid, u in sent if sid == "slow"]
+        assert slow.level == 3
+        assert len(slow.pending) == 1 and slow.conflated == 2
+
+        backlogs["slow"] = 0
+        fanout.flush(now=100)
+
+        assert [u["value"] for sid, u in sent if sid == "slow"] == [2]
+        assert slow.level == 2
+
+    def test_acking_client_backlog_is_unacknowledged_updates(self):
+        fanout, sent, backlogs = self._fanout(slow_backlog=1)
+        queue = fanout.register("a", acks=True)
+        backlogs["a"] = 100  # the transport probe is not used for acking clients
+
+        for value in range(3):
+            fanout.publish({"sensor_id": f"temp_0{value}", "value": value})
+            fanout.flush(now=value * 10)
+
+        assert [u["value"] for _, u in sent] == [0, 1]
+        assert queue.unacked == 2 and queue.level == 1
+
+        fanout.acked("a", 2)
+        fanout.flush(now=100)
+
+        assert [u["value"] for _, u in sent] == [0, 1, 2]
+        assert queue.unacked == 1 and queue.level == 0
+
+    def test_demoted_client_waits_for_its_period(self):
+        fanout, sent, _ = self._fanout(flush_interval=1.0)
+        queue = fanout.register("a")
+        queue.level = 2
+
+        fanout.publish({"sensor_id": "temp_01", "value": 1})
+        fanout.flush(now=0)
+        fanout.publish({"sensor_id": "temp_01", "value": 2})
+        fanout.flush(now=1)
+
+        assert [u["value"] for _, u in sent] == [1]
+
+        fanout.flush(now=2)
+
+        assert [u["value"] for _, u in sent] == [1, 2]
+
+    def test_metrics_report_queued_bytes_per_client(self):
+        fanout, _, _ = self._fanout()
+        fanout.register("a")
+
+        fanout.publish({"sensor_id": "temp_01", "value": 1})
+        metrics = fanout.metrics()
+
+        assert metrics["connected_clients"] == 1
+        assert metrics["clients"][0]["queued_bytes"] > 0
+        assert metrics["queued_bytes"] == metrics["clients"][0]["queued_bytes"]
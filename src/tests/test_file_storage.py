@@ -0,0 +1,327 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.dashboard.file_storage import FileStorage, parse_timestamp
+
+
+class TestFileStorageVersions:
+    def test_update_stats_advances_counters(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        start = storage.get_version()
+
+        storage.update_stats("temp_01", {"value": 1.0, "timestamp": "t1"})
+        storage.update_stats("hum_01", {"value": 2.0, "timestamp": "t1"})
+
+        assert storage.get_version() == start + 2
+        assert storage.get_sensor_version("temp_01") == 1
+        assert storage.get_sensor_version("hum_01") == 1
+
+    def test_version_stable_without_changes(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        storage.update_stats("temp_01", {"value": 1.0, "timestamp": "t1"})
+
+        assert storage.get_version() == storage.get_version()
+
+    def test_external_writes_advance_changed_sensors_only(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        storage.update_stats("temp_01", {"value": 1.0, "timestamp": "t1"})
+        storage.update_stats("hum_01", {"value": 2.0, "timestamp": "t1"})
+        version = storage.get_version()
+
+        other = FileStorage(str(tmp_path))
+        other.update_stats("temp_01", {"value": 3.0, "timestamp": "t2"})
+        stat = os.stat(storage.stats_file)
+        os.utime(storage.stats_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+        assert storage.get_version() == version + 1
+        assert storage.get_sensor_version("temp_01") == 2
+        assert storage.get_sensor_version("hum_01") == 1
+        with open(storage.stats_file) as f:
+            assert json.load(f)["temp_01"]["count"] == 2
+
+
+def _reading(sensor_id, value, timestamp, **fields):
+    return {"sensor_id": sensor_id, "value": value, "timestamp": timestamp, **fields}
+
+
+class TestFileStorageRegistry:
+    def test_readings_store_only_measurements(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        storage.store_reading(
+            "temp_01",
+            _reading(
+                "temp_01",
+                21.5,
+                "2024-01-01T12:00:00",
+                sensor_type="temperature",
+                unit="°C",
+                location="Kitchen",
+                metadata={"model": "X1"},
+            ),
+        )
+
+        with open(storage.readings_file) as f:
+            stored = json.load(f)["temp_01"]
+        assert stored == [{"value": 21.5, "timestamp": "2024-01-01T12:00:00"}]
+
+        reading = storage.get_readings("temp_01", hours=10**6)[0]
+        assert reading["sensor_id"] == "temp_01"
+        assert reading["location"] == "Kitchen"
+        assert reading["metadata"] == {"model": "X1"}
+
+    def test_registry_is_shared_through_sensors_file(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        other = FileStorage(str(tmp_path))
+        other.store_reading(
+            "hum_01", _reading("hum_01", 40, "2024-01-01T12:00:00", location="Hall")
+        )
+        stat = os.stat(storage.sensors_file)
+        os.utime(storage.sensors_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+        assert storage.get_sensor("hum_01")["location"] == "Hall"
+        assert storage.get_sensor("missing") is None
+
+    def test_registry_seeded_from_legacy_readings(self, tmp_path):
+        with open(tmp_path / "readings.json", "w") as f:
+            json.dump(
+                {"temp_01": [_reading("temp_01", 1, "t", sensor_type="temperature")]},
+                f,
+            )
+
+        storage = FileStorage(str(tmp_path))
+        assert storage.select_sensors(sensor_type="temperature") == set()
+
+        storage.migrate()
+        assert storage.select_sensors(sensor_type="temperature") == {"temp_01"}
+
+    def test_selectors_resolve_through_indexes(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        storage.store_readings(
+            [
+                (
+                    "t1",
+                    _reading(
+                        "t1",
+                        1,
+                        "2024-01-01T12:00:00",
+                        sensor_type="temperature",
+                        location="Kitchen",
+                        tags=["ground"],
+                    ),
+                ),
+                (
+                    "t2",
+                    _reading(
+                        "t2",
+                        2,
+                        "2024-01-01T12:00:00",
+                        sensor_type="temperature",
+                        location="Attic",
+                    ),
+                ),
+                (
+                    "h1",
+                    _reading(
+                        "h1",
+                        3,
+                        "2024-01-01T12:00:00",
+                        sensor_type="humidity",
+                        location="Kitchen",
+                        tags=["ground"],
+                    ),
+                ),
+            ]
+        )
+
+        assert storage.select_sensors(location="Kitchen") == {"t1", "h1"}
+        assert storage.select_sensors(sensor_type="temperature", tag="ground") == {"t1"}
+        assert set(storage.scan_readings(tag="ground")) == {"t1", "h1"}
+        assert storage.get_groups("location") == {
+            "Kitchen": ["h1", "t1"],
+            "Attic": ["t2"],
+        }
+
+        # A sensor that moves is re-indexed
+        storage.store_reading(
+            "t2", _reading("t2", 2, "2024-01-01T12:01:00", location="Kitchen")
+        )
+        assert storage.select_sensors(location="Kitchen") == {"t1", "t2", "h1"}
+        assert "Attic" not in storage.get_groups("location")
+        assert storage.get_sensor("t2")["sensor_type"] == "temperature"
+
+    def test_stats_record_sensor_type(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        storage.update_stats(
+            "temp_01", _reading("temp_01", 1.0, "t1", sensor_type="temperature")
+        )
+
+        assert storage.get_stats("temp_01")["sensor_type"] == "temperature"
+
+
+class TestFileStorageOrdering:
+    def test_out_of_order_readings_stored_in_time_order(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        for value, timestamp in [
+            (1, "2024-01-01T12:00:00"),
+            (3, "2024-01-01T12:02:00"),
+            (2, "2024-01-01T12:01:00"),
+            (4, "2024-01-01T12:03:00+00:00"),
+        ]:
+            storage.store_reading("t1", _reading("t1", value, timestamp))
+
+        # The offset timestamp is ordered by its local time, not as a string
+        with open(storage.readings_file) as f:
+            stored = json.load(f)["t1"]
+        times = [parse_timestamp(reading["timestamp"]) for reading in stored]
+        assert times == sorted(times)
+        values = [r["value"] for r in stored if r["value"] != 4]
+        assert values == [1, 2, 3]
+
+    def test_late_mask_uses_watermark(self, tmp_path):
+        storage = FileStorage(str(tmp_path), lateness=60)
+        storage.store_reading("t1", _reading("t1", 1, "2024-01-01T12:10:00"))
+
+        assert storage.late_mask(
+            [
+                ("t1", "2024-01-01T12:09:30"),
+                ("t1", "2024-01-01T12:05:00"),
+                ("t2", "2024-01-01T12:05:00"),
+                ("t2", "2024-01-01T12:20:00"),
+                ("t2", "2024-01-01T12:10:00"),
+            ]
+        ) == [False, True, False, False, True]
+
+    def test_legacy_readings_sorted_by_migrate(self, tmp_path):
+        with open(tmp_path / "readings.json", "w") as f:
+            json.dump(
+                {
+                    "t1": [
+                        {"value": 2, "timestamp": "2024-01-01T12:01:00"},
+                        {"value": 1, "timestamp": "2024-01-01T12:00:00"},
+                    ]
+                },
+                f,
+            )
+
+        storage = FileStorage(str(tmp_path))
+        assert storage.late_mask([("t1", "2024-01-01T11:00:00")]) == [True]
+        with open(storage.readings_file) as f:
+            assert [r["value"] for r in json.load(f)["t1"]] == [2, 1]
+
+        storage.migrate()
+        with open(storage.readings_file) as f:
+            assert [r["value"] for r in json.load(f)["t1"]] == [1, 2]
+
+    def test_opening_storage_writes_nothing(self, tmp_path):
+        with open(tmp_path / "readings.json", "w") as f:
+            json.dump({"t1": [_reading("t1", 2, "2024-01-01T12:01:00")]}, f)
+        before = {p.name: p.stat().st_mtime_ns for p in tmp_path.iterdir()}
+
+        FileStorage(str(tmp_path))
+        FileStorage(str(tmp_path / "missing"))
+
+        assert {p.name: p.stat().st_mtime_ns for p in tmp_path.iterdir()} == before
+
+    def test_rollups_append_and_compact(self, tmp_path):
+        storage = FileStorage(str(tmp_path), rollup_retention=3)
+        for minute in range(5):
+            for value in (1.0, 3.0):
+                storage.update_rollup(
+                    "t1", _reading("t1", value, f"2024-01-01T12:0{minute}:30")
+                )
+
+        rows = storage.get_rollups("t1")
+        assert [row[0].minute for row in rows] == [2, 3, 4]
+        assert rows[-1][1:] == (2, 4.0, 1.0, 3.0)
+        with open(storage._rollups_path("t1")) as f:
+            assert len(f.readlines()) < 2 * storage.rollup_retention
+
+    def test_legacy_rollups_split_by_migrate(self, tmp_path):
+        with open(tmp_path / "rollups.json", "w") as f:
+            json.dump({"t1": {"2024-01-01T12:00:00": [2, 5.0, 1.0, 4.0]}}, f)
+
+        storage = FileStorage(str(tmp_path))
+        storage.migrate()
+        storage.update_rollup("t1", _reading("t1", 7.0, "2024-01-01T12:00:10"))
+
+        assert not (tmp_path / "rollups.json").exists()
+        assert storage.get_rollups("t1")[0][1:] == (3, 12.0, 1.0, 7.0)
+
+    def test_last_reading_only_moves_forward(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        storage.update_stats("t1", _reading("t1", 1.0, "2024-01-01T12:10:00"))
+        storage.update_stats("t1", _reading("t1", 5.0, "2024-01-01T12:00:00"))
+
+        stats = storage.get_stats("t1")
+        assert stats["last_reading"] == "2024-01-01T12:10:00"
+        assert stats["count"] == 2
+        assert stats["max_value"] == 5.0
+
+
+class TestFileStorageArchive:
+    def _fill(self, storage, n):
+        start = datetime(2024, 1, 1, 12, 0)
+        storage.store_readings(
+            [
+                (
+                    "t1",
+                    _reading(
+                        "t1", float(i), (start + timedelta(seconds=i)).isoformat()
+                    ),
+                )
+                for i in range(n)
+            ]
+        )
+        return start
+
+    def test_old_readings_are_compressed_not_dropped(self, tmp_path):
+        storage = FileStorage(str(tmp_path), block_size=400)
+        start = self._fill(storage, 1200)
+
+        with open(storage.readings_file) as f:
+            assert len(json.load(f)["t1"]) == 600
+        assert os.path.getsize(storage._archive_path("t1")) < 600 * 10
+
+        rows = list(storage.iter_readings("t1"))
+        assert [r["value"] for _, r in rows] == [float(i) for i in range(1200)]
+        assert rows[0][1]["timestamp"] == start.isoformat()
+
+        times, values = storage.get_series(
+            "t1", start + timedelta(seconds=590), start + timedelta(seconds=610)
+        )
+        assert values.tolist() == [float(i) for i in range(590, 610)]
+        assert times[0] == np.datetime64(start + timedelta(seconds=590), "us")
+        scanned = storage.scan_readings(["t1"], start=start + timedelta(seconds=1100))
+        assert len(scanned["t1"]) == 100
+
+    def test_late_reading_merges_with_archive(self, tmp_path):
+        storage = FileStorage(str(tmp_path), block_size=400)
+        start = self._fill(storage, 1001)
+        storage.store_reading(
+            "t1", _reading("t1", -1.0, (start + timedelta(seconds=100.5)).isoformat())
+        )
+
+        values = [r["value"] for _, r in storage.iter_readings("t1")]
+        assert values[100:103] == [100.0, -1.0, 101.0]
+        assert storage.get_series("t1")[1][101] == -1.0
+
+    def test_scan_is_lazy_per_sensor(self, tmp_path):
+        storage = FileStorage(str(tmp_path), block_size=400)
+        self._fill(storage, 1200)
+
+        scan = storage.iter_scan(["t1"])
+        sensor_id, rows = next(scan)
+        first = next(rows)
+
+        assert sensor_id == "t1" and first[1]["value"] == 0.0
+        assert [r["value"] for _, r in rows][-1] == 1199.0
+
+    def test_cleanup_drops_old_blocks(self, tmp_path):
+        storage = FileStorage(str(tmp_path), block_size=400)
+        self._fill(storage, 1200)
+
+        assert storage.cleanup_old_data(days=1) == 1200
+        assert list(storage.iter_readings("t1")) == []
@@ -0,0 +1,77 @@
+import pytest
+
+from src.dashboard.freshness import FreshnessTracker
+
+
+class TestFreshnessTracker:
+    def test_records_stage_lags(self):
+        tracker = FreshnessTracker()
+        tracker.ingested(
+            "temp_01",
+            device_time=100.0,
+            received_at=100.5,
+            started_at=101.0,
+            emitted_at=101.25,
+        )
+        lag = tracker.delivered("temp_01", device_time=100.0, at=102.0)
+
+        assert lag == 2.0
+        lags = tracker.lag_percentiles()
+        assert lags["receive"]["p50"] == 0.5
+        assert lags["queue"]["p50"] == 0.5
+        assert lags["process"]["p50"] == 0.25
+        assert lags["end_to_end"]["max"] == 2.0
+
+        (row,) = tracker.report(now=103.0)
+        assert row["sensor_id"] == "temp_01"
+        assert row["lag"] == 2.0
+        assert row["staleness"] == 1.0
+        assert row["stale"] is False
+
+    def test_empty_stages_have_no_percentiles(self):
+        assert FreshnessTracker().lag_percentiles()["end_to_end"] == {"count": 0}
+
+    def test_report_orders_most_stale_first(self):
+        tracker = FreshnessTracker(stale_after=60)
+        tracker.delivered("fresh", device_time=990.0, at=1000.0)
+        tracker.delivered("old", device_time=800.0, at=900.0)
+
+        report = tracker.report(now=1000.0)
+        assert [row["sensor_id"] for row in report] == ["old", "fresh"]
+        assert [row["stale"] for row in report] == [True, False]
+        assert tracker.stale_count(now=1000.0) == 1
+
+    @pytest.mark.parametrize(
+        "delivered_at, status, ingest",
+        [
+            (None, "unhealthy", "stalled"),
+            (990.0, "healthy", "ok"),
+            (850.0, "degraded", "ok"),
+            (700.0, "unhealthy", "stalled"),
+        ],
+    )
+    def test_health(self, delivered_at, status, ingest):
+        tracker = FreshnessTracker(stale_after=120, stall_after=200, started_at=0.0)
+        if delivered_at is not None:
+            tracker.delivered("temp_01", device_time=delivered_at, at=delivered_at)
+
+        health = tracker.health(now=1000.0)
+        assert health["status"] == status
+        assert health["ingest"]["status"] == ingest
+
+    def test_idle_only_until_stall_after_start(self):
+        tracker = FreshnessTracker(stall_after=200, started_at=900.0)
+
+        assert tracker.health(now=1000.0)["ingest"]["status"] == "idle"
+        assert tracker.health(now=1101.0)["status"] == "unhealthy"
+
+    def test_seeded_sensors_go_stale_without_deliveries(self):
+        tracker = FreshnessTracker(stale_after=60, started_at=1000.0)
+        tracker.seed({"dead": 500.0, "live": 990.0})
+        tracker.delivered("live", device_time=1010.0, at=1010.0)
+        tracker.seed({"live": 990.0})
+
+        report = {row["sensor_id"]: row for row in tracker.report(now=1020.0)}
+        assert report["dead"]["stale"] is True
+        assert report["live"]["staleness"] == 10.0
+        assert tracker.stale_count(now=1020.0) == 1
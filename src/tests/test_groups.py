@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.dashboard.groups import GroupViews, MaterializedView
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+NOW = T0.timestamp()
+
+
+def _update(sensor_id, value, seconds=0, **fields):
+    return {
+        "sensor_id": sensor_id,
+        "value": value,
+        "timestamp": (T0 + timedelta(seconds=seconds)).isoformat(),
+        **fields,
+    }
+
+
+def _views(*definitions):
+    return GroupViews(definitions)
+
+
+class TestMaterializedView:
+    def test_from_dict_invalid(self):
+        for definition in [
+            {},
+            {"id": "v", "by": "colour"},
+            {"id": "v", "measures": ["median"]},
+            {"id": "v", "window": 0},
+        ]:
+            with pytest.raises(ValueError, match="Invalid group view"):
+                MaterializedView.from_dict(definition)
+
+    def test_average_of_latest_values_per_group(self):
+        views = _views({"id": "rooms", "by": "location", "type": "temperature"})
+        views.apply(_update("t1", 20.0, sensor_type="temperature", location="Kitchen"))
+        views.apply(_update("t2", 24.0, sensor_type="temperature", location="Kitchen"))
+        views.apply(
+            _update("t1", 22.0, 10, sensor_type="temperature", location="Kitchen")
+        )
+        views.apply(_update("t3", 18.0, sensor_type="temperature", location="Attic"))
+        views.apply(_update("h1", 60.0, sensor_type="humidity", location="Kitchen"))
+
+        groups = views.read("rooms", now=NOW + 10)["rooms"]["groups"]
+        assert groups["Kitchen"] == {
+            "avg": 23.0,
+            "min": 20.0,
+            "max": 24.0,
+            "sensors": 2,
+            "active": 2,
+        }
+        assert groups["Attic"]["avg"] == 18.0
+
+    def test_window_expires_extremes_and_activity(self):
+        views = _views({"id": "all", "window": 60})
+        views.apply(_update("t1", 30.0, 0))
+        views.apply(_update("t2", 10.0, 50))
+        views.apply(_update("t2", 12.0, 100))
+
+        row = views.read("all", now=NOW + 100)["all"]["groups"]["all"]
+        assert row["max"] == 12.0
+        assert row["min"] == 10.0
+        assert row["sensors"] == 2
+        assert row["active"] == 1
+        assert row["avg"] == 21.0
+
+    def test_sensor_moving_between_groups(self):
+        views = _views({"id": "rooms", "by": "location"})
+        views.apply(_update("t1", 20.0, location="Kitchen"))
+        views.apply(_update("t2", 30.0, location="Kitchen"))
+        views.apply(_update("t2", 30.0, 5, location="Attic"))
+
+        groups = views.read("rooms", now=NOW)["rooms"]["groups"]
+        assert groups["Kitchen"]["sensors"] == 1
+        assert groups["Kitchen"]["avg"] == 20.0
+        assert groups["Attic"]["sensors"] == 1
+
+    def test_group_by_tag(self):
+        views = _views({"id": "tags", "by": "tag", "measures": ["sensors"]})
+        views.apply(_update("t1", 1.0, tags=["ground", "north"]))
+        views.apply(_update("t2", 1.0, tags=["ground"]))
+
+        groups = views.read("tags", now=NOW)["tags"]["groups"]
+        assert groups == {"ground": {"sensors": 2}, "north": {"sensors": 1}}
+
+    def test_older_reading_does_not_replace_latest(self):
+        views = _views({"id": "all"})
+        views.apply(_update("t1", 20.0, 10))
+        views.apply(_update("t1", 30.0, 5))
+
+        group = views.read("all", now=NOW + 10)["all"]["groups"]["all"]
+        assert group["avg"] == 20.0
+        assert group["max"] == 30.0
+
+    def test_late_readings_keep_extremes_in_window(self):
+        views = _views({"id": "all", "window": 300})
+        views.apply(_update("a", 50.0, 1000))
+        views.apply(_update("b", 10.0, 1010))
+        views.apply(_update("c", 60.0, 800))
+        views.apply(_update("d", 5.0, 1060))
+
+        group = views.read("all", now=NOW + 1090)["all"]["groups"]["all"]
+        assert (group["max"], group["min"], group["active"]) == (60.0, 5.0, 4)
+        group = views.read("all", now=NOW + 1150)["all"]["groups"]["all"]
+        assert (group["max"], group["min"], group["active"]) == (50.0, 5.0, 3)
+
+    def test_moved_sensor_takes_its_extremes(self):
+        views = _views({"id": "rooms", "by": "location"})
+        views.apply(_update("t1", 20.0, location="Kitchen"))
+        views.apply(_update("t2", 90.0, location="Kitchen"))
+        views.apply(_update("t2", 30.0, 5, location="Attic"))
+
+        kitchen = views.read("rooms", now=NOW + 5)["rooms"]["groups"]["Kitchen"]
+        assert kitchen["max"] == kitchen["min"] == 20.0
+
+
+class TestGroupViews:
+    def test_drain_returns_changed_groups_once(self):
+        views = _views({"id": "rooms", "by": "location", "measures": ["sensors"]})
+        views.apply(_update("t1", 1.0, location="Kitchen"))
+        views.apply(_update("t2", 1.0, location="Attic"))
+
+        assert views.drain(now=NOW) == {
+            "rooms": {"Kitchen": {"sensors": 1}, "Attic": {"sensors": 1}}
+        }
+        assert views.drain(now=NOW) == {}
+
+        views.apply(_update("t2", 1.0, location="Kitchen"))
+        assert views.drain(now=NOW) == {
+            "rooms": {"Kitchen": {"sensors": 2}, "Attic": None}
+        }
+
+    def test_seed_skips_sensors_already_live(self):
+        views = _views({"id": "all", "measures": ["avg"]})
+        views.apply(_update("t1", 50.0, 100))
+
+        views.seed([_update("t1", 10.0), _update("t2", 20.0)])
+
+        assert views.seeded
+        assert views.read("all", now=NOW)["all"]["groups"]["all"]["avg"] == 35.0
+
+    def test_seed_applies_updates_in_time_order(self):
+        views = _views({"id": "all"})
+
+        views.seed(
+            [_update("a", 50.0, 1000), _update("a", 40.0, 1100)]
+            + [_update("b", 60.0, 800), _update("b", 5.0, 1060)]
+        )
+
+        group = views.read("all", now=NOW + 1150)["all"]["groups"]["all"]
+        assert (group["max"], group["min"], group["active"]) == (50.0, 5.0, 2)
+
+    def test_updates_without_values_are_ignored(self):
+        views = _views({"id": "all"})
+        views.apply({"sensor_id": "t1"})
+
+        assert views.read(now=NOW)["all"]["groups"] == {}
@@ -0,0 +1,166 @@
+import json
+import logging
+import queue
+from unittest.mock import patch
+
+import pytest
+
+from src.dashboard.logs import (
+    FORMAT,
+    DroppingQueueHandler,
+    HotEvents,
+    JsonFormatter,
+    LogConfig,
+    TextFormatter,
+)
+from src.dashboard.metrics import LOG_RECORDS_DROPPED
+
+
+class _Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records():
+    handler = _Records()
+    logger = logging.getLogger("test_logs")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    yield logger, handler.records
+    logger.removeHandler(handler)
+    logger.propagate = True
+
+
+class TestHotEvents:
+    def test_logs_lazily_with_fields(self, records):
+        logger, logged = records
+        event = HotEvents().event("ingest.processed", logger)
+
+        event("Processed reading from sensor %s", "temp_01", topic="sensors/t")
+
+        (record,) = logged
+        assert record.getMessage() == "Processed reading from sensor temp_01"
+        assert record.event == "ingest.processed"
+        assert record.fields == {"topic": "sensors/t"}
+
+    def test_sampled_events_start_at_sample_rate(self, records):
+        logger, logged = records
+        events = HotEvents(sample_rate=0.0)
+        sampled = events.event("ingest.processed", logger, sampled=True)
+        full = events.event("ingest.failed", logger, logging.ERROR)
+
+        sampled("never")
+        full("always")
+
+        assert [record.getMessage() for record in logged] == ["always"]
+
+    @patch("src.dashboard.logs.time.monotonic")
+    def test_rate_limit_reports_suppressed_lines(self, mock_monotonic, records):
+        logger, logged = records
+        event = HotEvents(rate_limit=2).event("ingest.late", logger)
+
+        mock_monotonic.return_value = 100.0
+        for _ in range(5):
+            event("late")
+        mock_monotonic.return_value = 101.0
+        event("late")
+
+        assert len(logged) == 3
+        assert logged[-1].suppressed == 3
+
+    def test_disabled_and_below_level_events_are_skipped(self, records):
+        logger, logged = records
+        events = HotEvents()
+        debug = events.event("realtime.emit", logger, logging.DEBUG)
+        info = events.event("ingest.batch", logger)
+
+        events.update({"ingest.batch": {"enabled": False}})
+        debug("below level")
+        info("disabled")
+
+        assert logged == []
+
+    def test_update_is_all_or_nothing(self, records):
+        logger, _ = records
+        events = HotEvents()
+        events.event("ingest.batch", logger)
+        events.event("ingest.late", logger)
+
+        with pytest.raises(ValueError):
+            events.update(
+                {
+                    "ingest.batch": {"sample_rate": 0.5},
+                    "ingest.late": {"sample_rate": 2},
+                }
+            )
+        with pytest.raises(ValueError):
+            events.update({"ingest.unknown": {"enabled": False}})
+
+        assert events.status()["ingest.batch"]["sample_rate"] == 1.0
+
+
+class TestFormatters:
+    def _record(self, **extra):
+        record = logging.LogRecord(
+            "src.dashboard.tasks", logging.INFO, __file__, 1, "Read %s", ("t1",), None
+        )
+        record.__dict__.update(extra)
+        return record
+
+    def test_text_appends_fields(self):
+        record = self._record(event="ingest.late", fields={"topic": "t"}, suppressed=2)
+
+        line = TextFormatter(FORMAT).format(record)
+
+        assert line.endswith("INFO - Read t1 topic=t suppressed=2")
+
+    def test_json(self):
+        record = self._record(event="ingest.late", fields={"topic": "t"}, suppressed=0)
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        assert entry["message"] == "Read t1"
+        assert entry["event"] == "ingest.late"
+        assert entry["topic"] == "t"
+        assert "suppressed" not in entry
+
+
+class TestLogConfig:
+    def test_queue_handler_drops_when_full(self):
+        handler = DroppingQueueHandler(queue.Queue(1))
+        record = logging.makeLogRecord({"msg": "reading"})
+        dropped = LOG_RECORDS_DROPPED.labels().get()
+
+        handler.handle(record)
+        handler.handle(record)
+
+        assert handler.queue.qsize() == 1
+        assert LOG_RECORDS_DROPPED.labels().get() == dropped + 1
+
+    def test_async_records_are_written_by_listener(self, capsys):
+        config = LogConfig()
+        root = logging.getLogger()
+        level = root.level
+        try:
+            config.configure("INFO", format="json", asynchronous=True)
+            logging.getLogger("test_logs.async").info("Queued %d", 1)
+        finally:
+            config.stop()
+            root.setLevel(level)
+
+        # Other handlers on the root logger may write the record too
+        lines = [
+            json.loads(line)
+            for line in capsys.readouterr().err.splitlines()
+            if line.startswith("{")
+        ]
+        assert {"message": "Queued 1", "logger": "test_logs.async"}.items() <= (
+            lines[-1].items()
+        )
+        assert config.handler not in root.handlers
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+from src.dashboard.metrics import Registry, TimedLock
+
+
+class TestRegistry:
+    def test_counter_sums_threads(self):
+        registry = Registry()
+        counter = registry.counter("test_total", "Test counter", ["source"])
+        series = counter.labels("mqtt")
+
+        def work():
+            for _ in range(1000):
+                series.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        series.inc(2)
+
+        assert series.get() == 4002
+        assert 'test_total{source="mqtt"} 4002' in registry.render()
+
+    def test_exited_threads_are_folded(self):
+        registry = Registry()
+        series = registry.counter("test_total", "Test counter").labels()
+
+        for _ in range(5):
+            thread = threading.Thread(target=series.inc)
+            thread.start()
+            thread.join()
+
+        assert series.get() == 5
+        assert series._cells.cells == []
+
+    def test_exited_threads_are_folded_without_scrapes(self):
+        registry = Registry()
+        series = registry.counter("test_total", "Test counter").labels()
+
+        for _ in range(100):
+            thread = threading.Thread(target=series.inc)
+            thread.start()
+            thread.join()
+
+        # Each new thread's cell retires the ones before it
+        assert len(series._cells.cells) == 1
+        assert series.get() == 100
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.histogram(
+            "test_seconds", "Test histogram", ["stage"], buckets=[0.1, 1.0]
+        )
+        series = histogram.labels("parse")
+        for value in (0.05, 0.1, 0.5, 3.0):
+            series.observe(value)
+
+        text = registry.render()
+
+        assert "# TYPE test_seconds histogram" in text
+        assert 'test_seconds_bucket{stage="parse",le="0.1"} 2' in text
+        assert 'test_seconds_bucket{stage="parse",le="1"} 3' in text
+        assert 'test_seconds_bucket{stage="parse",le="+Inf"} 4' in text
+        assert 'test_seconds_sum{stage="parse"} 3.65' in text
+        assert 'test_seconds_count{stage="parse"} 4' in text
+
+    def test_timer_observes_block(self):
+        histogram = Registry().histogram("test_seconds", "Test histogram")
+
+        with histogram.time():
+            pass
+
+        counts, total = histogram.labels().get()
+        assert sum(counts) == 1
+        assert total >= 0
+
+    def test_gauge_function_and_label_escaping(self):
+        registry = Registry()
+        registry.gauge("test_clients", "Connected clients", lambda: 3)
+        registry.counter("test_total", "Test", ["path"]).labels('a"b\\c').inc()
+
+        text = registry.render()
+
+        assert "test_clients 3" in text
+        assert 'test_total{path="a\\"b\\\\c"} 1' in text
+
+    def test_labels_must_match(self):
+        counter = Registry().counter("test_total", "Test", ["source"])
+
+        with pytest.raises(ValueError):
+            counter.labels("mqtt", "extra")
+
+    def test_register_reuses_same_kind(self):
+        registry = Registry()
+        counter = registry.counter("test_total", "Test")
+
+        assert registry.counter("test_total", "Test") is counter
+        with pytest.raises(ValueError):
+            registry.gauge("test_total", "Test")
+
+
+class TestTimedLock:
+    def test_records_each_acquisition(self):
+        histogram = Registry().histogram("test_wait_seconds", "Lock wait").labels()
+        lock = TimedLock(histogram)
+
+        with lock:
+            assert lock.locked()
+            assert not lock.acquire(blocking=False)
+
+        counts, _ = histogram.get()
+        assert sum(counts) == 1
+        assert not lock.locked()
@@ -1,5 +1,5 @@
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 
 import pytest
 
@@ -39,6 +39,23 @@ class TestSensorReading:
         assert reading.value == 25.0
         assert isinstance(reading.timestamp, datetime)
 
+    def test_from_dict_normalises_timestamps(self):
+        naive = SensorReading.from_dict(
+            {"value": 1.0, "timestamp": "2024-01-01T12:00:00"}
+        )
+        utc = SensorReading.from_dict(
+            {"value": 1.0, "timestamp": "2024-01-01T12:00:00+00:00"}
+        )
+        zulu = SensorReading.from_dict(
+            {"value": 1.0, "timestamp": "2024-01-01T12:00:00Z"}
+        )
+
+        assert naive.timestamp.tzinfo is None and utc.timestamp.tzinfo is None
+        assert utc.timestamp == zulu.timestamp
+        assert utc.timestamp == datetime(
+            2024, 1, 1, 12, 0, tzinfo=timezone.utc
+        ).astimezone().replace(tzinfo=None)
+
     def test_from_mqtt_payload_invalid_json(self):
         topic = "sensors/temp_01/temperature"
         payload = "invalid json"
@@ -69,6 +86,18 @@ class TestSensorReading:
         assert result["value"] == 23.5
         assert result["timestamp"] == "2024-01-01T12:00:00"
 
+    def test_from_dict_without_topic(self):
+        reading = SensorReading.from_dict(
+            {"sensor_id": "temp_01", "type": "temperature", "value": "21.5"}
+        )
+
+        assert reading.sensor_id == "temp_01"
+        assert reading.value == 21.5
+
+    def test_from_dict_invalid_value(self):
+        with pytest.raises(ValueError, match="Invalid sensor data format"):
+            SensorReading.from_dict({"sensor_id": "temp_01", "value": "warm"})
+
 
 class TestSensorStats:
     def test_to_dict(self):
@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock, call, patch
+from unittest.mock import ANY, MagicMock, call, patch
 
 import pytest
 
@@ -84,7 +84,7 @@ class TestMQTTClient:
         client._on_message(None, None, mock_msg)
 
         mock_process_task.delay.assert_called_once_with(
-            "sensors/temp_01/temperature", '{"value": 23.5}'
+            "sensors/temp_01/temperature", '{"value": 23.5}', received_at=ANY
         )
 
     @patch("src.dashboard.mqtt_client.mqtt.Client")
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from src.dashboard.profiler import SamplingProfiler
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    def test_samples_busy_thread_in_folded_format(self):
+        profiler = SamplingProfiler()
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,), name="busy")
+        worker.start()
+        try:
+            profiler.start(interval=0.002)
+            time.sleep(0.3)
+            profiler.stop()
+        finally:
+            stop.set()
+            worker.join()
+
+        lines = profiler.folded().splitlines()
+        busy = [line for line in lines if "busy_loop" in line]
+        assert busy
+        stack, count = busy[0].rsplit(" ", 1)
+        assert stack.startswith("busy;")
+        assert int(count) > 0
+        assert profiler.status()["samples"] > 0
+        assert not profiler.status()["running"]
+
+    def test_cpu_mode_skips_idle_threads(self):
+        profiler = SamplingProfiler()
+        stop = threading.Event()
+        idle = threading.Thread(target=stop.wait, name="idle")
+        idle.start()
+        try:
+            profiler.start(interval=0.002)
+            time.sleep(0.1)
+            profiler.stop()
+        finally:
+            stop.set()
+            idle.join()
+
+        assert "idle;" not in profiler.folded()
+
+    def test_stops_after_duration(self):
+        profiler = SamplingProfiler()
+
+        profiler.start(interval=0.001, duration=0.02)
+        time.sleep(0.2)
+
+        assert not profiler.running
+
+    def test_rejects_second_start_and_bad_options(self):
+        profiler = SamplingProfiler()
+        with pytest.raises(ValueError):
+            profiler.start(interval=0)
+        with pytest.raises(ValueError):
+            profiler.start(mode="memory")
+
+        profiler.start(interval=0.01)
+        try:
+            with pytest.raises(RuntimeError):
+                profiler.start()
+        finally:
+            profiler.stop()
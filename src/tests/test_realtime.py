@@ -0,0 +1,309 @@
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+import socketio as python_socketio
+
+from src.dashboard import create_app, init_emitter, message_queue_options, socketio
+from src.dashboard.realtime import (
+    INGEST_KEY,
+    deliver_update,
+    emit_sensor_update,
+    fanout,
+    queue_manager,
+    seed_freshness,
+    update_stream,
+)
+from src.dashboard.stream import UpdateStream
+
+
+@pytest.fixture
+def restore_socketio():
+    """Re-initialize the shared SocketIO instance without a message queue."""
+    yield
+    create_app()
+
+
+class TestMessageQueue:
+    def test_options_without_queue_restore_default_manager(self):
+        options = message_queue_options(None)
+
+        assert options == {"message_queue": None, "client_manager": None}
+
+    def test_create_app_without_queue(self, app):
+        manager = socketio.server.manager
+
+        assert not isinstance(manager, python_socketio.PubSubManager)
+
+    @patch.dict("os.environ", {"SOCKETIO_MESSAGE_QUEUE": "memory://"})
+    def test_create_app_with_local_queue(self, restore_socketio):
+        create_app()
+
+        manager = socketio.server.manager
+        assert isinstance(manager, python_socketio.KombuManager)
+        assert manager.channel == "iot-dashboard"
+
+    def test_init_emitter_requires_queue(self, restore_socketio):
+        with patch.dict("os.environ", {}, clear=True):
+            with pytest.raises(ValueError):
+                init_emitter()
+
+    def test_emitter_publishes_once_to_queue(self, restore_socketio):
+        init_emitter("memory://", channel="test-fanout")
+        assert socketio.server.manager.write_only is True
+
+        listener = python_socketio.KombuManager(
+            "memory://", channel="test-fanout", write_only=True
+        )
+        messages = listener._listen()
+        received = []
+        thread = threading.Thread(
+            target=lambda: received.append(next(messages)), daemon=True
+        )
+        thread.start()
+        thread.join(0.5)
+
+        emit_sensor_update({"sensor_id": "temp_01", "value": 23.5})
+        thread.join(5)
+
+        assert len(received) == 1
+        message = json.loads(received[0])
+        assert message["event"] == "sensor_update"
+        assert message["data"][0]["sensor_id"] == "temp_01"
+        assert message["data"][0]["value"] == 23.5
+
+
+class TestUpdateStream:
+    def test_publish_assigns_per_sensor_sequence(self):
+        stream = UpdateStream()
+
+        first = stream.publish({"sensor_id": "temp_01", "value": 1.0})
+        second = stream.publish({"sensor_id": "temp_01", "value": 2.0})
+        other = stream.publish({"sensor_id": "hum_01", "value": 50.0})
+
+        assert (first["seq"], second["seq"], other["seq"]) == (1, 2, 1)
+
+    def test_resume_replays_only_missed_updates(self):
+        stream = UpdateStream()
+        for value in range(5):
+            stream.publish({"sensor_id": "temp_01", "value": value})
+
+        updates, stale, seq = stream.resume({"temp_01": 3})
+
+        assert [u["value"] for u in updates] == [3, 4]
+        assert stale == []
+        assert seq == {"temp_01": 5}
+
+    def test_resume_up_to_date_client_gets_nothing(self):
+        stream = UpdateStream()
+        stream.publish({"sensor_id": "temp_01", "value": 1.0})
+
+        updates, stale, _ = stream.resume({"temp_01": 1})
+
+        assert updates == [] and stale == []
+
+    def test_resume_falls_back_to_snapshot_when_too_far_behind(self):
+        stream = UpdateStream(buffer_size=3)
+        for value in range(10):
+            stream.publish({"sensor_id": "temp_01", "value": value})
+
+        updates, stale, _ = stream.resume({"temp_01": 2})
+
+        assert updates == []
+        assert stale == ["temp_01"]
+        assert stream.latest("temp_01")["value"] == 9
+
+    def test_resume_snapshots_sensors_unknown_to_client(self):
+        stream = UpdateStream()
+        stream.publish({"sensor_id": "temp_01", "value": 1.0})
+
+        updates, stale, _ = stream.resume({}, sensor_ids=["hum_01"])
+
+        assert updates == []
+        assert sorted(stale) == ["hum_01", "temp_01"]
+
+
+class TestConnectSync:
+    @patch("src.dashboard.tasks.get_all_sensor_stats")
+    def test_fresh_connect_receives_snapshot(self, mock_stats, app):
+        mock_stats.return_value = [{"sensor_id": "temp_01", "avg_value": 22.5}]
+
+        client = socketio.test_client(app)
+        received = {r["name"]: r["args"][0] for r in client.get_received()}
+
+        sync = received["sensor_sync"]
+        assert sync["epoch"] == update_stream.epoch
+        assert sync["updates"] == []
+        assert sync["snapshot"][0]["stats"]["avg_value"] == 22.5
+        assert sync["truncated"] is False
+
+    @patch("src.dashboard.tasks.get_all_sensor_stats")
+    def test_reconnect_receives_only_missed_updates(self, mock_stats, app):
+        mock_stats.return_value = []
+        seen = update_stream.publish({"sensor_id": "resume_01", "value": 1.0})
+        update_stream.publish({"sensor_id": "resume_01", "value": 2.0})
+
+        auth = {
+            "epoch": update_stream.epoch,
+            "last_seq": {"resume_01": seen["seq"]},
+        }
+        client = socketio.test_client(app, auth=auth)
+        received = {r["name"]: r["args"][0] for r in client.get_received()}
+
+        sync = received["sensor_sync"]
+        assert [
+            u["value"] for u in sync["updates"] if u["sensor_id"] == "resume_01"
+        ] == [2.0]
+        assert "resume_01" not in [e["sensor_id"] for e in sync["snapshot"]]
+        assert sync["truncated"] is False
+
+    @patch("src.dashboard.tasks.get_all_sensor_stats")
+    def test_reconnect_past_buffer_is_truncated(self, mock_stats, app):
+        mock_stats.return_value = []
+        for value in range(update_stream.buffer_size + 2):
+            update_stream.publish({"sensor_id": "gap_01", "value": value})
+
+        auth = {"epoch": update_stream.epoch, "last_seq": {"gap_01": 1}}
+        client = socketio.test_client(app, auth=auth)
+        received = {r["name"]: r["args"][0] for r in client.get_received()}
+
+        sync = received["sensor_sync"]
+        assert "gap_01" in [e["sensor_id"] for e in sync["snapshot"]]
+        assert sync["truncated"] is True
+
+    @patch("src.dashboard.tasks.get_all_sensor_stats")
+    def test_reconnect_from_other_epoch_is_truncated(self, mock_stats, app):
+        mock_stats.return_value = []
+        auth = {"epoch": "restarted", "last_seq": {"temp_01": 3}}
+        client = socketio.test_client(app, auth=auth)
+        received = {r["name"]: r["args"][0] for r in client.get_received()}
+
+        assert received["sensor_sync"]["truncated"] is True
+
+
+class TestFanoutRouting:
+    @patch("src.dashboard.realtime.deliver_update")
+    def test_queued_sensor_updates_go_through_fanout(self, mock_deliver):
+        manager = queue_manager("memory://", "test-routing")
+
+        manager._handle_emit(
+            {"event": "sensor_update", "data": [{"sensor_id": "temp_01"}]}
+        )
+
+        mock_deliver.assert_called_once_with({"sensor_id": "temp_01"})
+
+    def test_queued_ingest_timings_are_recorded_not_delivered(self, freshness):
+        manager = queue_manager("memory://", "test-routing")
+        update = {
+            "sensor_id": "queued_01",
+            "value": 1.0,
+            "timestamp": "2024-01-01T12:00:00",
+            INGEST_KEY: {
+                "received_at": 100.0,
+                "started_at": 101.0,
+                "emitted_at": 102.0,
+            },
+        }
+
+        manager._handle_emit({"event": "sensor_update", "data": [update]})
+
+        assert freshness.sensors["queued_01"]["received_at"] == 100.0
+        assert freshness.lag_percentiles()["queue"]["p50"] == 1.0
+        assert INGEST_KEY not in update_stream.latest("queued_01")
+
+    def test_freshness_seeded_from_stats(self, freshness):
+        seed_freshness(
+            [
+                {"sensor_id": "temp_01", "last_reading": "2024-01-01T12:00:00"},
+                {"sensor_id": "broken", "last_reading": None},
+            ]
+        )
+
+        (row,) = freshness.report()
+        assert row["sensor_id"] == "temp_01"
+        assert row["device_time"] == "2024-01-01T12:00:00"
+        assert row["stale"] is True
+
+    @patch("src.dashboard.realtime.deliver_update")
+    def test_write_only_manager_does_not_deliver(self, mock_deliver):
+        manager = queue_manager("memory://", "test-routing", write_only=True)
+
+        manager._handle_emit(
+            {"event": "sensor_update", "data": [{"sensor_id": "temp_01"}]}
+        )
+
+        mock_deliver.assert_not_called()
+
+    @patch("src.dashboard.tasks.get_all_sensor_stats")
+    def test_connected_client_gets_its_own_queue(self, mock_stats, app):
+        mock_stats.return_value = []
+
+        client = socketio.test_client(app)
+        sid = socketio.server.manager.sid_from_eio_sid(client.eio_sid, "/")
+        assert sid in fanout.clients
+
+        client.disconnect()
+        assert sid not in fanout.clients
+
+    def test_realtime_clients_endpoint(self, client):
+        response = client.get("/api/realtime/clients")
+
+        assert response.status_code == 200
+        assert "queued_bytes" in response.get_json()
+
+
+class TestBulkData:
+    @patch("src.dashboard.tasks.get_all_sensor_stats")
+    def test_request_bulk_data(self, mock_stats, app, file_storage):
+        mock_stats.return_value = []
+        file_storage.store_reading(
+            "temp_01", {"value": 1.0, "timestamp": "2024-01-01T12:00:00"}
+        )
+        client = socketio.test_client(app)
+        client.get_received()
+
+        client.emit(
+            "request_bulk_data",
+            {"sensor_ids": ["temp_01"], "start": "2024-01-01T00:00:00"},
+        )
+        received = {r["name"]: r["args"][0] for r in client.get_received()}
+
+        assert received["bulk_history"]["sensors"]["temp_01"]["values"] == [1.0]
+
+    @patch("src.dashboard.tasks.get_all_sensor_stats")
+    def test_request_bulk_data_invalid(self, mock_stats, app):
+        mock_stats.return_value = []
+        client = socketio.test_client(app)
+        client.get_received()
+
+        client.emit("request_bulk_data", {})
+        received = {r["name"]: r["args"][0] for r in client.get_received()}
+
+        assert "error" in received
+
+
+class TestGroupViews:
+    @patch("src.dashboard.tasks.get_all_sensor_stats")
+    def test_request_group_views(self, mock_stats, app, group_views):
+        mock_stats.return_value = []
+        client = socketio.test_client(app)
+        client.get_received()
+        deliver_update(
+            {
+                "sensor_id": "temp_01",
+                "sensor_type": "temperature",
+                "location": "Kitchen",
+                "value": 21.0,
+                "timestamp": "2024-01-01T12:00:00",
+            }
+        )
+
+        client.emit("request_group_views", {"view_id": "by_type"})
+        received = {r["name"]: r["args"][0] for r in client.get_received()}
+        views = received["group_views"]["views"]
+        assert views["by_type"]["groups"]["temperature"]["avg"] == 21.0
+
+        client.emit("request_group_views", {"view_id": "missing"})
+        received = {r["name"]: r["args"][0] for r in client.get_received()}
+        assert "error" in received
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from src.dashboard.anomaly import AnomalyDetector
+from src.dashboard.file_storage import FileStorage
+from src.dashboard.recovery import Recovery, decode_snapshot, encode_snapshot
+
+
+def _readings(start, n, step=timedelta(minutes=10), seed=1):
+    rng = np.random.default_rng(seed)
+    return [(start + i * step, float(20.0 + rng.normal(0, 0.5))) for i in range(n)]
+
+
+def _store(storage, readings, detector=None):
+    storage.store_readings(
+        [
+            ("temp_01", {"timestamp": at.isoformat(), "value": value})
+            for at, value in readings
+        ]
+    )
+    if detector is not None:
+        for at, value in readings:
+            detector.score("temp_01", at, value)
+
+
+class TestSnapshot:
+    def test_round_trip(self):
+        state = {"anomaly": {"temp_01": {"count": 3}}, "written_at": "t"}
+        assert decode_snapshot(encode_snapshot(state)) == state
+
+    @pytest.mark.parametrize("damage", [lambda d: d[:3], lambda d: d[:-1] + b"x"])
+    def test_corrupt_snapshots_are_rejected(self, damage):
+        with pytest.raises(ValueError):
+            decode_snapshot(damage(encode_snapshot({"anomaly": {}})))
+
+    def test_corrupt_file_is_ignored(self, tmp_path):
+        path = tmp_path / "recovery.snapshot"
+        path.write_bytes(b"IOTS garbage")
+
+        assert Recovery(str(path)).saved == {}
+
+
+class TestRecovery:
+    def test_restore_replays_only_newer_readings(self, tmp_path):
+        storage = FileStorage(str(tmp_path / "data"))
+        live = AnomalyDetector()
+        readings = _readings(datetime(2024, 1, 1), 50)
+        _store(storage, readings[:40], live)
+
+        path = str(tmp_path / "recovery.snapshot")
+        Recovery(path).write(storage, live)
+        # Stored after the snapshot, before the restart
+        _store(storage, readings[40:], live)
+
+        restarted = AnomalyDetector()
+        summary = Recovery(path).restore(storage, restarted)
+
+        assert summary["snapshot"] is True
+        assert summary["models"] == 1
+        assert summary["replayed"] == 10
+        assert restarted.to_dict() == live.to_dict()
+
+    def test_cold_restore_warms_from_newest_readings(self, tmp_path):
+        storage = FileStorage(str(tmp_path / "data"))
+        _store(storage, _readings(datetime(2024, 1, 1), 50))
+
+        detector = AnomalyDetector()
+        recovery = Recovery(str(tmp_path / "missing.snapshot"), max_replay=20)
+        summary = recovery.restore(storage, detector)
+
+        assert summary["snapshot"] is False
+        assert summary["replayed"] == 20
+        assert detector.models["temp_01"].count == 20
+
+    def test_snapshot_thread_writes_on_stop(self, tmp_path):
+        storage = FileStorage(str(tmp_path / "data"))
+        detector = AnomalyDetector()
+        _store(storage, _readings(datetime(2024, 1, 1), 5), detector)
+        recovery = Recovery(str(tmp_path / "recovery.snapshot"), interval=3600)
+
+        recovery.start(storage, detector)
+        recovery.stop()
+
+        saved = Recovery(recovery.path).saved
+        assert saved["anomaly"]["temp_01"]["count"] == 5
+        assert saved["storage"]["newest"] == {"temp_01": "2024-01-01T00:40:00"}
+
+
+class TestStorageIndex:
+    def test_matching_index_skips_readings_scan(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        _store(storage, _readings(datetime(2024, 1, 1), 5))
+        index = storage.index()
+
+        with patch.object(FileStorage, "_load_watermarks") as mock_load:
+            restarted = FileStorage(str(tmp_path), index=index)
+
+        mock_load.assert_not_called()
+        assert restarted.newest == storage.newest
+
+    def test_stale_index_is_ignored(self, tmp_path):
+        storage = FileStorage(str(tmp_path))
+        _store(storage, _readings(datetime(2024, 1, 1), 5))
+        index = storage.index()
+        _store(storage, _readings(datetime(2024, 1, 2), 1))
+
+        restarted = FileStorage(str(tmp_path), index=index)
+
+        assert restarted.newest["temp_01"] == datetime(2024, 1, 2)
@@ -0,0 +1,46 @@
+from src.dashboard.registry import SensorRegistry
+
+
+class TestSensorRegistry:
+    def test_register_reports_changes(self):
+        registry = SensorRegistry()
+
+        assert registry.register("t1", {"sensor_type": "temperature"})
+        assert not registry.register("t1", {"sensor_type": "temperature"})
+        assert registry.register("t1", {"unit": "°C"})
+        assert registry.get("t1")["sensor_type"] == "temperature"
+
+    def test_metadata_and_strings_are_shared(self):
+        registry = SensorRegistry()
+        location = "".join(["Kit", "chen"])
+        registry.register("t1", {"location": "Kitchen", "metadata": {"model": "X1"}})
+        registry.register("t2", {"location": location, "metadata": {"model": "X1"}})
+
+        t1, t2 = registry.get("t1"), registry.get("t2")
+        assert t1["metadata"] is t2["metadata"]
+        assert t1["location"] is t2["location"]
+
+    def test_select_intersects_indexes(self):
+        registry = SensorRegistry()
+        registry.register(
+            "t1", {"sensor_type": "temperature", "location": "Kitchen", "tags": ["a"]}
+        )
+        registry.register("t2", {"sensor_type": "temperature", "location": "Attic"})
+        registry.register("h1", {"sensor_type": "humidity", "location": "Kitchen"})
+
+        assert registry.select(sensor_type="temperature") == {"t1", "t2"}
+        assert registry.select(sensor_type="temperature", location="Kitchen") == {"t1"}
+        assert registry.select(tag="a") == {"t1"}
+        assert registry.select(["t2", "h1"], location="Kitchen") == {"h1"}
+        assert registry.select(location="Garage") == set()
+
+    def test_round_trip(self):
+        registry = SensorRegistry()
+        registry.register("t1", {"location": "Kitchen", "tags": ["b", "a"]})
+
+        restored = SensorRegistry()
+        restored.load(registry.to_dict())
+
+        assert restored.describe("t1") == registry.describe("t1")
+        assert restored.describe("t1")["tags"] == ["a", "b"]
+        assert restored.groups("tag") == {"a": {"t1"}, "b": {"t1"}}
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from sensor_simulator import LoadGenerator, LoadProfile
+
+START = datetime(2024, 1, 1)
+
+
+def _ticks(profile, count, worker=0, workers=1):
+    generator = LoadGenerator(profile, worker, workers)
+    return [generator.next_tick() for _ in range(count)]
+
+
+class TestLoadGenerator:
+    def test_same_seed_same_messages(self):
+        profile = LoadProfile(sensors=50, rate=5, seed=7, start_time=START)
+
+        assert _ticks(profile, 10) == _ticks(profile, 10)
+        other = LoadProfile(sensors=50, rate=5, seed=8, start_time=START)
+        assert _ticks(profile, 10) != _ticks(other, 10)
+
+    def test_rate_and_payloads(self):
+        profile = LoadProfile(sensors=100, rate=4, tick=0.25, start_time=START)
+
+        messages = [m for tick in _ticks(profile, 8) for m in tick]
+
+        assert len(messages) == 100 * 4 * 2
+        topic, payload = messages[0]
+        data = json.loads(payload)
+        assert topic == f"sensors/{data['sensor_id']}/{data['type']}"
+        assert datetime.fromisoformat(data["timestamp"]) >= START
+        assert isinstance(data["value"], float)
+
+    def test_workers_split_sensors(self):
+        profile = LoadProfile(sensors=10, rate=1, tick=1.0, start_time=START)
+
+        ids = [
+            {json.loads(p)["sensor_id"] for _, p in _ticks(profile, 1, w, 3)[0]}
+            for w in range(3)
+        ]
+
+        assert sum(len(i) for i in ids) == 10
+        assert not ids[0] & ids[1] and not ids[1] & ids[2]
+
+    def test_bursts_multiply_rate(self):
+        profile = LoadProfile(
+            sensors=10,
+            rate=2,
+            tick=1.0,
+            burst_every=4,
+            burst_length=1,
+            burst_factor=5,
+            start_time=START,
+        )
+
+        counts = [len(tick) for tick in _ticks(profile, 9)]
+
+        assert counts[4] == counts[8] == 100
+        assert counts[1:4] == counts[5:8] == [20, 20, 20]
+
+    def test_out_of_order_and_duplicates(self):
+        profile = LoadProfile(
+            sensors=200,
+            rate=10,
+            tick=1.0,
+            out_of_order=0.1,
+            duplicates=0.1,
+            max_delay=60,
+            start_time=START,
+        )
+
+        messages = _ticks(profile, 3)[2]
+        stamps = [json.loads(p)["timestamp"] for _, p in messages]
+        late = sum(
+            1
+            for s in stamps
+            if datetime.fromisoformat(s) < datetime(2024, 1, 1, 0, 0, 2)
+        )
+        duplicated = len(messages) - len(set(messages))
+
+        assert 2000 < len(messages) < 2400
+        assert 100 < late < 300
+        assert 100 < duplicated < 300
+
+    def test_invalid_profile(self):
+        with pytest.raises(ValueError, match="Unknown value model"):
+            LoadProfile(model="square")
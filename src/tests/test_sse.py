@@ -0,0 +1,53 @@
+import json
+
+from src.dashboard.sse import SSEHub, Subscription, format_event
+
+
+class TestSSEHub:
+    def test_format_event(self):
+        frame = format_event({"sensor_id": "temp_01", "seq": 3, "value": 1.5})
+
+        lines = frame.decode().split("\n")
+        assert lines[0] == "id: temp_01:3"
+        assert lines[1] == "event: sensor_update"
+        assert json.loads(lines[2][len("data: ") :])["value"] == 1.5
+        assert frame.endswith(b"\n\n")
+
+    def test_publish_filters_by_sensor_and_type(self):
+        hub = SSEHub()
+        by_id = hub.subscribe(sensor_ids=["temp_01"])
+        by_type = hub.subscribe(types=["humidity"])
+        everything = hub.subscribe()
+
+        hub.publish({"sensor_id": "temp_01", "sensor_type": "temperature"})
+        hub.publish({"sensor_id": "hum_01", "sensor_type": "humidity"})
+
+        assert by_id.frames.qsize() == 1
+        assert by_type.frames.qsize() == 1
+        assert everything.frames.qsize() == 2
+
+    def test_subscribers_share_one_encoded_frame(self):
+        hub = SSEHub()
+        first, second = hub.subscribe(), hub.subscribe()
+
+        hub.publish({"sensor_id": "temp_01"}, encoded='{"sensor_id": "temp_01"}')
+
+        assert first.get(timeout=0) is second.get(timeout=0)
+
+    def test_lagging_subscriber_drops_oldest_frames(self):
+        subscription = Subscription(max_queue=2)
+
+        for frame in [b"1", b"2", b"3"]:
+            subscription.put(frame)
+
+        assert subscription.dropped == 1
+        assert subscription.get(timeout=0) == b"2"
+
+    def test_unsubscribe_stops_delivery(self):
+        hub = SSEHub()
+        subscription = hub.subscribe()
+        hub.unsubscribe(subscription)
+
+        hub.publish({"sensor_id": "temp_01"})
+
+        assert subscription.get(timeout=0) is None
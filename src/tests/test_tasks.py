@@ -1,12 +1,17 @@
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
 
+from src.dashboard.file_storage import parse_timestamp
 from src.dashboard.models import SensorReading
 from src.dashboard.tasks import (
+    get_alerts,
+    parse_reading_batch,
+    process_sensor_batch,
     process_sensor_data,
+    save_alert_rule,
     store_raw_reading,
     update_sensor_statistics,
 )
@@ -113,3 +118,179 @@ class TestTasks:
         stored_data = json.loads(mock_redis.setex.call_args[0][2])
         assert stored_data["max_value"] == 26.0
         assert stored_data["count"] == 3
+
+    def test_parse_reading_batch_reports_invalid_items(self):
+        """Invalid items are reported by index; valid ones still parse."""
+        readings, errors = parse_reading_batch(
+            [
+                {"sensor_id": "temp_01", "value": 21.0},
+                "not an object",
+                {"value": 3.0},
+                {"sensor_id": "temp_02", "value": "warm"},
+            ]
+        )
+
+        assert [r.sensor_id for r in readings] == ["temp_01"]
+        assert [e["index"] for e in errors] == [1, 2, 3]
+
+    @patch("src.dashboard.tasks.emit_sensor_update")
+    def test_process_sensor_batch_single_write(
+        self, mock_emit, mock_redis, file_storage
+    ):
+        """A batch is stored with one write per storage file."""
+        items = [
+            {
+                "sensor_id": f"temp_0{i % 2}",
+                "type": "temperature",
+                "value": 20.0 + i,
+                "timestamp": f"2024-01-01T12:00:0{i}",
+            }
+            for i in range(4)
+        ] + [{"sensor_id": "temp_09"}]
+
+        with patch.object(
+            file_storage, "_write_file", wraps=file_storage._write_file
+        ) as mock_write:
+            report = process_sensor_batch(items)
+            # New sensors are registered once; known ones cost no registry
+            # write. Rollups are appended per sensor, not rewritten.
+            assert mock_write.call_count == 3
+            mock_write.reset_mock()
+            process_sensor_batch(items[:4])
+            assert mock_write.call_count == 2
+
+        assert report["accepted"] == 4
+        assert report["rejected"] == 1
+        assert report["errors"][0]["index"] == 4
+        assert mock_emit.call_count == 8
+        assert file_storage.get_stats("temp_00")["count"] == 4
+        assert len(file_storage.get_readings("temp_01", hours=10**6)) == 4
+
+    @patch("src.dashboard.tasks.emit_sensor_anomaly")
+    @patch("src.dashboard.tasks.emit_sensor_update")
+    def test_process_sensor_data_flags_anomaly(
+        self, mock_emit, mock_anomaly, mock_redis, file_storage, anomaly_detector
+    ):
+        """An outlier is stored and emitted with its anomaly flag."""
+        anomaly_detector.warmup = 5
+        for i, value in enumerate([20.0, 20.4, 19.8, 20.1, 19.9, 20.2, 80.0]):
+            payload = json.dumps(
+                {
+                    "sensor_id": "temp_01",
+                    "value": value,
+                    "timestamp": f"2024-01-01T12:0{i}:00",
+                }
+            )
+            process_sensor_data("sensors/temp_01/temperature", payload)
+
+        mock_anomaly.assert_called_once()
+        event = mock_anomaly.call_args[0][0]
+        assert event["sensor_id"] == "temp_01"
+        assert event["value"] == 80.0
+        assert event["score"] > 4
+
+        assert "anomaly" in mock_emit.call_args[0][0]
+        stored = file_storage.get_readings("temp_01", hours=10**6)
+        assert [r["value"] for r in stored if "anomaly" in r] == [80.0]
+
+    @patch("src.dashboard.tasks.emit_sensor_alert")
+    @patch("src.dashboard.tasks.emit_sensor_update")
+    def test_process_sensor_data_evaluates_alert_rules(
+        self, mock_emit, mock_alert, mock_redis
+    ):
+        """Rules saved through the API are evaluated on ingest."""
+        save_alert_rule(
+            {"id": "hot", "kind": "threshold", "type": "temperature", "threshold": 30}
+        )
+
+        for value in [25.0, 31.0, 32.0]:
+            payload = json.dumps({"sensor_id": "temp_01", "value": value})
+            process_sensor_data("sensors/temp_01/temperature", payload)
+        payload = json.dumps({"sensor_id": "hum_01", "value": 99.0})
+        process_sensor_data("sensors/hum_01/humidity", payload)
+
+        mock_alert.assert_called_once()
+        alert = mock_alert.call_args[0][0]
+        assert alert["rule_id"] == "hot"
+        assert alert["sensor_id"] == "temp_01"
+        assert alert["value"] == 31.0
+        assert get_alerts()["recent"] == [alert]
+
+    def test_absence_rule_fires_for_sensor_quiet_before_it(
+        self, file_storage, alert_engine
+    ):
+        """Sensors that stopped before a rule was set still get a deadline."""
+        quiet = {"sensor_id": "temp_01", "sensor_type": "temperature", "value": 1.0}
+        quiet["timestamp"] = (datetime.now() - timedelta(minutes=10)).isoformat()
+        file_storage.store_reading("temp_01", dict(quiet))
+        file_storage.update_stats("temp_01", quiet)
+
+        save_alert_rule({"id": "quiet", "kind": "absence", "duration": 300})
+
+        alerts = alert_engine.check_absence()
+        assert [(a["sensor_id"], a["state"]) for a in alerts] == [("temp_01", "firing")]
+
+    @patch("src.dashboard.tasks.emit_sensor_alert")
+    @patch("src.dashboard.tasks.emit_sensor_update")
+    def test_mixed_timestamp_forms_keep_scoring(
+        self, mock_emit, mock_alert, mock_redis, file_storage, anomaly_detector
+    ):
+        """Naive and offset timestamps from one sensor share one clock."""
+        file_storage.lateness = timedelta(days=2)  # whatever the local offset
+        save_alert_rule(
+            {"id": "hot", "kind": "threshold", "sensor_id": "temp_01", "threshold": 30}
+        )
+        timestamps = [
+            "2024-01-01T12:00:00",
+            "2024-01-01T12:01:00+00:00",
+            "2024-01-01T12:02:00",
+            "2024-01-01T12:03:00Z",
+        ]
+        results = [
+            process_sensor_data(
+                "sensors/temp_01/temperature",
+                json.dumps({"sensor_id": "temp_01", "value": 31.0, "timestamp": at}),
+            )
+            for at in timestamps
+        ]
+
+        assert [r["status"] for r in results] == ["success"] * 4
+        assert anomaly_detector.models["temp_01"].count == 4
+        assert anomaly_detector.models["temp_01"].last == parse_timestamp(
+            "2024-01-01T12:03:00Z"
+        )
+        mock_alert.assert_called_once()
+
+    @patch("src.dashboard.tasks.emit_sensor_update")
+    def test_late_readings_take_correction_path(
+        self, mock_emit, mock_redis, file_storage, anomaly_detector
+    ):
+        """Readings behind the watermark update history but not live state."""
+        file_storage.lateness = timedelta(minutes=5)
+        items = [
+            {"sensor_id": "temp_01", "value": 20.0, "timestamp": "2024-01-01T12:10:00"},
+            {"sensor_id": "temp_01", "value": 21.0, "timestamp": "2024-01-01T12:08:00"},
+            {"sensor_id": "temp_01", "value": 40.0, "timestamp": "2024-01-01T12:00:30"},
+        ]
+
+        report = process_sensor_batch(items)
+        payload = json.dumps(
+            {"sensor_id": "temp_01", "value": 30.0, "timestamp": "2024-01-01T11:00:00"}
+        )
+        result = process_sensor_data("sensors/temp_01/temperature", payload)
+
+        assert report["accepted"] == 3
+        assert report["late"] == 1
+        assert result["status"] == "late"
+        assert mock_emit.call_count == 2
+        assert anomaly_detector.models["temp_01"].count == 2
+
+        stored = file_storage.get_readings("temp_01", hours=10**6)
+        assert [r["value"] for r in stored] == [30.0, 40.0, 21.0, 20.0]
+        stats = file_storage.get_stats("temp_01")
+        assert stats["count"] == 4
+        assert stats["max_value"] == 40.0
+        assert stats["last_reading"] == "2024-01-01T12:10:00"
+        rollup = file_storage.get_rollups("temp_01")[1]
+        assert rollup[0] == datetime(2024, 1, 1, 12, 0)
+        assert rollup[1:] == (1, 40.0, 40.0, 40.0)
@@ -0,0 +1,75 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.dashboard.logs import HotEvents
+from src.dashboard.metrics import Registry
+from src.dashboard.tracing import Tracer, annotate, logger, parse_sample_rate, span
+
+
+class TestTracer:
+    def test_sampled_trace_records_nested_spans(self):
+        tracer = Tracer(sample_rate=1.0)
+        histogram = Registry().histogram("test_seconds", "Test").labels()
+
+        with tracer.trace("message", source="mqtt") as trace:
+            assert trace is not None
+            with span("store", histogram):
+                with span("storage.write"):
+                    pass
+            annotate(sensor_id="temp_01")
+
+        (recorded,) = tracer.recent()
+        assert recorded["name"] == "message"
+        assert recorded["attributes"] == {"source": "mqtt", "sensor_id": "temp_01"}
+        assert [(s["name"], s["depth"]) for s in recorded["spans"]] == [
+            ("store", 0),
+            ("storage.write", 1),
+        ]
+        assert sum(histogram.get()[0]) == 1
+
+    def test_unsampled_messages_only_feed_histograms(self):
+        tracer = Tracer(sample_rate=0.0)
+        histogram = Registry().histogram("test_seconds", "Test").labels()
+
+        with tracer.trace("message") as trace:
+            assert trace is None
+            with span("store", histogram):
+                annotate(sensor_id="temp_01")
+
+        assert tracer.recent() == []
+        assert sum(histogram.get()[0]) == 1
+
+    def test_recent_is_bounded_and_newest_first(self):
+        tracer = Tracer(sample_rate=1.0, capacity=3)
+
+        for i in range(5):
+            with tracer.trace("message", index=i):
+                pass
+
+        assert [t["attributes"]["index"] for t in tracer.recent()] == [4, 3, 2]
+        assert len(tracer.recent(limit=1)) == 1
+
+    @patch("src.dashboard.logs.time.monotonic", return_value=100.0)
+    def test_traces_are_logged_through_rate_limited_event(self, _, caplog):
+        tracer = Tracer(sample_rate=1.0)
+        event = HotEvents(rate_limit=2).event("tracing.trace", logger)
+
+        with patch("src.dashboard.tracing.LOG_TRACE", event), caplog.at_level("INFO"):
+            for i in range(5):
+                with tracer.trace("message", index=i):
+                    pass
+
+        logged = [r for r in caplog.records if r.name == logger.name]
+        assert len(logged) == 2
+        assert json.loads(logged[0].getMessage()[len("Trace ") :])["name"] == (
+            "message"
+        )
+        assert len(tracer.recent()) == 5
+
+    def test_parse_sample_rate(self):
+        assert parse_sample_rate("0.25") == 0.25
+        for value in (-0.1, 1.5, "nan"):
+            with pytest.raises(ValueError):
+                parse_sample_rate(value)
@@ -1,8 +1,13 @@
+import gzip
 import json
+import time
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
 
 import pytest
 
+from src.dashboard.snapshots import SnapshotCache
+
 
 class TestViews:
     def test_dashboard_view(self, client):
@@ -34,6 +39,102 @@ class TestViews:
         assert len(data["sensors"]) == 1
         assert data["sensors"][0]["sensor_id"] == "temp_01"
 
+    @patch("src.dashboard.views.get_stats_version")
+    @patch("src.dashboard.views.get_all_sensor_stats")
+    def test_api_sensors_conditional_get(self, mock_get_stats, mock_version, client):
+        """Test ETag revalidation and rebuild on change for /api/sensors."""
+        modified = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        mock_version.return_value = (7, modified)
+        mock_get_stats.return_value = [{"sensor_id": "temp_01", "count": 1}]
+
+        first = client.get("/api/sensors")
+        etag = first.headers["ETag"]
+        assert first.status_code == 200
+        assert first.headers["Last-Modified"] == "Mon, 01 Jan 2024 12:00:00 GMT"
+
+        second = client.get("/api/sensors", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert mock_get_stats.call_count == 1
+
+        mock_version.return_value = (8, modified)
+        mock_get_stats.return_value = [{"sensor_id": "temp_01", "count": 2}]
+        third = client.get("/api/sensors", headers={"If-None-Match": etag})
+        assert third.status_code == 200
+        assert third.headers["ETag"] != etag
+        assert json.loads(third.data)["sensors"][0]["count"] == 2
+
+    @patch("src.dashboard.views.get_stats_version")
+    @patch("src.dashboard.views.get_all_sensor_stats")
+    def test_api_sensors_etag_is_stable_across_counters(
+        self, mock_get_stats, mock_version, client
+    ):
+        """Test a worker with its own change counter tags the same data alike."""
+        modified = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        mock_version.return_value = (7, modified)
+        mock_get_stats.return_value = [{"sensor_id": "temp_01", "count": 1}]
+        etag = client.get("/api/sensors").headers["ETag"]
+
+        # Another process (or this one after a restart) counts from elsewhere
+        mock_version.return_value = (1, modified)
+        response = client.get("/api/sensors", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        mock_version.return_value = (2, modified)
+        mock_get_stats.return_value = [{"sensor_id": "temp_01", "count": 5}]
+        response = client.get("/api/sensors", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+
+    @patch("src.dashboard.views.get_stats_version")
+    @patch("src.dashboard.views.get_all_sensor_stats")
+    def test_api_sensors_gzip(self, mock_get_stats, mock_version, client):
+        """Test the precompressed body is served when gzip is accepted."""
+        mock_version.return_value = (1, datetime.now(timezone.utc))
+        mock_get_stats.return_value = [{"sensor_id": "temp_01"}]
+
+        response = client.get("/api/sensors", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        data = json.loads(gzip.decompress(response.data))
+        assert data["sensors"][0]["sensor_id"] == "temp_01"
+
+    @patch("src.dashboard.views.get_stats_version")
+    @patch("src.dashboard.views.get_sensor_stats")
+    def test_api_sensor(self, mock_get_stats, mock_version, client):
+        """Test single-sensor statistics endpoint."""
+        mock_version.return_value = (3, datetime.now(timezone.utc))
+        mock_get_stats.return_value = {"sensor_id": "temp_01", "count": 3}
+
+        response = client.get("/api/sensors/temp_01")
+        assert response.status_code == 200
+        assert json.loads(response.data)["count"] == 3
+
+        mock_get_stats.return_value = None
+        response = client.get("/api/sensors/missing")
+        assert response.status_code == 404
+
+    @patch("src.dashboard.views.get_stats_version")
+    @patch("src.dashboard.views.get_all_sensor_stats")
+    @patch("src.dashboard.views.get_sensor_stats")
+    def test_snapshot_cache_is_bounded(
+        self, mock_get_sensor, mock_get_stats, mock_version, app, client
+    ):
+        """Test misses are not cached and selector snapshots are evicted."""
+        mock_version.return_value = (1, datetime.now(timezone.utc))
+        mock_get_sensor.return_value = None
+        mock_get_stats.return_value = []
+        cache = app.extensions["sensor_snapshots"] = SnapshotCache(max_entries=3)
+
+        for i in range(5):
+            assert client.get(f"/api/sensors/missing-{i}").status_code == 404
+            assert client.get(f"/api/sensors?tag=t{i}").status_code == 200
+
+        assert list(cache._snapshots) == [
+            ("sensors", ("tag", "t2")),
+            ("sensors", ("tag", "t3")),
+            ("sensors", ("tag", "t4")),
+        ]
+
     @patch("src.dashboard.views.get_sensor_readings")
     def test_api_sensor_readings(self, mock_get_readings, client):
         """Test sensor readings API endpoint."""
@@ -49,6 +150,455 @@ class TestViews:
         assert "readings" in data
         assert len(data["readings"]) == 1
 
+    @pytest.fixture
+    def stored_readings(self, file_storage):
+        for minute in [3, 0, 2, 1, 1]:
+            file_storage.store_reading(
+                "temp_01",
+                {"value": float(minute), "timestamp": f"2024-01-01T12:0{minute}:00"},
+            )
+        return file_storage
+
+    def test_api_sensor_readings_cursor_pagination(self, client, stored_readings):
+        """Test time-range readings are paged in order with a cursor."""
+        url = "/api/sensors/temp_01/readings?start=2024-01-01T12:00:00&limit=2"
+
+        pages = []
+        data = json.loads(client.get(url).data)
+        pages.append([r["value"] for r in data["readings"]])
+        while data["next_cursor"]:
+            data = json.loads(client.get(f"{url}&cursor={data['next_cursor']}").data)
+            pages.append([r["value"] for r in data["readings"]])
+
+        assert pages == [[0.0, 1.0], [1.0, 2.0], [3.0]]
+
+    def test_api_sensor_readings_cursor_scans_from_its_time(
+        self, client, stored_readings
+    ):
+        """Test a page's scan starts at the cursor, not at the range start."""
+        url = "/api/sensors/temp_01/readings?limit=2"
+        cursor = json.loads(client.get(url).data)["next_cursor"]
+
+        with patch.object(
+            stored_readings, "iter_readings", wraps=stored_readings.iter_readings
+        ) as mock_iter:
+            data = json.loads(client.get(f"{url}&cursor={cursor}").data)
+
+        assert mock_iter.call_args[0][1] == datetime(2024, 1, 1, 12, 1)
+        assert [r["value"] for r in data["readings"]] == [1.0, 2.0]
+
+    def test_api_sensor_readings_time_range(self, client, stored_readings):
+        """Test start is inclusive and end is exclusive."""
+        response = client.get(
+            "/api/sensors/temp_01/readings"
+            "?start=2024-01-01T12:01:00&end=2024-01-01T12:03:00"
+        )
+
+        data = json.loads(response.data)
+        assert [r["value"] for r in data["readings"]] == [1.0, 1.0, 2.0]
+        assert data["next_cursor"] is None
+
+    def test_api_sensor_readings_ndjson(self, client, stored_readings):
+        """Test streamed NDJSON output with a trailing cursor when truncated."""
+        response = client.get("/api/sensors/temp_01/readings?format=ndjson&limit=4")
+
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.data.splitlines()]
+        assert [line["value"] for line in lines[:4]] == [0.0, 1.0, 1.0, 2.0]
+        assert "next_cursor" in lines[4]
+
+    def test_api_sensor_readings_bad_params(self, client):
+        """Test invalid range parameters are rejected."""
+        assert client.get("/api/sensors/x/readings?start=nope").status_code == 400
+        assert client.get("/api/sensors/x/readings?cursor=nope").status_code == 400
+        assert client.get("/api/sensors/x/readings?format=xml").status_code == 400
+        assert client.get("/api/sensors/x/readings?limit=0").status_code == 400
+
+    def test_api_sensor_aggregate_raw(self, client, stored_readings):
+        """Test percentiles fall back to a raw scan."""
+        response = client.get(
+            "/api/sensors/temp_01/aggregate"
+            "?bucket=2m&fn=avg,max,p50&start=2024-01-01T12:00:00"
+        )
+
+        data = json.loads(response.data)
+        assert data["source"] == "raw"
+        assert data["buckets"] == ["2024-01-01T12:00:00", "2024-01-01T12:02:00"]
+        assert data["avg"] == [2 / 3, 2.5]
+        assert data["max"] == [1.0, 3.0]
+        assert data["p50"] == [1.0, 2.5]
+
+    def test_api_sensor_aggregate_rollups(self, client, file_storage):
+        """Test avg/min/max/count come from stored rollups when present."""
+        for timestamp, value in [
+            ("2024-01-01T12:00:00", 1.0),
+            ("2024-01-01T12:00:30", 3.0),
+            ("2024-01-01T12:01:10", 5.0),
+        ]:
+            file_storage.update_rollup(
+                "temp_01", {"value": value, "timestamp": timestamp}
+            )
+
+        response = client.get(
+            "/api/sensors/temp_01/aggregate"
+            "?bucket=5m&fn=avg,min,max,count&start=2024-01-01T12:00:00"
+        )
+
+        data = json.loads(response.data)
+        assert data["source"] == "rollup"
+        assert data["buckets"] == ["2024-01-01T12:00:00"]
+        assert data["avg"] == [3.0]
+        assert data["min"] == [1.0]
+        assert data["max"] == [5.0]
+        assert data["count"] == [3]
+
+    def test_api_sensor_aggregate_fills_gap_before_rollups(self, client, file_storage):
+        """Test readings older than the oldest rollup are merged in from raw."""
+        for timestamp, value in [
+            ("2024-01-01T11:58:00", 10.0),
+            ("2024-01-01T11:59:30", 20.0),
+            ("2024-01-01T12:00:00", 1.0),
+            ("2024-01-01T12:01:10", 5.0),
+        ]:
+            file_storage.store_reading(
+                "temp_01", {"value": value, "timestamp": timestamp}
+            )
+        # Rollups only exist from 12:00, as if the older ones were trimmed
+        for timestamp, value in [
+            ("2024-01-01T12:00:00", 1.0),
+            ("2024-01-01T12:01:10", 5.0),
+        ]:
+            file_storage.update_rollup(
+                "temp_01", {"value": value, "timestamp": timestamp}
+            )
+
+        response = client.get(
+            "/api/sensors/temp_01/aggregate"
+            "?bucket=5m&fn=min,max,count&start=2024-01-01T11:55:00"
+        )
+
+        data = json.loads(response.data)
+        assert data["source"] == "mixed"
+        assert data["buckets"] == ["2024-01-01T11:55:00", "2024-01-01T12:00:00"]
+        assert data["min"] == [10.0, 1.0]
+        assert data["max"] == [20.0, 5.0]
+        assert data["count"] == [2, 2]
+
+    def test_api_sensor_aggregate_bad_params(self, client):
+        """Test invalid bucket or function is rejected."""
+        url = "/api/sensors/temp_01/aggregate"
+        assert client.get(f"{url}?bucket=5x").status_code == 400
+        assert client.get(f"{url}?fn=median").status_code == 400
+
+    @pytest.fixture
+    def many_sensors(self, file_storage):
+        for sensor_id, sensor_type, location in [
+            ("temp_kitchen", "temperature", "Kitchen"),
+            ("hum_kitchen", "humidity", "Kitchen"),
+            ("temp_bedroom", "temperature", "Bedroom"),
+        ]:
+            for minute in range(3):
+                reading = {
+                    "sensor_id": sensor_id,
+                    "sensor_type": sensor_type,
+                    "location": location,
+                    "value": float(minute),
+                    "timestamp": f"2024-01-01T12:0{minute}:00",
+                }
+                file_storage.store_reading(sensor_id, reading)
+                file_storage.update_stats(sensor_id, reading)
+        return file_storage
+
+    def test_api_sensors_filtered_by_location(self, client, many_sensors):
+        """Test the sensor list is narrowed through the registry."""
+        response = client.get("/api/sensors?location=Kitchen")
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert {s["sensor_id"] for s in data["sensors"]} == {
+            "temp_kitchen",
+            "hum_kitchen",
+        }
+        assert len(json.loads(client.get("/api/sensors").data)["sensors"]) == 3
+
+    def test_api_registry(self, client, many_sensors):
+        """Test sensor metadata is listed from the registry."""
+        response = client.get("/api/registry?type=temperature")
+        assert response.status_code == 200
+
+        sensors = json.loads(response.data)["sensors"]
+        assert [s["sensor_id"] for s in sensors] == ["temp_bedroom", "temp_kitchen"]
+        assert sensors[0]["location"] == "Bedroom"
+
+    def test_api_groups(self, client, many_sensors):
+        """Test statistics are combined per location for one sensor type."""
+        response = client.get("/api/groups?by=location&type=temperature")
+        assert response.status_code == 200
+
+        groups = json.loads(response.data)["groups"]
+        assert set(groups) == {"Kitchen", "Bedroom"}
+        assert groups["Kitchen"]["sensors"] == ["temp_kitchen"]
+        assert groups["Kitchen"]["count"] == 3
+        assert groups["Kitchen"]["avg_value"] == 1.0
+
+        groups = json.loads(client.get("/api/groups?by=type").data)["groups"]
+        assert groups["temperature"]["count"] == 6
+        assert groups["temperature"]["max_value"] == 2.0
+
+        assert client.get("/api/groups?by=colour").status_code == 400
+
+    def test_api_readings_query_by_tag(self, client, file_storage):
+        """Test a bulk query selects sensors by tag."""
+        file_storage.store_reading(
+            "temp_01",
+            {"value": 1.0, "timestamp": "2024-01-01T12:00:00", "tags": ["ground"]},
+        )
+        file_storage.store_reading(
+            "temp_02", {"value": 2.0, "timestamp": "2024-01-01T12:00:00"}
+        )
+
+        response = client.get(
+            "/api/readings/query?tag=ground&start=2024-01-01T00:00:00"
+        )
+        assert response.status_code == 200
+        assert list(json.loads(response.data)["sensors"]) == ["temp_01"]
+
+    def test_api_readings_query_by_ids(self, client, many_sensors):
+        """Test a bulk query by sensor ids returns columnar data."""
+        response = client.post(
+            "/api/readings/query",
+            json={
+                "sensor_ids": ["temp_kitchen", "temp_bedroom"],
+                "start": "2024-01-01T12:01:00",
+                "end": "2024-01-01T12:03:00",
+            },
+        )
+
+        data = json.loads(response.data)
+        assert sorted(data["sensors"]) == ["temp_bedroom", "temp_kitchen"]
+        assert data["sensors"]["temp_kitchen"] == {
+            "timestamps": ["2024-01-01T12:01:00", "2024-01-01T12:02:00"],
+            "values": [1.0, 2.0],
+        }
+
+    def test_api_readings_query_by_selector(self, client, many_sensors):
+        """Test type/location selectors in the query string."""
+        response = client.get(
+            "/api/readings/query?location=Kitchen&start=2024-01-01T00:00:00"
+        )
+        data = json.loads(response.data)
+        assert sorted(data["sensors"]) == ["hum_kitchen", "temp_kitchen"]
+
+        response = client.get(
+            "/api/readings/query?type=temperature&location=Kitchen"
+            "&start=2024-01-01T00:00:00"
+        )
+        assert list(json.loads(response.data)["sensors"]) == ["temp_kitchen"]
+
+    def test_api_readings_query_requires_selector(self, client):
+        """Test a query without sensors or selector is rejected."""
+        assert client.get("/api/readings/query").status_code == 400
+        assert client.post("/api/readings/query", data="x").status_code == 400
+
+    def test_api_export_csv(self, client, stored_readings):
+        """Test streamed CSV export download."""
+        response = client.get("/api/export?format=csv&sensor_id=temp_01")
+
+        assert response.status_code == 200
+        assert response.mimetype == "text/csv"
+        assert "readings.csv" in response.headers["Content-Disposition"]
+        lines = response.data.decode("utf-8").splitlines()
+        assert lines[0].startswith("sensor_id,timestamp,value")
+        assert len(lines) == 6
+
+    def test_api_export_unknown_format(self, client):
+        """Test unknown export formats are rejected."""
+        assert client.get("/api/export?format=xlsx").status_code == 400
+
+    def test_api_stream(self, client):
+        """Test the Server-Sent Events stream endpoint."""
+        from src.dashboard.realtime import deliver_update, sse_hub
+
+        response = client.get("/api/stream?sensor_id=sse_01,sse_02&type=temperature")
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+
+        frames = iter(response.response)
+        assert next(frames).startswith(b"retry:")
+
+        deliver_update({"sensor_id": "sse_03", "sensor_type": "temperature"})
+        deliver_update({"sensor_id": "sse_01", "sensor_type": "humidity"})
+        deliver_update({"sensor_id": "sse_02", "sensor_type": "temperature"})
+
+        frame = next(frames).decode()
+        assert "event: sensor_update" in frame
+        assert '"sensor_id": "sse_02"' in frame
+
+        subscriptions = len(sse_hub.subscriptions)
+        response.close()
+        assert len(sse_hub.subscriptions) == subscriptions - 1
+
+    def test_api_stream_closed_before_start_leaves_no_subscription(self, app):
+        """Test a client gone before the first frame is never subscribed."""
+        from src.dashboard.realtime import sse_hub
+        from src.dashboard.views import api_stream
+
+        subscriptions = len(sse_hub.subscriptions)
+        with app.test_request_context("/api/stream"):
+            api_stream().close()
+
+        assert len(sse_hub.subscriptions) == subscriptions
+
+    def test_api_sensor_anomalies(self, client, file_storage):
+        """History is re-scored and only the outliers are returned."""
+        start = datetime(2024, 1, 1)
+        for i in range(60):
+            value = 50.0 if i == 45 else 20.0 + (i % 3) * 0.1
+            file_storage.store_reading(
+                "temp_01",
+                {
+                    "sensor_id": "temp_01",
+                    "value": value,
+                    "timestamp": (start + timedelta(minutes=i)).isoformat(),
+                },
+            )
+
+        response = client.get(
+            "/api/sensors/temp_01/anomalies?start=2024-01-01T00:00:00"
+        )
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["scored"] == 60
+        assert [a["value"] for a in data["anomalies"]] == [50.0]
+
+        response = client.get(
+            "/api/sensors/temp_01/anomalies?start=2024-01-01T00:00:00&threshold=1e9"
+        )
+        assert json.loads(response.data)["anomalies"] == []
+
+        response = client.get("/api/sensors/temp_01/anomalies?threshold=-1")
+        assert response.status_code == 400
+
+    @patch("src.dashboard.tasks.emit_sensor_update")
+    def test_ingest_json_array(self, mock_emit, client, mock_redis, file_storage):
+        """A JSON array is ingested and invalid items are reported."""
+        response = client.post(
+            "/api/readings",
+            json=[
+                {"sensor_id": "temp_01", "value": 21.0},
+                {"sensor_id": "temp_01", "value": "warm"},
+            ],
+        )
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data["accepted"] == 1
+        assert data["rejected"] == 1
+        assert data["errors"][0]["index"] == 1
+        assert file_storage.get_stats("temp_01")["count"] == 1
+
+    @patch("src.dashboard.tasks.emit_sensor_update")
+    def test_ingest_ndjson(self, mock_emit, client, mock_redis):
+        """NDJSON lines are decoded independently."""
+        body = '{"sensor_id": "temp_01", "value": 1}\n{broken\n\n'
+        body += '{"sensor_id": "temp_02", "value": 2}\n'
+        response = client.post(
+            "/api/readings", data=body, content_type="application/x-ndjson"
+        )
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data["accepted"] == 2
+        assert data["errors"][0]["index"] == 1
+
+    @patch("src.dashboard.tasks.emit_sensor_update")
+    def test_ingest_binary(self, mock_emit, client, mock_redis, file_storage):
+        """The compact binary format round-trips through the endpoint."""
+        from src.dashboard.batch import BINARY_CONTENT_TYPE, encode_binary_batch
+
+        body = encode_binary_batch(
+            [
+                {
+                    "sensor_id": "temp_01",
+                    "timestamp": datetime(2024, 1, 1, 12),
+                    "value": 21.5,
+                },
+                {"sensor_id": "temp_02", "timestamp": 1704110400, "value": -3},
+            ]
+        )
+        response = client.post(
+            "/api/readings", data=body, content_type=BINARY_CONTENT_TYPE
+        )
+        assert response.status_code == 200
+        assert json.loads(response.data)["accepted"] == 2
+        assert file_storage.get_stats("temp_01")["last_reading"] == (
+            "2024-01-01T12:00:00"
+        )
+
+        response = client.post(
+            "/api/readings", data=body[:-4], content_type=BINARY_CONTENT_TYPE
+        )
+        assert response.status_code == 400
+
+    def test_ingest_rejects_bad_batches(self, client, mock_redis):
+        """Empty, non-array, all-invalid and oversized batches are refused."""
+        assert client.post("/api/readings", json=[]).status_code == 400
+        assert client.post("/api/readings", json={"a": 1}).status_code == 400
+        assert client.post("/api/readings", json=[{"value": 1}]).status_code == 400
+
+        with patch("src.dashboard.views.MAX_BATCH_SIZE", 2):
+            response = client.post("/api/readings", json=[{}, {}, {}])
+        assert response.status_code == 413
+
+    def test_api_group_views(self, client, many_sensors):
+        """Test group views are seeded from storage and kept up to date."""
+        from src.dashboard.realtime import deliver_update
+
+        response = client.get("/api/group-views/temperature_by_location")
+        assert response.status_code == 200
+        groups = json.loads(response.data)["groups"]
+        assert groups["Kitchen"]["avg"] == 2.0
+        assert groups["Kitchen"]["sensors"] == 1
+
+        deliver_update(
+            {
+                "sensor_id": "temp_hall",
+                "sensor_type": "temperature",
+                "location": "Kitchen",
+                "value": 4.0,
+                "timestamp": datetime.now().isoformat(),
+            }
+        )
+        data = json.loads(client.get("/api/group-views").data)
+        views = {view["id"]: view for view in data["views"]}
+        kitchen = views["temperature_by_location"]["groups"]["Kitchen"]
+        assert kitchen["avg"] == 3.0
+        assert kitchen["active"] == 1
+        assert views["by_location"]["groups"]["Kitchen"]["sensors"] == 3
+
+        assert client.get("/api/group-views/missing").status_code == 404
+
+    def test_api_alert_rules(self, client):
+        """Test alert rules can be created, listed, replaced and deleted."""
+        rule = {"id": "hot", "kind": "threshold", "threshold": 30, "duration": 300}
+        response = client.post("/api/alerts/rules", json=rule)
+        assert response.status_code == 201
+        assert json.loads(response.data)["duration"] == 300
+
+        client.post("/api/alerts/rules", json={**rule, "threshold": 35})
+        rules = json.loads(client.get("/api/alerts/rules").data)["rules"]
+        assert [(r["id"], r["threshold"]) for r in rules] == [("hot", 35)]
+
+        response = client.post("/api/alerts/rules", json={"kind": "absence"})
+        assert response.status_code == 400
+
+        assert client.delete("/api/alerts/rules/hot").status_code == 204
+        assert client.delete("/api/alerts/rules/hot").status_code == 404
+        assert json.loads(client.get("/api/alerts").data) == {
+            "active": [],
+            "recent": [],
+        }
+
     def test_health_check(self, client):
         """Test health check endpoint."""
         response = client.get("/health")
@@ -56,6 +606,167 @@ class TestViews:
 
         data = json.loads(response.data)
         assert data["status"] == "healthy"
+        assert data["ingest"]["status"] == "idle"
+
+    def test_health_check_stalled(self, client, freshness):
+        """Test health check fails once ingest stops delivering updates."""
+        freshness.delivered("temp_01", time.time() - 600, at=time.time() - 500)
+
+        response = client.get("/health")
+        assert response.status_code == 503
+
+        data = json.loads(response.data)
+        assert data["status"] == "unhealthy"
+        assert data["ingest"]["status"] == "stalled"
+        assert data["stale_sensors"] == 1
+
+    def test_freshness(self, client, sample_sensor_data):
+        """Test freshness endpoint reports lag for processed readings."""
+        from src.dashboard.tasks import process_sensor_data
+
+        process_sensor_data(
+            "sensors/temp_01/temperature", json.dumps(sample_sensor_data)
+        )
+
+        response = client.get("/api/freshness")
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert [sensor["sensor_id"] for sensor in data["sensors"]] == ["temp_01"]
+        assert data["sensors"][0]["stale"] is False
+        assert data["lag"]["end_to_end"]["count"] == 1
+        assert data["lag"]["process"]["count"] == 1
+
+        response = client.get("/api/freshness?stale=true")
+        assert json.loads(response.data)["sensors"] == []
+
+    def test_metrics(self, client, sample_sensor_data):
+        """Test Prometheus metrics endpoint."""
+        from src.dashboard.tasks import process_sensor_data
+
+        process_sensor_data(
+            "sensors/temp_01/temperature", json.dumps(sample_sensor_data)
+        )
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.content_type.startswith("text/plain; version=0.0.4")
+
+        text = response.get_data(as_text=True)
+        assert "# TYPE iot_messages_received_total counter" in text
+        assert 'iot_messages_received_total{source="mqtt"}' in text
+        assert 'iot_stage_seconds_count{source="mqtt",stage="store"}' in text
+        assert "iot_storage_bytes_total" in text
+        assert "iot_storage_lock_wait_seconds_count" in text
+        assert "# TYPE iot_websocket_clients gauge" in text
+        assert 'iot_lag_seconds_count{stage="end_to_end"}' in text
+
+    def test_admin_endpoints_need_token(self, client):
+        """Test admin endpoints are disabled without ADMIN_TOKEN."""
+        with patch.dict("os.environ", {}, clear=False) as env:
+            env.pop("ADMIN_TOKEN", None)
+            assert client.get("/api/admin/profiler").status_code == 403
+
+        with patch.dict("os.environ", {"ADMIN_TOKEN": "secret"}):
+            response = client.get(
+                "/api/admin/profiler", headers={"Authorization": "Bearer wrong"}
+            )
+            assert response.status_code == 401
+
+    @patch.dict("os.environ", {"ADMIN_TOKEN": "secret"})
+    @patch("src.dashboard.tracing.Tracer.record")
+    def test_admin_tracing(self, mock_record, client, sample_sensor_data):
+        """Test changing the trace sample rate at runtime."""
+        from src.dashboard.tasks import process_sensor_data
+        from src.dashboard.tracing import tracer
+
+        auth = {"Authorization": "Bearer secret"}
+        previous = tracer.sample_rate
+        try:
+            response = client.put(
+                "/api/admin/tracing", json={"sample_rate": 1.5}, headers=auth
+            )
+            assert response.status_code == 400
+
+            response = client.put(
+                "/api/admin/tracing", json={"sample_rate": 1}, headers=auth
+            )
+            assert response.status_code == 200
+            assert response.get_json()["sample_rate"] == 1.0
+
+            process_sensor_data(
+                "sensors/temp_01/temperature", json.dumps(sample_sensor_data)
+            )
+        finally:
+            tracer.sample_rate = previous
+
+        trace, duration = mock_record.call_args[0]
+        spans = [name for name, *_ in trace.spans]
+        assert trace.attributes["sensor_id"] == "temp_01"
+        assert {"parse", "store", "stats", "alerts", "emit"} <= set(spans)
+        assert "storage.write" in spans
+
+    @patch.dict("os.environ", {"ADMIN_TOKEN": "secret"})
+    def test_admin_logging(self, client):
+        """Test switching hot-path log events at runtime."""
+        from src.dashboard.tasks import LOG_PROCESSED
+
+        auth = {"Authorization": "Bearer secret"}
+        response = client.get("/api/admin/logging", headers=auth)
+        assert response.status_code == 200
+        assert "ingest.processed" in response.get_json()["events"]
+
+        response = client.put(
+            "/api/admin/logging", json={"level": "LOUD"}, headers=auth
+        )
+        assert response.status_code == 400
+        response = client.put(
+            "/api/admin/logging",
+            json={"events": {"ingest.processed": {"sample_rate": -1}}},
+            headers=auth,
+        )
+        assert response.status_code == 400
+
+        previous = LOG_PROCESSED.status()
+        try:
+            response = client.put(
+                "/api/admin/logging",
+                json={"events": {"ingest.processed": {"enabled": False}}},
+                headers=auth,
+            )
+            assert response.status_code == 200
+            assert response.get_json()["events"]["ingest.processed"]["enabled"] is False
+            assert LOG_PROCESSED.enabled is False
+        finally:
+            LOG_PROCESSED.enabled = previous["enabled"]
+
+    @patch.dict("os.environ", {"ADMIN_TOKEN": "secret"})
+    def test_admin_profiler(self, client):
+        """Test starting and stopping the sampling profiler."""
+        auth = {"Authorization": "Bearer secret"}
+
+        response = client.post(
+            "/api/admin/profiler/start", json={"mode": "memory"}, headers=auth
+        )
+        assert response.status_code == 400
+
+        response = client.post(
+            "/api/admin/profiler/start",
+            json={"interval": 0.001, "mode": "wall"},
+            headers=auth,
+        )
+        assert response.status_code == 202
+        assert response.get_json()["running"] is True
+        response = client.post("/api/admin/profiler/start", headers=auth)
+        assert response.status_code == 409
+
+        response = client.post("/api/admin/profiler/stop", headers=auth)
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+        assert (
+            client.get("/api/admin/profiler", headers=auth).get_json()["running"]
+            is False
+        )
 
     def test_not_found(self, client):
         """Test 404 error handling."""
@@ -0,0 +1,62 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+from websocket_loadtest import PING, TEXT, encode_frame, main, read_frame
+
+
+def _read(data: bytes):
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read_frame(reader)
+
+    return asyncio.run(read())
+
+
+class TestFrames:
+    def test_masked_frame_round_trip(self):
+        for size in (3, 300, 70000):
+            payload = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+
+            assert _read(encode_frame(TEXT, payload)) == (True, TEXT, payload)
+
+    def test_unmasked_server_frame(self):
+        assert _read(bytes([0x89, 2]) + b"hi") == (True, PING, b"hi")
+
+
+class TestLoadTest:
+    @patch.dict("os.environ")
+    def test_spawned_server_delivers_to_every_client(self, tmp_path):
+        output = tmp_path / "results.json"
+
+        assert (
+            main(
+                [
+                    "--spawn",
+                    "--clients",
+                    "3",
+                    "--sensors",
+                    "2",
+                    "--rate",
+                    "20",
+                    "--duration",
+                    "0.5",
+                    "--drain",
+                    "0.5",
+                    "--processes",
+                    "1",
+                    "--output",
+                    str(output),
+                ]
+            )
+            == 0
+        )
+
+        (step,) = json.loads(output.read_text())["results"]
+        assert step["connected"] == 3
+        assert step["expected_per_client"] > 0
+        assert step["delivered"] == 3 * step["expected_per_client"]
+        assert step["dropped"] == 0
+        assert step["latency_ms"]["p50"] <= step["latency_ms"]["p99"]
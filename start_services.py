@@ -1,23 +1,26 @@
 import os
-import subprocess
 import sys
 import threading
 import time
 
+from src.dashboard.broker import ensure_broker, wait_for_broker
+
+BROKER_PORT = int(os.getenv("MQTT_BROKER_PORT", 1883))
+
 
 def start_mosquitto():
-    """Start Mosquitto MQTT broker if not already running."""
+    """Start an MQTT broker (mosquitto, or the embedded one) if none is running."""
     try:
-        result = subprocess.run(["pgrep", "mosquitto"], capture_output=True)
-        if result.returncode != 0:
-            print("Starting Mosquitto MQTT broker...")
-            subprocess.Popen(["mosquitto", "-d", "-p", "1883"])
-            time.sleep(2)
-            print("✓ Mosquitto MQTT broker started")
+        print("Starting MQTT broker...")
+        broker = ensure_broker(
+            BROKER_PORT, embedded=os.getenv("MQTT_EMBEDDED_BROKER") == "true"
+        )
+        if broker is not None:
+            print(f"✓ Embedded MQTT broker started on port {broker.port}")
         else:
-            print("✓ Mosquitto MQTT broker already running")
+            print("✓ MQTT broker running")
     except Exception as e:
-        print(f"✗ Error starting Mosquitto: {e}")
+        print(f"✗ Error starting MQTT broker: {e}")
 
 
 def start_sensor_simulator():
@@ -25,7 +28,9 @@ def start_sensor_simulator():
 
     def run_simulator():
         try:
-            time.sleep(3)  # Wait for MQTT broker to be ready
+            if not wait_for_broker("127.0.0.1", BROKER_PORT):
+                print("✗ MQTT broker is not reachable")
+                return
             print("Starting sensor simulator...")
             from sensor_simulator import SensorSimulator
 
@@ -0,0 +1,487 @@
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import resource
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from benchmark import run_metadata
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - optional dependency
+    psutil = None
+
+# WebSocket opcodes
+TEXT = 0x1
+CLOSE = 0x8
+PING = 0x9
+PONG = 0xA
+
+# Engine.IO v4 over a WebSocket, without the polling handshake
+SOCKETIO_PATH = "/socket.io/?EIO=4&transport=websocket"
+
+
+def encode_frame(opcode: int, payload: bytes) -> bytes:
+    """A single masked client frame."""
+    mask = os.urandom(4)
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, 0x80 | length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, length)
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return header + mask + masked
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """``(fin, opcode, payload)`` of the next frame from the server."""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+@lru_cache(maxsize=65536)
+def _ingested_at(timestamp: str) -> float:
+    # Every client in a process receives the same update
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+class LoadClient:
+    """A bare Socket.IO client that records ``sensor_update`` latencies.
+
+    It speaks just enough Engine.IO v4 over a WebSocket to connect to the
+    default namespace, answer pings and decode events, so thousands of them
+    can share one event loop. Latency is measured from each update's
+    reading timestamp, which the load tester sets when it ingests it.
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.latencies = []
+        self._reader = None
+        self._writer = None
+
+    async def connect(self, host: str, port: int, timeout: float = 10.0):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout
+        )
+        key = base64.b64encode(os.urandom(16)).decode()
+        self._writer.write(
+            (
+                f"GET {SOCKETIO_PATH} HTTP/1.1\r\n"
+                f"Host: {host}:{port}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n\r\n"
+            ).encode()
+        )
+        response = await asyncio.wait_for(self._reader.readuntil(b"\r\n\r\n"), timeout)
+        if not response.startswith(b"HTTP/1.1 101"):
+            raise ConnectionError(response.split(b"\r\n", 1)[0].decode())
+        # Engine.IO open packet, then join the default namespace
+        while not (await asyncio.wait_for(self._message(), timeout)).startswith("0"):
+            pass
+        self.send("40")
+        while not (await asyncio.wait_for(self._message(), timeout)).startswith("40"):
+            pass
+
+    def send(self, message: str):
+        self._writer.write(encode_frame(TEXT, message.encode()))
+
+    async def _message(self) -> str:
+        """The next text message, handling control frames on the way."""
+        parts = []
+        while True:
+            fin, opcode, payload = await read_frame(self._reader)
+            if opcode == PING:
+                self._writer.write(encode_frame(PONG, payload))
+                continue
+            if opcode == CLOSE:
+                raise ConnectionError("Server closed the connection")
+            if opcode == PONG:
+                continue
+            parts.append(payload)
+            if fin:
+                return b"".join(parts).decode("utf-8")
+
+    async def listen(self):
+        """Record updates until the connection is closed."""
+        try:
+            while True:
+                message = await self._message()
+                if message == "2":
+                    self.send("3")
+                elif message.startswith('42["sensor_update"'):
+                    now = time.time()
+                    update = json.loads(message[2:])[1]
+                    self.received += 1
+                    self.latencies.append(now - _ingested_at(update["timestamp"]))
+        except (ConnectionError, OSError, asyncio.IncompleteReadError):
+            pass
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+async def _run_clients(host, port, count, concurrency, timeout, stop, results):
+    clients, failed = [], 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def connect():
+        nonlocal failed
+        client = LoadClient()
+        async with gate:
+            try:
+                await client.connect(host, port, timeout)
+            except (OSError, ConnectionError, asyncio.TimeoutError):
+                client.close()
+                failed += 1
+                return
+        clients.append(client)
+
+    await asyncio.gather(*(connect() for _ in range(count)))
+    listeners = [asyncio.ensure_future(client.listen()) for client in clients]
+    results.put(("connected", len(clients), failed))
+
+    await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+    for client in clients:
+        client.close()
+    await asyncio.gather(*listeners, return_exceptions=True)
+    latencies = [latency for client in clients for latency in client.latencies]
+    results.put(
+        (
+            "stats",
+            [client.received for client in clients],
+            np.array(latencies, dtype=np.float64).tobytes(),
+        )
+    )
+
+
+def client_worker(host, port, count, concurrency, timeout, stop, results):
+    """Hold ``count`` connections until ``stop`` is set; meant for a process."""
+    _raise_file_limit()
+    asyncio.run(_run_clients(host, port, count, concurrency, timeout, stop, results))
+
+
+def _raise_file_limit():
+    # Every connection is a file descriptor on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+class ServerMonitor:
+    """Samples the server process's CPU, memory and thread count."""
+
+    def __init__(self, pid, interval=0.5):
+        self.process = psutil.Process(pid) if psutil and pid else None
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.process is None:
+            return
+        self.samples = []
+        self._stop.clear()
+        self.process.cpu_percent()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.process.oneshot():
+                    self.samples.append(
+                        (
+                            self.process.cpu_percent(),
+                            self.process.memory_info().rss,
+                            self.process.num_threads(),
+                        )
+                    )
+            except psutil.Error:
+                return
+
+    def stop(self):
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if not self.samples:
+            return None
+        cpu, rss, threads = zip(*self.samples)
+        return {
+            "cpu_percent_avg": round(float(np.mean(cpu)), 1),
+            "cpu_percent_max": round(float(max(cpu)), 1),
+            "rss_mb_max": round(max(rss) / 2**20, 1),
+            "threads_max": max(threads),
+        }
+
+
+def ingest(base_url, sensors, rate, duration, tick=0.1):
+    """POST readings stamped with the current time at ``rate`` per second.
+
+    Returns the number of readings the server accepted on time, which is
+    the number of updates every client should receive.
+    """
+    per_tick = max(1, round(rate * tick))
+    expected, index = 0, 0
+    started = time.monotonic()
+    deadline = started + duration
+    next_tick = started
+    while next_tick < deadline:
+        batch = []
+        for _ in range(per_tick):
+            batch.append(
+                {
+                    "sensor_id": f"ws_{index % sensors:05d}",
+                    "type": "temperature",
+                    "value": round(20 + (index % 100) / 10, 2),
+                    "unit": "°C",
+                    "location": "load test",
+                    "timestamp": datetime.now().isoformat(),
+                }
+            )
+            index += 1
+        request = urllib.request.Request(
+            f"{base_url}/api/readings",
+            data=json.dumps(batch).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            report = json.load(response)
+        expected += report["accepted"] - report["late"]
+        next_tick += tick
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+    return expected, index
+
+
+def run_step(args, host, port, clients, monitor):
+    """Connect ``clients`` sockets, ingest for a while and collect latencies."""
+    context = multiprocessing.get_context("spawn")
+    stop, results = context.Event(), context.Queue()
+    processes = min(args.processes, clients)
+    workers = []
+    for worker in range(processes):
+        count = clients // processes + (worker < clients % processes)
+        process = context.Process(
+            target=client_worker,
+            args=(host, port, count, args.connect_concurrency, 10.0, stop, results),
+            daemon=True,
+        )
+        process.start()
+        workers.append(process)
+
+    connected = failed = 0
+    try:
+        for _ in workers:
+            _, ok, errors = results.get(timeout=args.connect_timeout)
+            connected += ok
+            failed += errors
+
+        monitor.start()
+        started = time.monotonic()
+        expected, sent = ingest(
+            f"http://{host}:{port}", args.sensors, args.rate, args.duration
+        )
+        elapsed = time.monotonic() - started
+        time.sleep(args.drain)
+        server = monitor.stop()
+    finally:
+        stop.set()
+
+    received, latencies = [], []
+    for _ in workers:
+        try:
+            _, counts, samples = results.get(timeout=60)
+        except queue.Empty:
+            break
+        received.extend(counts)
+        latencies.append(np.frombuffer(samples, dtype=np.float64))
+    for process in workers:
+        process.join(timeout=10)
+    latencies = np.concatenate(latencies) * 1000 if latencies else np.array([])
+
+    delivered = sum(received)
+    dropped = sum(max(0, expected - count) for count in received)
+    late = int((latencies > args.late_ms).sum())
+    return {
+        "clients": clients,
+        "connected": connected,
+        "failed": failed,
+        "readings_sent": sent,
+        "ingest_rate": round(sent / elapsed, 1),
+        "expected_per_client": expected,
+        "delivered": delivered,
+        "deliveries_per_second": round(delivered / (elapsed + args.drain), 1),
+        "dropped": dropped,
+        "drop_rate": (
+            round(dropped / (expected * connected), 4)
+            if expected and connected
+            else None
+        ),
+        "late": late,
+        "latency_ms": {
+            name: (
+                round(float(np.percentile(latencies, q)), 3) if latencies.size else None
+            )
+            for name, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+        },
+        "server": server,
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_server(base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=1):
+                return
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.2)
+
+
+def spawn_server(port):
+    """Start the app on ``port`` in a subprocess with empty storage."""
+    env = {**os.environ, "LOG_LEVEL": "WARNING", "FLASK_ENV": "production"}
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port)],
+        env=env,
+    )
+    try:
+        _wait_for_server(f"http://127.0.0.1:{port}")
+    except OSError:
+        server.terminate()
+        raise
+    return server
+
+
+def serve(port):
+    """Run the web app alone, storing readings in a temporary directory."""
+    _raise_file_limit()
+    from src.dashboard import create_app, socketio, tasks
+    from src.dashboard.file_storage import FileStorage
+
+    tasks.file_storage = FileStorage(tempfile.mkdtemp(prefix="iot-ws-"))
+    app = create_app()
+    # The development server logs every request otherwise
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    socketio.run(
+        app, host="127.0.0.1", port=port, log_output=False, allow_unsafe_werkzeug=True
+    )
+
+
+def _ints(value):
+    return [int(item) for item in value.split(",")]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="WebSocket fan-out load test")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Server to test, e.g. http://127.0.0.1:5000")
+    target.add_argument(
+        "--spawn", action="store_true", help="Start a server with empty storage"
+    )
+    parser.add_argument("--server-pid", type=int, help="Sample this server process")
+    parser.add_argument("--clients", type=_ints, default=[10, 100, 500])
+    parser.add_argument("--sensors", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=50, help="Readings per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--drain", type=float, default=2.0)
+    parser.add_argument("--late-ms", type=float, default=1000.0)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--connect-concurrency", type=int, default=50)
+    parser.add_argument("--connect-timeout", type=float, default=120.0)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output", "-o", default="websocket-results.json")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=5000, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve:
+        serve(args.port)
+        return 0
+
+    server = None
+    pid = args.server_pid
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        server = spawn_server(port)
+        pid = server.pid
+    if psutil is None and pid:
+        print("psutil is not installed, server CPU and memory are not sampled")
+
+    monitor = ServerMonitor(pid)
+    steps = []
+    try:
+        for clients in args.clients:
+            step = run_step(args, host, port, clients, monitor)
+            steps.append(step)
+            latency = step["latency_ms"]
+            usage = step["server"] or {}
+            print(
+                f"clients={step['connected']}/{clients:<6} "
+                f"delivered={step['delivered']:<8} dropped={step['dropped']:<6} "
+                f"late={step['late']:<6} p50={latency['p50']}ms "
+                f"p99={latency['p99']}ms  cpu={usage.get('cpu_percent_avg')}% "
+                f"rss={usage.get('rss_mb_max')}MB",
+                flush=True,
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    with open(args.output, "w") as f:
+        json.dump({"meta": run_metadata(args), "results": steps}, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
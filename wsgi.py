@@ -0,0 +1,8 @@
+from src.dashboard import create_app
+from src.dashboard.tasks import start_recovery
+
+# Entry point for production servers, e.g.
+#   SOCKETIO_ASYNC_MODE=eventlet gunicorn -k eventlet -w 1 wsgi:app
+app = create_app()
+# Warm models and views from the snapshot the ingest process writes
+start_recovery(ingest=False)